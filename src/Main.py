@@ -6,6 +6,8 @@ import http.client
 import os
 import shutil
 import requests
+import multiprocessing
+import functools
 
 from vcs.IssueSubmitter import IssueSubmitter
 from vcs.GitCli import GitCli
@@ -14,6 +16,9 @@ from vcs.github.GithubRepo import GithubRepo
 from vcs.gitlab.GitlabProject import GitlabProject
 from vcs.PullRequestSubmitter import PullRequestSubmitter
 from gitbot.GitbotMessageGenerator import GitbotMessageGenerator
+from gitbot.GitbotCache import GitbotCache
+from gitbot.LocalMessageGenerator import LocalMessageGenerator
+from gitbot.MessageGeneratorInterface import MessageGeneratorInterface
 from vcs.CommitAuthor import CommitAuthor
 from pathlib import Path
 from github import MainClass
@@ -21,6 +26,8 @@ from gitlab.const import DEFAULT_URL
 from typing import List
 from vcs.PrChangesGenerator import PrChangesGenerator
 from vcs.PrChangesGenerator import PrChange
+from vcs.ReportStore import ReportStore
+from vcs.ScanCache import ScanCache
 from datetime import datetime
 
 VCS_PLATFORMS = [ "github", "gitlab" ] #, "bitbucket" ]
@@ -38,6 +45,10 @@ DEFAULT_API_BASE_URL_BY_PLATFORM = {
 
 ACTIONS = [ "PR", "ISSUE" ]
 
+MESSAGE_GENERATORS = [ "gitbot", "local" ]
+
+PR_MESSAGE_EXCLUSIONS = "issues,licenses"
+
 WORK_DIR = None
 
 PR_REPORT_FILENAME_PREFIX = ".pr_report_"
@@ -106,6 +117,117 @@ def parse_args():
         help="Allows to specify the path to the Meterian PDF report to add as part of the pull request if any are opened. This option is considered only if 'PR' is the action being used (view help for more details on actions)"
     )
 
+    parser.add_argument(
+        "--ignore-dirs",
+        metavar="DIRS",
+        help="Allows to specify a comma separated list of directory names to skip while looking for changed manifests in the work directory (" + ", ".join(PrChangesGenerator.IGNORED_DIRS) + " are always skipped)"
+    )
+
+    parser.add_argument(
+        "--parse-workers",
+        default=1,
+        type=int,
+        metavar="N",
+        help="Allows to specify the number of processes used to decode the reports and read the changed manifests (default is 1)"
+    )
+
+    parser.add_argument(
+        "--scan-cache",
+        action='store_true',
+        help="Allows to keep a cache of the work directory scan in " + ScanCache.DEFAULT_DIR + "/" + ScanCache.DEFAULT_FILENAME + " so that subsequent runs on the same checkout only decode new or modified reports and hash new or modified manifests"
+    )
+
+    parser.add_argument(
+        "--inline-threshold",
+        default=GithubRepo.DEFAULT_INLINE_THRESHOLD,
+        type=int,
+        metavar="BYTES",
+        help="Allows to specify the size under which UTF-8 manifests are sent inline with the commit tree rather than as separate blobs on GitHub (default is " + str(GithubRepo.DEFAULT_INLINE_THRESHOLD) + ")"
+    )
+
+    parser.add_argument(
+        "--github-graphql",
+        action='store_true',
+        help="Allows to create branches, commits and pull requests on GitHub through the GraphQL API, which takes fewer calls per pull request than the REST API"
+    )
+
+    parser.add_argument(
+        "--message-generator",
+        default="gitbot",
+        metavar="GENERATOR",
+        help="Allows to choose how the title and message of pull requests and issues are generated, either remotely by the Meterian gitbot service or locally from the report (default is gitbot) (supported: " + str(MESSAGE_GENERATORS) + ")"
+    )
+
+    parser.add_argument(
+        "--gitbot-timeouts",
+        default=str(GitbotMessageGenerator.DEFAULT_CONNECT_TIMEOUT) + "," + str(GitbotMessageGenerator.DEFAULT_READ_TIMEOUT),
+        metavar="CONNECT,READ",
+        help="Allows to specify the connect and read timeouts in seconds for calls to the Meterian gitbot service (default is " + str(GitbotMessageGenerator.DEFAULT_CONNECT_TIMEOUT) + "," + str(GitbotMessageGenerator.DEFAULT_READ_TIMEOUT) + ")"
+    )
+
+    parser.add_argument(
+        "--gitbot-pool-size",
+        default=GitbotMessageGenerator.DEFAULT_POOL_SIZE,
+        type=int,
+        metavar="N",
+        help="Allows to specify the maximum number of keep-alive connections kept open to the Meterian gitbot service (default is " + str(GitbotMessageGenerator.DEFAULT_POOL_SIZE) + ")"
+    )
+
+    parser.add_argument(
+        "--gitbot-concurrency",
+        default=GitbotMessageGenerator.DEFAULT_CONCURRENCY,
+        type=int,
+        metavar="N",
+        help="Allows to specify the maximum number of calls to the Meterian gitbot service in flight at once (default is " + str(GitbotMessageGenerator.DEFAULT_CONCURRENCY) + ")"
+    )
+
+    parser.add_argument(
+        "--gitbot-retries",
+        default=GitbotMessageGenerator.DEFAULT_RETRIES,
+        type=int,
+        metavar="N",
+        help="Allows to specify how many times calls to the Meterian gitbot service failing with a temporary error are retried (default is " + str(GitbotMessageGenerator.DEFAULT_RETRIES) + ")"
+    )
+
+    parser.add_argument(
+        "--gitbot-max-failures",
+        default=GitbotMessageGenerator.DEFAULT_MAX_FAILURES,
+        type=int,
+        metavar="K",
+        help="Allows to specify after how many consecutive failed calls the Meterian gitbot service is no longer called for the rest of the run (default is " + str(GitbotMessageGenerator.DEFAULT_MAX_FAILURES) + ")"
+    )
+
+    parser.add_argument(
+        "--gitbot-deadline",
+        type=float,
+        metavar="SECONDS",
+        help="Allows to specify the overall time in seconds after which the Meterian gitbot service is no longer called for the rest of the run (by default there is no deadline)"
+    )
+
+    parser.add_argument(
+        "--gitbot-fallback-local",
+        action='store_true',
+        help="Allows to generate the title and message of pull requests and issues locally from the report whenever the Meterian gitbot service is unavailable"
+    )
+
+    parser.add_argument(
+        "--gitbot-compress",
+        action='store_true',
+        help="Allows to send the reports to the Meterian gitbot service gzip compressed, uncompressed reports are sent as soon as the service rejects a compressed one"
+    )
+
+    parser.add_argument(
+        "--no-gitbot-cache",
+        action='store_true',
+        help="By default contents generated by the Meterian gitbot service are cached on disk and reused for identical reports, with this flag you can bypass the cache"
+    )
+
+    parser.add_argument(
+        "--clear-gitbot-cache",
+        action='store_true',
+        help="Allows to clear the cache of contents generated by the Meterian gitbot service before running"
+    )
+
     parser.add_argument(
         "--commit-author-username",
         metavar="USERNAME",
@@ -168,9 +290,8 @@ def initLogging(args):
 def is_tool_installed(tool_name):
     return shutil.which(tool_name) is not None
 
-def generate_contribution_content(gitbot: GitbotMessageGenerator, meterian_json_report: dict, options: dict, exclusions: str = None) -> dict:
-    content = gitbot.genMessage(meterian_json_report, options, exclusions)
-    return content
+def generate_contribution_contents(msg_generator: MessageGeneratorInterface, jobs, concurrency: int):
+    return msg_generator.genMessages(jobs, concurrency)
 
 def get_commit_author_details(args):
     username = DEFAULT_AUTHORS_BY_PLATFORM[args.vcs].username
@@ -192,7 +313,7 @@ def create_vcs_platform(args):
         api_base_url = args.api_base_url
         log.info("Overridden API base URL for %s with %s", args.vcs, api_base_url)
 
-    vcs = VcsHubFactory(args.vcs, api_base_url).create()
+    vcs = VcsHubFactory(args.vcs, api_base_url, args.github_graphql).create()
 
     return vcs
 
@@ -225,6 +346,24 @@ def record_pr_info_on_report(meterian_project_id: str, pr_infos_by_dep: dict, op
         print("Failed to record PR data")
         log.error("Could not record PR data\nStatus code: %s\nResponse: %s", str(response.status_code), str(response.text))
 
+def parse_gitbot_timeouts(args) -> tuple:
+    try:
+        timeouts = tuple(float(value) for value in args.gitbot_timeouts.split(","))
+    except ValueError:
+        return None
+    if len(timeouts) != 2 or min(timeouts) <= 0:
+        return None
+    return timeouts
+
+def get_ignored_dirs(args) -> List[str]:
+    ignored_dirs = []
+    if args.ignore_dirs:
+        for dir_name in args.ignore_dirs.split(","):
+            if dir_name.strip() != "":
+                ignored_dirs.append(dir_name.strip())
+        log.debug("Directories requested to be ignored: %s", str(ignored_dirs))
+    return ignored_dirs
+
 def load_pr_summary_report(dir) -> dict:
     try:
         stream = open(Path(dir, ".pr_summary.json"), encoding="utf-8")
@@ -235,6 +374,17 @@ def load_pr_summary_report(dir) -> dict:
         log.debug("Unexpected error loading PR summary report %s", str(Path(dir, ".pr_summary.json")), exc_info=1)
         return None
 
+def fetch_changed_manifests(work_dir: str, ignored_dirs: List[str]) -> dict:
+    pr_summary = load_pr_summary_report(work_dir)
+    if pr_summary:
+        reports_and_changes = PrChangesGenerator.fetch_changed_manifests_from_summary(Path(work_dir), pr_summary)
+        if reports_and_changes is not None:
+            log.debug("Changed manifests discovered through the PR summary report")
+            return reports_and_changes
+        log.info("PR summary report could not be used, the work directory will be scanned instead")
+
+    return PrChangesGenerator.fetch_changed_manifests(Path(work_dir), ignored_dirs)
+
 def submit_pr(pr_change: PrChange, branch: str, pr_text_content: dict, meterian_pdf_report_path: str, record_prs: bool, opened_prs: list, pr_infos_by_dep: dict):
     pr_change = pr_submitter.submit(pr_text_content, pr_change, branch, meterian_pdf_report_path)
     if pr_change:
@@ -249,6 +399,7 @@ def submit_pr(pr_change: PrChange, branch: str, pr_text_content: dict, meterian_
                     pr_infos_by_dep[dependency] = pr_infos
 
 if __name__ ==  "__main__":
+    multiprocessing.freeze_support()
     print()
 
     args = parse_args()
@@ -271,6 +422,38 @@ if __name__ ==  "__main__":
         sys.stderr.write("\n")
         sys.exit(-1)
 
+    if args.parse_workers < 1:
+        sys.stderr.write("Invalid number of parse workers: %s\n" % str(args.parse_workers))
+        sys.stderr.write("\n")
+        sys.exit(-1)
+
+    gitbot_timeouts = parse_gitbot_timeouts(args)
+    if gitbot_timeouts is None:
+        sys.stderr.write("Invalid gitbot timeouts: %s\n" % str(args.gitbot_timeouts))
+        sys.stderr.write("\n")
+        sys.exit(-1)
+
+    if args.gitbot_pool_size < 1:
+        sys.stderr.write("Invalid gitbot pool size: %s\n" % str(args.gitbot_pool_size))
+        sys.stderr.write("\n")
+        sys.exit(-1)
+
+    if args.gitbot_retries < 0 or args.gitbot_max_failures < 1 or (args.gitbot_deadline is not None and args.gitbot_deadline <= 0):
+        sys.stderr.write("Invalid gitbot retries, max failures or deadline: %s, %s, %s\n" % (str(args.gitbot_retries), str(args.gitbot_max_failures), str(args.gitbot_deadline)))
+        sys.stderr.write("\n")
+        sys.exit(-1)
+
+    if args.message_generator not in MESSAGE_GENERATORS:
+        sys.stderr.write("Invalid message generator: %s\n" % args.message_generator)
+        sys.stderr.write("Available ones are: %s\n" % str(MESSAGE_GENERATORS))
+        sys.stderr.write("\n")
+        sys.exit(-1)
+
+    if args.gitbot_concurrency < 1:
+        sys.stderr.write("Invalid gitbot concurrency: %s\n" % str(args.gitbot_concurrency))
+        sys.stderr.write("\n")
+        sys.exit(-1)
+
     if args.action not in ACTIONS:
         sys.stderr.write("Invalid action: %s\n" % args.action)
         sys.stderr.write("Available actions are: %s\n" % str(ACTIONS))
@@ -328,42 +511,71 @@ if __name__ ==  "__main__":
         sys.stderr.write("Repository %s was not found\n" % args.repository)
         sys.stderr.write("\n")
         sys.exit(-1)
-    
 
-    gitbot_msg_generator = GitbotMessageGenerator()
+    if isinstance(remote_repo, GithubRepo):
+        remote_repo.inline_threshold = args.inline_threshold
+
+    if args.message_generator == "local":
+        msg_generator = LocalMessageGenerator()
+    else:
+        gitbot_cache = None
+        if not args.no_gitbot_cache or args.clear_gitbot_cache:
+            gitbot_cache = GitbotCache.in_user_cache_dir()
+            if args.clear_gitbot_cache:
+                gitbot_cache.clear()
+            if args.no_gitbot_cache:
+                gitbot_cache.close()
+                gitbot_cache = None
+
+        msg_generator = GitbotMessageGenerator(
+            gitbot_timeouts[0],
+            gitbot_timeouts[1],
+            max(args.gitbot_pool_size, args.gitbot_concurrency),
+            gitbot_cache,
+            retries=args.gitbot_retries,
+            max_failures=args.gitbot_max_failures,
+            deadline=args.gitbot_deadline,
+            fallback=LocalMessageGenerator() if args.gitbot_fallback_local else None,
+            compress=args.gitbot_compress
+        )
+    scan_cache = ScanCache.in_work_dir(WORK_DIR) if args.scan_cache else None
+    report_store = ReportStore(scan_cache)
 
     if "PR" == args.action:
-        reports_and_changes = PrChangesGenerator.fetch_changed_manifests(Path(WORK_DIR))
+        reports_and_changes = fetch_changed_manifests(WORK_DIR, get_ignored_dirs(args))
         if len(reports_and_changes) == 0:
             print("No changes were detected in your repository in order to open PRs\n\n")
             sys.exit(0)
 
-        a_report = list(reports_and_changes.keys())[0]
-        meterian_project_id = PrChangesGenerator.parse_pid(a_report)
         opened_prs = []
         pr_infos_by_dep = {}
         author = get_commit_author_details(args)
         always_open_prs = args.always_open_prs is not None and args.always_open_prs == True
         pr_submitter = PullRequestSubmitter(WORK_DIR, remote_repo, author, always_open_prs)
 
-        for pr_report_path, changes in reports_and_changes.items():
-            log.debug("Prepping PR with report %s and changes %s", pr_report_path, changes)
-
-            generator = PrChangesGenerator(Path(WORK_DIR), changes)
-            pr_change = generator.generate(pr_report_path)
-
-            if pr_change:
-                pr_text_content = generate_contribution_content(gitbot_msg_generator, pr_change.pr_report, {
-                    GitbotMessageGenerator.AUTOFIX_OPT_KEY: True,
-                    GitbotMessageGenerator.REPORT_OPT_KEY: bool(args.with_pdf_report),
-                    GitbotMessageGenerator.ISSUE_OPT_KEY: False
-                }, "issues,licenses")
-                if not pr_text_content:
-                    log.error("Failed to generate the text content for the pull request, current changes will be skipped")
-                    continue
-
-                log.debug("Opening PR via PR change %s", pr_change)
-                submit_pr(pr_change, args.branch, pr_text_content, meterian_pdf_report_path, record_prs, opened_prs, pr_infos_by_dep)
+        # workers hand back the reports without the sections the PR text is generated without
+        report_filter = functools.partial(GitbotMessageGenerator.slim_report, exclusions=PR_MESSAGE_EXCLUSIONS)
+
+        def pr_content_jobs():
+            for pr_report_path, pr_change in PrChangesGenerator.generate_all(Path(WORK_DIR), reports_and_changes, report_store, args.parse_workers, scan_cache, report_filter):
+                log.debug("Prepping PR with report %s and changes %s", pr_report_path, reports_and_changes[pr_report_path])
+                if pr_change and not pr_submitter.is_submitted(pr_change, args.branch, meterian_pdf_report_path):
+                    yield pr_change, pr_change.pr_report, {
+                        GitbotMessageGenerator.AUTOFIX_OPT_KEY: True,
+                        GitbotMessageGenerator.REPORT_OPT_KEY: bool(args.with_pdf_report),
+                        GitbotMessageGenerator.ISSUE_OPT_KEY: False
+                    }, PR_MESSAGE_EXCLUSIONS
+
+        for pr_change, pr_text_content in generate_contribution_contents(msg_generator, pr_content_jobs(), args.gitbot_concurrency):
+            # the full report was only needed to generate the text content
+            pr_change.release_report()
+            if not pr_text_content:
+                log.error("Failed to generate the text content for the pull request, current changes will be skipped")
+                pr_submitter.skip(pr_change, "the text content of the pull request could not be generated")
+                continue
+
+            log.debug("Opening PR via PR change %s", pr_change)
+            submit_pr(pr_change, args.branch, pr_text_content, meterian_pdf_report_path, record_prs, opened_prs, pr_infos_by_dep)
 
         if len(opened_prs) > 0:
             print("New pull requests opened:")
@@ -374,6 +586,18 @@ if __name__ ==  "__main__":
             print("No pull requests were opened")
         print()
 
+        if len(pr_submitter.skipped) > 0:
+            print("Changes skipped:")
+            for pr_change, reason in pr_submitter.skipped:
+                print("- " + ", ".join(dep.language + "/" + dep.name for dep in pr_change.dependencies) + " - " + reason)
+            print()
+
+        # the digest of the report is known by now, the project id is parsed without decoding it again
+        meterian_project_id = PrChangesGenerator.parse_pid(list(reports_and_changes.keys())[0], report_store)
+
+        if isinstance(remote_repo, GithubRepo):
+            log.debug("Created %d blobs, %d blob calls were saved by inlining changes in commit trees", remote_repo.created_blobs, remote_repo.saved_blob_calls)
+
         if record_prs == True:
             if meterian_project_id:
                 open_prs_links = []
@@ -395,37 +619,42 @@ if __name__ ==  "__main__":
         pr_reports = PrChangesGenerator.fetch_pr_reports(Path(WORK_DIR))
         if len(pr_reports) > 0:
             reports_to_new_issues = {}
-            for report in pr_reports:
+            def issue_content_jobs():
+                for report in pr_reports:
+                    meterian_json_report = report_store.get(report)
+                    if meterian_json_report is None:
+                        log.error("Unable to load Meterian JSON report %s", str(report))
+                        continue
+
+                    yield report, meterian_json_report, {
+                        GitbotMessageGenerator.ISSUE_OPT_KEY: True,
+                        GitbotMessageGenerator.AUTOFIX_OPT_KEY: False,
+                        GitbotMessageGenerator.REPORT_OPT_KEY: False,
+                        "issueFromAutofix": True
+                    }, "licenses"
+
+            for report, issue_text_content in generate_contribution_contents(msg_generator, issue_content_jobs(), args.gitbot_concurrency):
                 try:
-                    with open(str(report)) as report_file:
-                        meterian_json_report = json.load(report_file)
-                        issue_text_content = generate_contribution_content(gitbot_msg_generator, meterian_json_report, {
-                            GitbotMessageGenerator.ISSUE_OPT_KEY: True,
-                            GitbotMessageGenerator.AUTOFIX_OPT_KEY: False,
-                            GitbotMessageGenerator.REPORT_OPT_KEY: False,
-                            "issueFromAutofix": True
-                        }, "licenses")
-                        if issue_text_content:
-                            new_issue = issue_submitter.submit(issue_text_content)
-                            if new_issue:
-                                reports_to_new_issues[report] = new_issue
-                        else:
-                            log.warn("An error occurred and the generation of the issue content failed given report %s", str(report))
+                    if issue_text_content:
+                        new_issue = issue_submitter.submit(issue_text_content)
+                        if new_issue:
+                            reports_to_new_issues[report] = new_issue
+                    else:
+                        log.warn("An error occurred and the generation of the issue content failed given report %s", str(report))
 
                 except Exception as ex:
-                    log.error("Unable to load Meterian JSON report: %s", str(ex))
-                    log.debug("Unable to load Meterian JSON report %s", str(report), exc_info=1)
+                    log.error("Unable to open issue for Meterian JSON report: %s", str(ex))
+                    log.debug("Unable to open issue for Meterian JSON report %s", str(report), exc_info=1)
 
 
             if len(reports_to_new_issues) > 0:
                 print("New issues opened:")
                 for report, issue in reports_to_new_issues.items():
-                    with open(str(report)) as report_file:
-                        meterian_json_report = json.load(report_file)
-                        deps = PrChangesGenerator.collect_dependencies_from_report(meterian_json_report)
-                        if len(deps) > 0:
-                            dep = deps[0]
-                            print("- " + issue.get_url() + " - " + "reports about " + dep.language + "/" + dep.name)
+                    report_digest = report_store.get_digest(report)
+                    deps = PrChangesGenerator.collect_dependencies_from_report(report_digest) if report_digest else []
+                    if len(deps) > 0:
+                        dep = deps[0]
+                        print("- " + issue.get_url() + " - " + "reports about " + dep.language + "/" + dep.name)
             else:
                 print("No new issues were opened")
             print()
@@ -436,3 +665,8 @@ if __name__ ==  "__main__":
 
 
 
+
+    msg_generator.close()
+    vcsPlatform.close()
+    if scan_cache:
+        scan_cache.close()
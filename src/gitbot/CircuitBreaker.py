@@ -0,0 +1,31 @@
+import logging
+import threading
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of calls to a remote service and opens once the given threshold is reached.\n
+    Once open the breaker stays open for the rest of the run so that remaining calls fail fast.
+    """
+
+    __log = logging.getLogger("CircuitBreaker")
+
+    def __init__(self, name: str, max_failures: int):
+        self.name = name
+        self.max_failures = max_failures
+        self.failures = 0
+        self.__open = False
+        self.__lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        return self.__open
+
+    def record_success(self):
+        with self.__lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self.__lock:
+            self.failures += 1
+            if not self.__open and self.failures >= self.max_failures:
+                self.__open = True
+                self.__log.warning("%s failed %d consecutive times, no further calls will be attempted", self.name, self.failures)
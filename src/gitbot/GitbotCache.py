@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+
+class GitbotCache:
+    """
+    On-disk cache of the contents rendered by gitbot, shared between runs.\n
+    Entries are addressed by a digest of the canonical request sent to gitbot, they expire after a TTL and the least
+    recently used ones are evicted once the cache grows beyond its maximum size.
+    """
+
+    DEFAULT_TTL = 7 * 24 * 60 * 60
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    DEFAULT_FILENAME = "gitbot.db"
+
+    __SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS contents (key TEXT PRIMARY KEY, created REAL, accessed REAL, size INTEGER, content TEXT)",
+        "CREATE INDEX IF NOT EXISTS contents_accessed ON contents (accessed)"
+    ]
+
+    __log = logging.getLogger("GitbotCache")
+
+    def __init__(self, db_path: Path, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.__connection = None
+        self.__disabled = False
+        self.__lock = threading.Lock()
+
+    def in_user_cache_dir():
+        cache_home = os.environ.get("XDG_CACHE_HOME") or str(Path(Path.home(), ".cache"))
+        return GitbotCache(Path(cache_home, "meterian-pr", GitbotCache.DEFAULT_FILENAME))
+
+    def key(base_url: str, canonical_request: str) -> str:
+        """Computes the key of a request given its URL and canonical JSON body"""
+        sha = hashlib.sha256(base_url.encode("utf-8") + b"\0")
+        sha.update(canonical_request.encode("utf-8"))
+        return sha.hexdigest()
+
+    def get(self, key: str) -> str:
+        """Gets the content cached for the given key, None is returned if there is none or it expired"""
+        now = time.time()
+        with self.__lock:
+            try:
+                connection = self.__connect()
+                if connection is None:
+                    return None
+
+                row = connection.execute("SELECT created, content FROM contents WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+
+                if row[0] + self.ttl < now:
+                    self.__log.debug("Cached content %s expired", key)
+                    connection.execute("DELETE FROM contents WHERE key = ?", (key,))
+                    connection.commit()
+                    return None
+
+                connection.execute("UPDATE contents SET accessed = ? WHERE key = ?", (now, key))
+                connection.commit()
+                return row[1]
+            except sqlite3.Error:
+                self.__log.debug("Unable to query gitbot cache %s", str(self.db_path), exc_info=1)
+                return None
+
+    def put(self, key: str, content: str):
+        now = time.time()
+        with self.__lock:
+            try:
+                connection = self.__connect()
+                if connection is None:
+                    return
+
+                connection.execute("INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?, ?)", (key, now, now, len(content), content))
+                self.__evict(connection)
+                connection.commit()
+            except sqlite3.Error:
+                self.__log.debug("Unable to update gitbot cache %s", str(self.db_path), exc_info=1)
+
+    def clear(self):
+        with self.__lock:
+            try:
+                connection = self.__connect()
+                if connection is not None:
+                    connection.execute("DELETE FROM contents")
+                    connection.commit()
+                    self.__log.debug("Cleared gitbot cache %s", str(self.db_path))
+            except sqlite3.Error:
+                self.__log.debug("Unable to clear gitbot cache %s", str(self.db_path), exc_info=1)
+
+    def close(self):
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+    def __evict(self, connection: sqlite3.Connection):
+        connection.execute("DELETE FROM contents WHERE created < ?", (time.time() - self.ttl,))
+
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM contents ORDER BY accessed ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM contents WHERE key = ?", evicted)
+        self.__log.debug("Evicted %d least recently used contents from gitbot cache", len(evicted))
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__connection is None and not self.__disabled:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+                for statement in self.__SCHEMA:
+                    connection.execute(statement)
+                connection.commit()
+                self.__connection = connection
+                self.__log.debug("Opened gitbot cache %s", str(self.db_path))
+            except (OSError, sqlite3.Error):
+                self.__disabled = True
+                self.__log.warning("Unable to open gitbot cache %s, contents will always be requested to gitbot", str(self.db_path))
+                self.__log.debug("Unable to open gitbot cache %s", str(self.db_path), exc_info=1)
+        return self.__connection
@@ -1,30 +1,220 @@
 import requests
+import gzip
 import json
 import logging
 import os
+import random
+import re
+import threading
+import time
 
-class GitbotMessageGenerator:
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Iterable
+from .CircuitBreaker import CircuitBreaker
+from .GitbotCache import GitbotCache
+from .MessageGeneratorInterface import MessageGeneratorInterface
 
-    AUTOFIX_OPT_KEY = "autofix"
-    ISSUE_OPT_KEY = "issue"
-    REPORT_OPT_KEY = "report"
+class GitbotMessageGenerator(MessageGeneratorInterface):
+
+    DEFAULT_CONNECT_TIMEOUT = 10
+    DEFAULT_READ_TIMEOUT = 60
+    DEFAULT_POOL_SIZE = 4
+    DEFAULT_CONCURRENCY = 4
+    DEFAULT_RETRIES = 3
+    DEFAULT_MAX_FAILURES = 5
+
+    RETRYABLE_STATUS_CODES = [ 429, 500, 502, 503, 504 ]
+    COMPRESSION_REJECTED_STATUS_CODES = [ 415 ]
+    # some servers reply to a gzip body they can't decode with a bad request, it is only taken as such when its body says so
+    COMPRESSION_REJECTED_MESSAGE_REGEX = r"gzip|content-encoding|compress"
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 30
+
+    # report sections which are not needed to generate contents when the given exclusion is requested
+    SECTIONS_BY_EXCLUSION = {
+        "licenses": "licensing",
+        "licensing": "licensing",
+        "security": "security",
+        "stability": "stability"
+    }
 
     __METERIAN_ENV = os.environ["METERIAN_ENV"] if "METERIAN_ENV" in os.environ and os.environ["METERIAN_ENV"] == "qa" else "www"
     __BASE_URL = "https://services3." + __METERIAN_ENV + ".meterian.io/api/v1/gitbot/results/parse/"
     __log =  logging.getLogger("GitbotMessageGenerator")
 
-    def __init__(self):
-        pass
+    def __init__(self, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT, pool_size: int = DEFAULT_POOL_SIZE, cache: GitbotCache = None,
+                 retries: int = DEFAULT_RETRIES, max_failures: int = DEFAULT_MAX_FAILURES, deadline: float = None, fallback: MessageGeneratorInterface = None,
+                 compress: bool = False):
+        """
+        Calls failing with a retryable status, a timeout or a connection error are retried up to the given number of times.\n
+        Once max_failures consecutive calls failed, or once the deadline in seconds from now has passed, gitbot is no longer
+        called for the rest of the run and messages are generated by the fallback generator if any.\n
+        When compress is set payloads are sent gzip encoded, they are sent uncompressed for the rest of the run as soon as gitbot rejects one.
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = cache
+        self.retries = retries
+        self.breaker = CircuitBreaker("gitbot", max_failures)
+        self.deadline = time.monotonic() + deadline if deadline is not None else None
+        self.fallback = fallback
+        self.compress = compress
+        self.__compress_lock = threading.Lock()
+        self.session = GitbotMessageGenerator.create_session(pool_size)
+
+    def create_session(pool_size: int) -> requests.Session:
+        """Creates a keep-alive session so that consecutive calls to gitbot reuse the same connections"""
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
     def genMessage(self, report: map, options: map, exclusions: str = None) -> map:
-        body = { "report": report, "options": options }
-        headers = {"Content-Type": "application/json"}
-        if exclusions is None:
-            response = requests.post(self.__BASE_URL, data = json.dumps(body), headers = headers)
-        else:
-            response = requests.post(self.__BASE_URL + "?exclude=" + exclusions , data = json.dumps(body), headers = headers)
+        body = { "report": GitbotMessageGenerator.slim_report(report, exclusions), "options": options }
+        url = self.__BASE_URL if exclusions is None else self.__BASE_URL + "?exclude=" + exclusions
+        # keys are sorted so that identical requests produce identical payloads and can be looked up in the cache
+        data = json.dumps(body, sort_keys = True, separators = (",", ":"))
+
+        cache_key = GitbotCache.key(url, data) if self.cache is not None else None
+        if cache_key is not None:
+            content = self.cache.get(cache_key)
+            if content is not None:
+                self.__log.debug("Reusing cached gitbot content %s", cache_key)
+                return json.loads(content)
+
+        if self.breaker.is_open() or self.__remaining_time() <= 0:
+            self.__log.debug("Gitbot is unavailable or the deadline has passed, the call is skipped")
+            return self.__fall_back(report, options, exclusions)
+
+        response = self.__post_with_retries(url, data)
+        if response is None:
+            self.breaker.record_failure()
+            return self.__fall_back(report, options, exclusions)
+
         if response.status_code == 200:
-            return json.loads(response.text)
+            self.breaker.record_success()
+            message = json.loads(response.text)
+            if cache_key is not None:
+                self.cache.put(cache_key, response.text)
+            return message
         else:
+            # a non retryable error, i.e. an unauthorized call, is bound to repeat so it counts towards opening the breaker
             self.__log.error("Unsuccessful call to gitbot\nStatus code: %s\nResponse: %s", str(response.status_code), response.text)
-            return None
\ No newline at end of file
+            self.breaker.record_failure()
+            return self.__fall_back(report, options, exclusions)
+
+    def slim_report(report: map, exclusions: str = None) -> map:
+        """Gets a shallow copy of the report without the sections that are not used given the exclusions"""
+        if not exclusions or "reports" not in report or not isinstance(report["reports"], dict):
+            return report
+
+        dropped = set(GitbotMessageGenerator.SECTIONS_BY_EXCLUSION[exclusion] for exclusion in exclusions.split(",") if exclusion in GitbotMessageGenerator.SECTIONS_BY_EXCLUSION)
+        if len(dropped) == 0:
+            return report
+
+        slim_report = dict(report)
+        slim_report["reports"] = { name: section for name, section in report["reports"].items() if name not in dropped }
+        return slim_report
+
+    def __post_with_retries(self, url: str, data: str) -> requests.Response:
+        """Gets the response of gitbot, None is returned if gitbot kept failing with retryable errors"""
+        attempt = 0
+        while True:
+            retry_after = 0
+            try:
+                response = self.__post(url, data)
+                if response.status_code not in self.RETRYABLE_STATUS_CODES:
+                    return response
+                failure = "status code " + str(response.status_code)
+                retry_after = self.__parse_retry_after(response)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as ex:
+                failure = str(ex)
+                self.__log.debug("Call to gitbot failed", exc_info=1)
+
+            if attempt >= self.retries:
+                break
+
+            delay = max(retry_after, random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt)))
+            if delay >= self.__remaining_time():
+                break
+
+            attempt += 1
+            self.__log.debug("Call to gitbot failed (%s), retry %d of %d in %.2f seconds", failure, attempt, self.retries, delay)
+            time.sleep(delay)
+
+        self.__log.error("Unsuccessful call to gitbot after %d attempts: %s", attempt + 1, failure)
+        return None
+
+    def __parse_retry_after(self, response: requests.Response) -> float:
+        try:
+            return float(response.headers.get("Retry-After", 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def __remaining_time(self) -> float:
+        return self.deadline - time.monotonic() if self.deadline is not None else float("inf")
+
+    def __fall_back(self, report: map, options: map, exclusions: str) -> map:
+        if self.fallback is None:
+            return None
+
+        self.__log.debug("Generating message through fallback generator")
+        return self.fallback.genMessage(report, options, exclusions)
+
+    def __post(self, url: str, data: str) -> requests.Response:
+        # a call never outlives the deadline
+        timeout = (self.timeout[0], min(self.timeout[1], max(self.__remaining_time(), 1)))
+        payload = data.encode("utf-8")
+        with self.__compress_lock:
+            compress = self.compress
+        if compress:
+            headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+            response = self.session.post(url, data = gzip.compress(payload, compresslevel = 6), headers = headers, timeout = timeout)
+            if not self.__is_compression_rejected(response):
+                return response
+
+            with self.__compress_lock:
+                if self.compress:
+                    self.__log.debug("Gitbot does not accept compressed payloads, payloads will be sent uncompressed")
+                    self.compress = False
+
+        headers = {"Content-Type": "application/json"}
+        return self.session.post(url, data = payload, headers = headers, timeout = timeout)
+
+    def __is_compression_rejected(self, response: requests.Response) -> bool:
+        if response.status_code in self.COMPRESSION_REJECTED_STATUS_CODES:
+            return True
+        return response.status_code == 400 and re.search(self.COMPRESSION_REJECTED_MESSAGE_REGEX, response.text or "", re.IGNORECASE) is not None
+
+    def genMessages(self, jobs: Iterable[tuple], concurrency: int = DEFAULT_CONCURRENCY) -> Iterable[tuple]:
+        """
+        Generates messages for an iterable of jobs, tuple(key, report, options, exclusions), with up to the given number of calls in flight.\n
+        Yields tuple(key, message) in the same order as the jobs, message is None if it could not be generated.
+        Jobs are only consumed as calls complete so that no more than the given number of reports are held at once.
+        """
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gitbot") as executor:
+            pending = deque()
+            for key, report, options, exclusions in jobs:
+                pending.append((key, executor.submit(self.__gen_message_safely, report, options, exclusions)))
+                if len(pending) >= concurrency:
+                    key, future = pending.popleft()
+                    yield key, future.result()
+
+            while len(pending) > 0:
+                key, future = pending.popleft()
+                yield key, future.result()
+
+    def __gen_message_safely(self, report: map, options: map, exclusions: str) -> map:
+        try:
+            return self.genMessage(report, options, exclusions)
+        except Exception as ex:
+            self.__log.error("Unable to call gitbot: %s", str(ex))
+            self.__log.debug("Unable to call gitbot", exc_info=1)
+            return None
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
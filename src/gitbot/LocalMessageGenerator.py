@@ -0,0 +1,218 @@
+import logging
+
+from pathlib import Path
+from string import Template
+from typing import Iterable, List
+from .MessageGeneratorInterface import MessageGeneratorInterface
+
+class LocalMessageGenerator(MessageGeneratorInterface):
+    """
+    Renders the title and message of PRs and issues out of the Meterian JSON report using bundled templates,
+    without calling the remote gitbot service.\n
+    Sections of the report can be left out through the same comma separated exclusions accepted by gitbot
+    (i.e. "issues,licenses").
+    """
+
+    TITLE_PREFIX = "[meterian]"
+
+    __PR_TEMPLATE = Template(
+        "Meterian found ${count} outdated or vulnerable ${dependencies}${manifest}, this pull request upgrades ${pronoun} as follows:\n"
+        "\n"
+        "| Dependency | Current version | Upgraded to | Reason |\n"
+        "| --- | --- | --- | --- |\n"
+        "${changes}\n"
+        "${sections}"
+        "${footer}"
+    )
+
+    __ISSUE_TEMPLATE = Template(
+        "Meterian found ${count} outdated or vulnerable ${dependencies}${manifest} which should be upgraded:\n"
+        "\n"
+        "| Dependency | Current version | Suggested version | Reason |\n"
+        "| --- | --- | --- | --- |\n"
+        "${changes}\n"
+        "${sections}"
+        "${footer}"
+    )
+
+    __CHANGE_ROW_TEMPLATE = Template("| ${dependency} | ${version} | ${upgraded_to} | ${reason} |")
+
+    __SECURITY_TEMPLATE = Template(
+        "\n"
+        "### Security\n"
+        "\n"
+        "The following vulnerabilities affect the current versions:\n"
+        "\n"
+        "${advices}\n"
+    )
+
+    __ADVICE_TEMPLATE = Template("- **${name}@${version}**: ${id} (${severity}) ${title}")
+
+    __STABILITY_TEMPLATE = Template(
+        "\n"
+        "### Stability\n"
+        "\n"
+        "The following dependencies are not up to date:\n"
+        "\n"
+        "${versions}\n"
+    )
+
+    __VERSION_TEMPLATE = Template("- **${name}@${version}**: ${latest}")
+
+    __LICENSING_TEMPLATE = Template(
+        "\n"
+        "### Licensing\n"
+        "\n"
+        "The following dependencies violate the licensing policy:\n"
+        "\n"
+        "${violations}\n"
+    )
+
+    __PDF_REPORT_NOTE = "\nThe full Meterian PDF report is attached to this pull request.\n"
+
+    __FOOTER_TEMPLATE = Template("\n---\nThis ${kind} was generated by [Meterian](https://www.meterian.io)${link}.\n")
+
+    __LATEST_VERSION_KEYS = [ "latestPatch", "latestMinor", "latestMajor" ]
+
+    __log = logging.getLogger("LocalMessageGenerator")
+
+    def genMessage(self, report: map, options: map, exclusions: str = None) -> map:
+        try:
+            excluded = set(exclusions.split(",")) if exclusions else set()
+            if options.get(self.ISSUE_OPT_KEY):
+                return self.__render_issue(report, excluded)
+            return self.__render_pr(report, options, excluded)
+        except:
+            self.__log.error("Unable to render message from the report locally")
+            self.__log.debug("Unable to render message from report", exc_info=1)
+            return None
+
+    def genMessages(self, jobs: Iterable[tuple], concurrency: int = 1) -> Iterable[tuple]:
+        # rendering is CPU bound and cheap, there is nothing to gain from running it concurrently
+        for key, report, options, exclusions in jobs:
+            yield key, self.genMessage(report, options, exclusions)
+
+    def close(self):
+        pass
+
+    def __render_pr(self, report: map, options: map, excluded: set) -> map:
+        changes = report["autofix"]["changes"]
+        manifest = self.__get_manifest_name(report)
+
+        if len(changes) == 1:
+            change = changes[0]
+            title = self.TITLE_PREFIX + " Upgrade " + change["name"] + " from " + change["version"] + " to " + change["upgradedTo"]
+        else:
+            title = self.TITLE_PREFIX + " Upgrade " + str(len(changes)) + " dependencies" + (" in " + manifest if manifest else "")
+
+        message = self.__PR_TEMPLATE.substitute(
+            count = len(changes),
+            dependencies = "dependency" if len(changes) == 1 else "dependencies",
+            manifest = " in `" + manifest + "`" if manifest else "",
+            pronoun = "it" if len(changes) == 1 else "them",
+            changes = self.__render_changes(changes),
+            sections = self.__render_sections(report, changes, excluded) + (self.__PDF_REPORT_NOTE if options.get(self.REPORT_OPT_KEY) else ""),
+            footer = self.__render_footer(report, "pull request")
+        )
+        return { self.TITLE_KEY: title, self.MESSAGE_KEY: message }
+
+    def __render_issue(self, report: map, excluded: set) -> map:
+        changes = report["autofix"]["changes"] if "autofix" in report else []
+        if len(changes) == 0:
+            # an empty title tells the issue submitter there is nothing to report
+            return { self.TITLE_KEY: "", self.MESSAGE_KEY: "" }
+
+        manifest = self.__get_manifest_name(report)
+        title = self.TITLE_PREFIX + " " + str(len(changes)) + (" dependency needs" if len(changes) == 1 else " dependencies need") + " to be upgraded" + (" in " + manifest if manifest else "")
+        message = self.__ISSUE_TEMPLATE.substitute(
+            count = len(changes),
+            dependencies = "dependency" if len(changes) == 1 else "dependencies",
+            manifest = " in `" + manifest + "`" if manifest else "",
+            changes = self.__render_changes(changes),
+            sections = self.__render_sections(report, changes, excluded),
+            footer = self.__render_footer(report, "issue")
+        )
+        return { self.TITLE_KEY: title, self.MESSAGE_KEY: message }
+
+    def __render_changes(self, changes: List[dict]) -> str:
+        rows = []
+        for change in changes:
+            rows.append(self.__CHANGE_ROW_TEMPLATE.substitute(
+                dependency = change["language"] + "/" + change["name"] if change.get("language") else change["name"],
+                version = change["version"],
+                upgraded_to = change["upgradedTo"],
+                reason = change.get("reason", "")
+            ))
+        return "\n".join(rows)
+
+    def __render_sections(self, report: map, changes: List[dict], excluded: set) -> str:
+        changed = set((change["name"], change["version"]) for change in changes)
+        reports = report.get("reports") or {}
+
+        sections = ""
+        if "security" not in excluded:
+            advices = self.__render_advices(reports.get("security"), changed)
+            if advices:
+                sections += self.__SECURITY_TEMPLATE.substitute(advices = advices)
+
+        if "stability" not in excluded:
+            versions = self.__render_versions(reports.get("stability"), changed)
+            if versions:
+                sections += self.__STABILITY_TEMPLATE.substitute(versions = versions)
+
+        if "licenses" not in excluded and "licensing" not in excluded:
+            violations = self.__render_violations(reports.get("licensing"))
+            if violations:
+                sections += self.__LICENSING_TEMPLATE.substitute(violations = violations)
+
+        return sections
+
+    def __render_advices(self, security: map, changed: set) -> str:
+        lines = []
+        for language_report in (security or {}).get("reports", []):
+            for dependency_report in language_report.get("reports", []):
+                dependency = dependency_report.get("dependency", {})
+                if (dependency.get("name"), dependency.get("version")) not in changed:
+                    continue
+                for advice in dependency_report.get("advices", []):
+                    lines.append(self.__ADVICE_TEMPLATE.substitute(
+                        name = dependency["name"],
+                        version = dependency["version"],
+                        id = advice.get("cve") or advice.get("id", ""),
+                        severity = str(advice.get("severity", "unknown")).lower(),
+                        title = advice.get("title") or advice.get("description", "")
+                    ).rstrip())
+        return "\n".join(lines)
+
+    def __render_versions(self, stability: map, changed: set) -> str:
+        lines = []
+        for language_report in (stability or {}).get("reports", []):
+            for version in language_report.get("versions", []):
+                if (version.get("name"), version.get("version")) not in changed:
+                    continue
+                latest = [ key[len("latest"):].lower() + " " + version[key] for key in self.__LATEST_VERSION_KEYS if key in version ]
+                lines.append(self.__VERSION_TEMPLATE.substitute(
+                    name = version["name"],
+                    version = version["version"],
+                    latest = "latest " + ", latest ".join(latest) if latest else "outdated"
+                ))
+        return "\n".join(lines)
+
+    def __render_violations(self, licensing: map) -> str:
+        lines = []
+        for language_report in (licensing or {}).get("reports", []):
+            for result in language_report.get("results", []):
+                if len(result.get("violations", [])) > 0:
+                    licenses = ", ".join(license.get("id", "") for license in result.get("licenses", []))
+                    lines.append("- **" + result["name"] + "@" + result["version"] + "**: " + licenses)
+        return "\n".join(lines)
+
+    def __render_footer(self, report: map, kind: str) -> str:
+        link = ", view the full report [here](" + report["url"] + ")" if report.get("url") else ""
+        return self.__FOOTER_TEMPLATE.substitute(kind = kind, link = link)
+
+    def __get_manifest_name(self, report: map) -> str:
+        manifests = report.get("autofix", {}).get("manifests")
+        if manifests and "solution" in manifests[0] and "path" in manifests[0]["solution"]:
+            return Path(manifests[0]["solution"]["path"]).name
+        return None
@@ -0,0 +1,37 @@
+import abc
+
+from typing import Iterable
+
+class MessageGeneratorInterface(metaclass=abc.ABCMeta):
+
+    AUTOFIX_OPT_KEY = "autofix"
+    ISSUE_OPT_KEY = "issue"
+    REPORT_OPT_KEY = "report"
+
+    TITLE_KEY = "title"
+    MESSAGE_KEY = "message"
+
+    @classmethod
+    def __subclasshook__(cls, subclass):
+        return (hasattr(subclass, 'genMessage') and
+                callable(subclass.genMessage) and
+                hasattr(subclass, 'genMessages') and
+                callable(subclass.genMessages) and
+                hasattr(subclass, 'close') and
+                callable(subclass.close) or
+                NotImplemented)
+
+    @abc.abstractmethod
+    def genMessage(self, report: map, options: map, exclusions: str = None) -> map:
+        """Generates the title and message of a PR or issue given a Meterian JSON report, None is returned on failure"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def genMessages(self, jobs: Iterable[tuple], concurrency: int = 1) -> Iterable[tuple]:
+        """Generates messages for an iterable of jobs, tuple(key, report, options, exclusions), yielding tuple(key, message) in order"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close(self):
+        """Releases the resources held by the generator"""
+        raise NotImplementedError
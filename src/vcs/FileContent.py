@@ -0,0 +1,42 @@
+import hashlib
+import mmap
+import os
+
+from contextlib import contextmanager
+
+class FileContent:
+    """
+    Handle on the content of a file which is only read when needed.\n
+    Size and git blob SHA-1 digest are computed upfront by memory mapping the file, so holding a handle
+    does not keep the content in memory.
+    """
+
+    def __init__(self, path: str, digest: str = None) -> None:
+        self.path = path
+        self.size = os.stat(path).st_size
+        self.digest = digest if digest is not None else self.__compute_digest()
+
+    def read(self) -> bytes:
+        """Materialises the content, callers are expected to release it as soon as it was used"""
+        with self.view() as content:
+            return bytes(content)
+
+    @contextmanager
+    def view(self):
+        """Gives access to the content through a memory mapped, read only view of the file"""
+        if self.size == 0:
+            yield b""
+            return
+
+        with open(self.path, "rb") as stream:
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                yield content
+
+    def __compute_digest(self) -> str:
+        with self.view() as content:
+            sha = hashlib.sha1(b"blob " + str(len(content)).encode() + b"\0")
+            sha.update(content)
+        return sha.hexdigest()
+
+    def __str__(self) -> str:
+        return "FileContent [ path=" + str(self.path) + ", size=" + str(self.size) + ", digest=" + str(self.digest) + " ]"
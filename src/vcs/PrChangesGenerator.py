@@ -1,12 +1,18 @@
-import json
 import re
 import logging
 import os
+import hashlib
 
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from urllib import parse
 from typing import List
 from pathlib import Path
 from .PullRequestInterface import PullRequestInterface
+from .ReportStore import ReportStore
+from .ScanCache import ScanCache
+from .FileContent import FileContent
 
 class Dependency():
     def __init__(self, language: str, name: str, version: str, new_version: str) -> None:
@@ -48,13 +54,58 @@ class Dependency():
         return "Dependency [ language=" + str(self.language) + ", name=" + str(self.name) + ", version=" + str(self.version) + ", new_version=" + str(self.new_version) + "]"
 
 class FilesystemChange():
-    def __init__(self, rel_file_path: str, content: bytes) -> None:
+    def __init__(self, rel_file_path: str, content, digest: str = None) -> None:
+        """content is either the bytes of the change or a FileContent handle that is read only when the content is requested"""
         self.rel_file_path = rel_file_path
-        self.content = content
+        if isinstance(content, FileContent):
+            self.__bytes = None
+            self.source = content
+        else:
+            self.__bytes = content
+            self.source = None
+        self.__digest = digest
+
+    @property
+    def content(self) -> bytes:
+        """The bytes of the change, file backed changes read them anew on each access so that they are released as soon as they were used"""
+        if self.source is not None:
+            return self.source.read()
+        return self.__bytes
+
+    @property
+    def size(self) -> int:
+        return self.source.size if self.source is not None else len(self.__bytes)
+
+    @property
+    def digest(self) -> str:
+        """The git blob SHA-1 of the content"""
+        if self.__digest is None:
+            self.__digest = self.source.digest if self.source is not None else FilesystemChange.compute_digest(self.__bytes)
+        return self.__digest
+
+    @contextmanager
+    def view(self):
+        """Gives access to the content without reading it in memory, file backed changes are viewed through the mapped file"""
+        if self.source is not None:
+            with self.source.view() as content:
+                yield content
+        else:
+            yield self.__bytes
+
+    def feed(self, hasher):
+        """Updates the given hashlib object with the content, file backed changes are fed straight from the mapped file"""
+        with self.view() as content:
+            hasher.update(content)
+
+    def compute_digest(content: bytes) -> str:
+        """Computes the git blob SHA-1 of the given content"""
+        sha = hashlib.sha1(b"blob " + str(len(content)).encode() + b"\0")
+        sha.update(content)
+        return sha.hexdigest()
 
     def __eq__(self, __o: object) -> bool:
         if isinstance(__o, FilesystemChange):
-            if self.rel_file_path == __o.rel_file_path and self.content == __o.content:
+            if self.rel_file_path == __o.rel_file_path and self.size == __o.size and self.digest == __o.digest:
                 return True
             else:
                 return False
@@ -62,7 +113,7 @@ class FilesystemChange():
             return False
 
     def __hash__(self) -> int:
-        return hash((self.rel_file_path, self.content))
+        return hash(self.rel_file_path)
 
     def __lt__(self, other):
         return self.rel_file_path < other.rel_file_path
@@ -71,17 +122,35 @@ class FilesystemChange():
         return self.rel_file_path > other.rel_file_path
 
     def __str__(self) -> str:
-        return "FilesystemChange [ file_path=" + str(self.rel_file_path) + ", content=" + str(self.content) + " ]"
+        content_str = str(self.__bytes) if self.source is None else "<" + str(self.size) + " bytes>"
+        return "FilesystemChange [ file_path=" + str(self.rel_file_path) + ", content=" + content_str + " ]"
 
 class PrChange():
-    def __init__(self,  meterian_project_id: str, dependencies : List[Dependency], filesystem_changes: List[FilesystemChange], pr_report: dict, manifest_info: dict, pr: PullRequestInterface = None) -> None:
+    def __init__(self,  meterian_project_id: str, dependencies : List[Dependency], filesystem_changes: List[FilesystemChange], pr_report: dict, manifest_info: dict, pr: PullRequestInterface = None, pr_report_loader = None) -> None:
         self.meterian_project_id = meterian_project_id
         self.dependencies = dependencies
         self.filesystem_changes = filesystem_changes
-        self.pr_report = pr_report
+        self.__pr_report = pr_report
+        self.pr_report_loader = pr_report_loader
         self.manifest_info = manifest_info
         self.pr = pr
 
+    @property
+    def pr_report(self) -> dict:
+        """The full report, loaded through the report loader on first access when it was not provided upfront"""
+        if self.__pr_report is None and self.pr_report_loader is not None:
+            self.__pr_report = self.pr_report_loader()
+        return self.__pr_report
+
+    @pr_report.setter
+    def pr_report(self, pr_report: dict):
+        self.__pr_report = pr_report
+
+    def release_report(self):
+        """Drops the full report once it is no longer needed, it is loaded again on next access if there is a report loader"""
+        if self.pr_report_loader is not None:
+            self.__pr_report = None
+
     def set_pr(self, pr: PullRequestInterface):
         self.pr = pr
 
@@ -101,6 +170,8 @@ class PrChange():
         for change in self.__get_autofix_changes(other.pr_report):
             if change not in changes:
                 changes.append(change)
+        # the merged report can no longer be loaded again, it is kept
+        self.pr_report_loader = None
 
     def __get_autofix_changes(self, report: dict):
         if report is None:
@@ -111,10 +182,16 @@ class PrChange():
         else:
             return []
 
+    def __pr_report_str(self) -> str:
+        # reports held on behalf of a loader are full reports, far too large to be printed
+        if self.pr_report_loader is None:
+            return str(self.__pr_report)
+        return "<loaded>" if self.__pr_report is not None else "<not loaded>"
+
     def __str__(self) -> str:
         dependencies_str = '[%s]' % ', '.join(map(str, self.dependencies)) if self.dependencies is not None else 'None'
         fs_changes_str = '[%s]' % ', '.join(map(str, self.filesystem_changes)) if self.filesystem_changes is not None else 'None'
-        return "PrChange [ meterian_project_id=" + str(self.meterian_project_id) + ", dependencies=" + dependencies_str + ", filesystem_changes=" + fs_changes_str + ", pr_report=" + str(self.pr_report) + ", pr=" + str(self.pr) + " ]"
+        return "PrChange [ meterian_project_id=" + str(self.meterian_project_id) + ", dependencies=" + dependencies_str + ", filesystem_changes=" + fs_changes_str + ", pr_report=" + self.__pr_report_str() + ", pr=" + str(self.pr) + " ]"
 
 class PrChangesGenerator():
 
@@ -124,16 +201,21 @@ class PrChangesGenerator():
 
     METERIAN_PR_REPORT_FILE_REGEX = r"^report\.json\.pr\d+$"
 
+    IGNORED_DIRS = [ ".git", "node_modules", "vendor", "target", ScanCache.DEFAULT_DIR ]
+
     SUPPORTED_MANIFEST_FILES_PATTERNS = [ "^pom\.xml$", "^composer\.json$", "^Gemfile$", "^Gemfile\.lock$", "^Pipfile$", "^Pipfile\.lock$", "^package\.json$", "^package-lock\.json$", "^.*\..+proj$", "^yarn\.lock$", "^pyproject\.toml$", "^poetry\.lock$" ]
 
-    def __init__(self, root_folder: Path, relative_changes_paths: List[str]) -> None:
+    def __init__(self, root_folder: Path, relative_changes_paths: List[str], report_store: ReportStore = None, scan_cache: ScanCache = None) -> None:
         self.root_folder = root_folder
         self.relative_changes_paths = relative_changes_paths
+        self.report_store = report_store if report_store is not None else ReportStore(scan_cache)
+        self.scan_cache = scan_cache
 
     def generate(self, pr_report_file: Path) -> PrChange:
         if pr_report_file.exists():
             self.__logger.debug("Loading PR report %s", self.__relative_path(pr_report_file))
-            pr_report = PrChangesGenerator.__load_report_json(pr_report_file)
+            # the report is only decoded when its digest is not cached, it is then kept for the generation of the PR text
+            pr_report, full_report = self.report_store.get_digest_and_report(pr_report_file)
             self.__logger.debug("Loaded PR report.")
             if pr_report:
                 fs_changes = self.__collect_fs_changes()
@@ -141,8 +223,8 @@ class PrChangesGenerator():
                 project_id = PrChangesGenerator.__parse_project_id(pr_report)
                 if fs_changes and dependencies and project_id:
                     manifest_info = self.__get_manifest_info(pr_report)
-                    pr_change = PrChange(project_id, dependencies, fs_changes, pr_report, manifest_info)
-                    self.__logger.debug("Generated PR change %s", str(pr_change))
+                    pr_change = PrChange(project_id, dependencies, fs_changes, full_report, manifest_info, pr_report_loader=self.report_store.loader(pr_report_file))
+                    self.__logger.debug("Generated PR change %s", pr_change)
                     return pr_change
                 else:
                     self.__logger.debug("Incomplete data collected for PR change, generation will be aborted")
@@ -154,6 +236,63 @@ class PrChangesGenerator():
         self.__logger.debug("Failed to generate PR change using %s", self.__relative_path(pr_report_file))
         return None
 
+    def generate_all(root_folder: Path, reports_and_changes: dict, report_store: ReportStore = None, workers: int = 1, scan_cache: ScanCache = None, report_filter = None):
+        '''
+        generates PR changes for all entries of the map returned by fetch_changed_manifests, yielding tuple(Path(pr_report), PrChange) in the order of the map\n
+        with more than one worker the reports are decoded and the manifests are read by a pool of processes, results are yielded as soon as they are available in order.
+        Workers hand back the decoded report through report_filter when one is given, i.e. to drop the sections the caller won't use before it is sent over.
+        At most twice as many reports as workers are queued, the ones not started yet are cancelled when the generator is closed early
+        '''
+        store = report_store if report_store is not None else ReportStore(scan_cache)
+        if workers is None or workers <= 1 or len(reports_and_changes) <= 1:
+            for pr_report_file, changes in reports_and_changes.items():
+                pr_change = PrChangesGenerator(root_folder, changes, store, scan_cache).generate(pr_report_file)
+                if scan_cache:
+                    scan_cache.flush()
+                yield pr_report_file, pr_change
+            return
+
+        PrChangesGenerator.__logger.debug("Generating PR changes for %s reports with %s workers", len(reports_and_changes), workers)
+        if scan_cache:
+            # workers only read the cache, pending writes are committed first so that no lock is held while they do
+            scan_cache.flush()
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        pending = deque()
+        try:
+            entries = iter(reports_and_changes.items())
+            while True:
+                for pr_report_file, changes in entries:
+                    pending.append((pr_report_file, executor.submit(_generate_pr_change, root_folder, changes, pr_report_file, scan_cache, report_filter)))
+                    if len(pending) >= 2 * workers:
+                        break
+                if len(pending) == 0:
+                    break
+
+                pr_report_file, future = pending.popleft()
+                yield pr_report_file, PrChangesGenerator.__collect_pr_change(pr_report_file, future, store, scan_cache)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        if scan_cache:
+            scan_cache.flush()
+
+    def __collect_pr_change(pr_report_file: Path, future, store: ReportStore, scan_cache: ScanCache) -> PrChange:
+        pr_change = None
+        try:
+            pr_change, digest, deferred = future.result()
+            if scan_cache:
+                scan_cache.apply(deferred)
+            store.put_digest(pr_report_file, digest)
+        except:
+            PrChangesGenerator.__logger.debug("Unable to generate PR change using %s", str(pr_report_file), exc_info=1)
+
+        if pr_change:
+            pr_change.pr_report_loader = store.loader(pr_report_file)
+        return pr_change
+
     def __get_manifest_info(self, pr_report):
         if "autofix" in pr_report:
             if "manifests" in pr_report["autofix"]:
@@ -188,7 +327,11 @@ class PrChangesGenerator():
             fs_changes = []
             for rel_change in self.relative_changes_paths:
                 if PrChangesGenerator.__is_supported_manifest(Path(self.root_folder, PrChangesGenerator.__without_pr_file_extension(rel_change)).name):
-                    content = self.__read_file_bytes(str(Path(self.root_folder, rel_change).absolute()))
+                    path = str(Path(self.root_folder, rel_change).absolute())
+                    cached_digest = self.__get_cached_digest(path)
+                    content = FileContent(path, cached_digest)
+                    if self.scan_cache and cached_digest is None:
+                        self.scan_cache.put_manifest_hash(path, os.stat(path), content.digest)
                     fs_changes.append(FilesystemChange(PrChangesGenerator.__without_pr_file_extension(rel_change), content))
                     self.__logger.debug("Loaded manifest change for %s", str(rel_change))
             return fs_changes
@@ -196,6 +339,11 @@ class PrChangesGenerator():
             self.__logger.debug("Unable to collect filesystem changes from files %s", self.relative_changes_paths, exc_info=1)
             return None
 
+    def __get_cached_digest(self, path: str) -> str:
+        if self.scan_cache is None:
+            return None
+        return self.scan_cache.get_manifest_hash(path, os.stat(path))
+
     def __without_pr_file_extension(filename: str):
         pr_no = PrChangesGenerator.__parse_pr_no(Path(filename))
         if pr_no:
@@ -213,27 +361,68 @@ class PrChangesGenerator():
 
         return res
 
-    def __read_file_bytes(self, path: str) -> bytes:
-        file = open(path, "rb")
-        bytes_contents = file.read()
-        file.close()
-        return bytes_contents
-
-    def fetch_changed_manifests(root_dir: Path) -> dict:
+    def fetch_changed_manifests(root_dir: Path, ignored_dirs: List[str] = None) -> dict:
         '''
         returns map with key(Path(pr_report)), value(List[str(file changes paths relative to root_dir)])
         '''
         manifests_by_pr_reports = {}
         reports = PrChangesGenerator.__fetch_pr_reports(root_dir)
         PrChangesGenerator.__logger.debug("Found PR reports to work on %s", str(reports))
+        if len(reports) == 0:
+            return manifests_by_pr_reports
+
+        manifests_by_pr_no = PrChangesGenerator.__index_changed_manifests(root_dir, ignored_dirs)
         for report in reports:
             pr_no = PrChangesGenerator.__parse_pr_no(report)
             if pr_no:
-                manifests_by_pr_reports[report] = PrChangesGenerator.__find_changed_manifests(root_dir, pr_no)
+                manifests_by_pr_reports[report] = manifests_by_pr_no.get(pr_no, [])
 
         PrChangesGenerator.__logger.debug("Fetched changed manifest by pr reports: %s", manifests_by_pr_reports)
         return manifests_by_pr_reports
 
+    def fetch_changed_manifests_from_summary(root_dir: Path, pr_summary: dict) -> dict:
+        '''
+        returns the same map as fetch_changed_manifests using the entries of the PR summary report generated by the client\n
+        the summary is assumed to list, for each PR report, its path and the paths of its manifests relative to the work directory, e.g.
+        { "prs": [ { "report": "report.json.pr1", "manifests": [ "pom.xml.pr1", "module/pom.xml.pr1" ] } ] }
+        this shape is not validated against a published schema of the client, a summary of any other shape is rejected and logged\n
+        None is returned when the summary is unusable or stale (listed files no longer exist or it does not cover all PR reports)
+        '''
+        if not isinstance(pr_summary, dict) or not isinstance(pr_summary.get("prs"), list):
+            PrChangesGenerator.__logger.info("PR summary does not have the expected shape { \"prs\": [ { \"report\": ..., \"manifests\": [ ... ] } ] }, it will not be used")
+            return None
+
+        try:
+            manifests_by_pr_reports = {}
+            for entry in pr_summary["prs"]:
+                report = Path(root_dir, entry["report"])
+                pr_no = PrChangesGenerator.__parse_pr_no(report)
+                if pr_no is None or not report.is_file():
+                    PrChangesGenerator.__logger.debug("PR summary lists report %s which is invalid or no longer exists", str(report))
+                    return None
+
+                manifests = []
+                for manifest in entry["manifests"]:
+                    manifest_path = Path(root_dir, manifest)
+                    if PrChangesGenerator.__parse_pr_no(manifest_path) != pr_no or not manifest_path.is_file():
+                        PrChangesGenerator.__logger.debug("PR summary lists manifest %s which is invalid or no longer exists", str(manifest_path))
+                        return None
+                    if PrChangesGenerator.__is_supported_manifest(PrChangesGenerator.__without_pr_file_extension(manifest_path.name)):
+                        entry_path = str(PrChangesGenerator.__compute_relative_path(root_dir, manifest_path))
+                        if entry_path not in manifests:
+                            manifests.append(entry_path)
+                manifests_by_pr_reports[report] = manifests
+        except:
+            PrChangesGenerator.__logger.info("Unable to read changed manifests from PR summary, entries do not have the expected shape { \"report\": ..., \"manifests\": [ ... ] }")
+            PrChangesGenerator.__logger.debug("Unable to read changed manifests from PR summary", exc_info=1)
+            return None
+
+        if set(manifests_by_pr_reports.keys()) != set(PrChangesGenerator.__fetch_pr_reports(root_dir)):
+            PrChangesGenerator.__logger.debug("PR summary does not match the PR reports found in %s", str(root_dir))
+            return None
+
+        PrChangesGenerator.__logger.debug("Fetched changed manifest by pr reports from PR summary: %s", manifests_by_pr_reports)
+        return manifests_by_pr_reports
 
     def __parse_pr_no(file: Path):
         pr_no = None
@@ -256,27 +445,57 @@ class PrChangesGenerator():
                 PrChangesGenerator.__logger.debug("Loaded report @ %s", str(Path(work_dir, filename)))
         return reports
 
-    def __find_changed_manifests(work_dir: Path, pr_no: str) -> List[str]:
-        manifests = []
-        for root, dirs, files in os.walk(work_dir):
-            files = [f for f in files if f.endswith("."+pr_no)]
-            for file in files:
-                manifest_file = file.replace("."+pr_no, "");
+    def __index_changed_manifests(work_dir: Path, ignored_dirs: List[str] = None) -> dict:
+        '''
+        walks the work directory once, skipping ignored directories, and returns map with key(str(pr_no)), value(List[str(file changes paths relative to work_dir)])
+        '''
+        skipped_dirs = set(PrChangesGenerator.IGNORED_DIRS)
+        if ignored_dirs:
+            skipped_dirs.update(ignored_dirs)
+
+        manifests_by_pr_no = {}
+        pending_dirs = [ str(work_dir) ]
+        while len(pending_dirs) > 0:
+            current_dir = pending_dirs.pop()
+            listing = PrChangesGenerator.__list_dir(current_dir)
+            if listing is None:
+                continue
+
+            sub_dirs, pr_files = listing
+            for pr_file in pr_files:
+                pr_no = PrChangesGenerator.__parse_pr_no(Path(pr_file))
+                manifest_file = pr_file[:len(pr_file) - len(pr_no) - 1]
                 if PrChangesGenerator.__is_supported_manifest(manifest_file):
-                    manifest = Path(root, file)
-                    entry = str(PrChangesGenerator.__compute_relative_path(work_dir, manifest))
-                    if entry not in manifests:
-                        manifests.append(entry)
-        return manifests
+                    manifests = manifests_by_pr_no.setdefault(pr_no, [])
+                    entry_path = str(PrChangesGenerator.__compute_relative_path(work_dir, Path(current_dir, pr_file)))
+                    if entry_path not in manifests:
+                        manifests.append(entry_path)
+
+            # visit sub directories in the same top-down order os.walk would
+            for sub_dir in reversed(sub_dirs):
+                if sub_dir not in skipped_dirs:
+                    pending_dirs.append(os.path.join(current_dir, sub_dir))
+                else:
+                    PrChangesGenerator.__logger.debug("Skipping directory %s", os.path.join(current_dir, sub_dir))
+
+        return manifests_by_pr_no
 
-    def __load_report_json(path: Path) -> dict:
+    def __list_dir(path: str) -> tuple:
+        '''
+        returns tuple(List[sub directory names], List[PR file names]) of the given directory
+        '''
         try:
-            stream = open(path, encoding="utf-8")
-            pr_report = json.load(stream)
-            stream.close()
-            return pr_report
-        except:
-            PrChangesGenerator.__logger.debug("Unable to load PR report at %s", str(path), exc_info=1)
+            sub_dirs = []
+            pr_files = []
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        sub_dirs.append(entry.name)
+                    elif re.match(PrChangesGenerator.METERIAN_PR_FILE_REGEX, entry.name):
+                        pr_files.append(entry.name)
+            return sub_dirs, pr_files
+        except OSError:
+            PrChangesGenerator.__logger.debug("Unable to scan directory %s", path, exc_info=1)
             return None
 
     def __parse_project_id(pr_report: dict) -> str:
@@ -289,11 +508,27 @@ class PrChangesGenerator():
             PrChangesGenerator.__logger.debug("Unable to parse project ID from url %s in PR report ", str(url_str), exc_info=1)
             return None
 
-    def parse_pid(a_report: Path) -> str:
+    def parse_pid(a_report: Path, report_store: ReportStore = None) -> str:
         pid = None
 
-        report = PrChangesGenerator.__load_report_json(a_report)
+        store = report_store if report_store is not None else ReportStore()
+        report = store.get_digest(a_report)
         if report:
             pid = PrChangesGenerator.__parse_project_id(report)
 
-        return pid
\ No newline at end of file
+        return pid
+
+def _generate_pr_change(root_folder: Path, relative_changes_paths: List[str], pr_report_file: Path, scan_cache: ScanCache = None, report_filter = None) -> tuple:
+    """
+    Generates a PR change in a worker process holding the decoded report, passed through report_filter when one is given.\n
+    Gets tuple(PrChange, report digest, deferred scan cache writes), the digest is recorded and the writes are applied by the caller.
+    """
+    report_store = ReportStore(scan_cache)
+    pr_change = PrChangesGenerator(root_folder, relative_changes_paths, report_store, scan_cache).generate(pr_report_file)
+    digest = None
+    if pr_change:
+        report = pr_change.pr_report
+        pr_change.pr_report = report_filter(report) if report_filter is not None and report is not None else report
+        pr_change.pr_report_loader = None
+        digest = report_store.get_digest(pr_report_file)
+    return pr_change, digest, scan_cache.take_deferred() if scan_cache else []
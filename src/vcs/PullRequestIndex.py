@@ -0,0 +1,30 @@
+class PullRequestIndex:
+    """
+    Pull requests of a repository by head branch, listed once per run so that checking whether a change was
+    already submitted takes no remote call. Pull requests opened during the run are added as they are opened.
+    """
+
+    OPEN = "open"
+
+    def __init__(self, head_prefix: str):
+        self.head_prefix = head_prefix
+        self.__entries = {}
+
+    def add(self, head_branch: str, state: str, url: str):
+        """Records a pull request, an open pull request takes precedence over closed ones with the same head branch"""
+        if head_branch in self.__entries and self.__entries[head_branch][0] == self.OPEN:
+            return
+        self.__entries[head_branch] = (state, url)
+
+    def get(self, head_branch: str) -> tuple:
+        """Gets tuple(state, url) of the pull request with the given head branch, None is returned if there is none"""
+        return self.__entries.get(head_branch)
+
+    def __contains__(self, head_branch: str) -> bool:
+        return head_branch in self.__entries
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __str__(self) -> str:
+        return "PullRequestIndex [ head_prefix=" + self.head_prefix + ", size=" + str(len(self)) + " ]"
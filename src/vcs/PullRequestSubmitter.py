@@ -1,14 +1,15 @@
 import logging
 import uuid
-import time
 import hashlib
 
 from .PullRequestInterface import PullRequestInterface
+from .PullRequestIndex import PullRequestIndex
 from .RepositoryInterface import RepositoryInterface
 from .BranchHelper import BranchHelper
 from .CommitAuthor import CommitAuthor
 from .PrChangesGenerator import FilesystemChange
 from .PrChangesGenerator import PrChange
+from .FileContent import FileContent
 from pathlib import Path
 from typing import List
 
@@ -19,8 +20,6 @@ class PullRequestSubmitter:
     PR_CONTENT_TITLE_KEY = "title"
     PR_CONTENT_BODY_KEY = "message"
 
-    __COMMIT_RETRY_LIMIT = 10
-
     __log = logging.getLogger("PullRequestSubmitter")
 
     def __init__(self, workdir:str, repository: RepositoryInterface, author: CommitAuthor, always_open_prs: bool = False):
@@ -29,6 +28,9 @@ class PullRequestSubmitter:
         self.branch_helper = BranchHelper()
         self.author = author
         self.always_open_prs = always_open_prs
+        self.pulls_indexes = {}
+        self.skipped = []
+        self.__pr_branch_refs = {}
 
     def submit(self, pr_text_content: dict, pr_change: PrChange, base_branch: str, pdf_report_path: str = None) -> PrChange:
         if self.__log.level == logging.DEBUG:
@@ -36,49 +38,88 @@ class PullRequestSubmitter:
             for fs_change in pr_change.filesystem_changes:
                 self.__log.debug("- %s", str(fs_change.rel_file_path))
 
-        labels = self.__get_pr_labels()
-
-        changes = pr_change.filesystem_changes
-        if pdf_report_path:
-            self.__log.debug("Requested addition of PDF report in PR, reading contents...")
-            pdf_report_contents = self.__read_file_bytes(str(Path(self.workdir, pdf_report_path).absolute()))
-            self.__log.debug("Read contents of PDF report %s", pdf_report_path)
-            changes.append(FilesystemChange(pdf_report_path, pdf_report_contents))
-
-        pr_branch_ref = self.__create_pr_branch_ref(base_branch, pr_change)
+        # whether the change was already submitted is decided before any write so that a run with nothing new makes none
+        changes, pr_branch_ref = self.__get_pr_branch_ref(pr_change, base_branch, pdf_report_path)
         if pr_branch_ref is None:
             print(f"Invalid branch ref was generated ({pr_branch_ref}), hence no PR will be will be opened")
+            self.skip(pr_change, "an invalid branch name was generated")
             return None
 
-        if not self.repo.create_branch(base_branch, self.branch_helper.as_branch_name(pr_branch_ref)):
-            print("Unable to create PR branch %s" % self.branch_helper.as_branch_name(pr_branch_ref))
+        if self.__is_submitted(pr_change, self.branch_helper.as_branch_name(pr_branch_ref)):
             return None
 
-        opened_prs = self.__get_pulls(self.repo.get_owner(), self.branch_helper.as_branch_name(pr_branch_ref), base_branch, self.repo.get_open_pulls)
-        closed_prs = self.__get_pulls(self.repo.get_owner(), self.branch_helper.as_branch_name(pr_branch_ref), base_branch, self.repo.get_closed_pulls)
-        if len(opened_prs) > 0 or len(closed_prs) > 0:
-            self.__log.debug("Pull request for PR change %s has already been opened", str(pr_change))
+        # the PDF report is left out, a PR is only worth opening when a manifest actually changes
+        if len(self.repo.filter_changes(base_branch, pr_change.filesystem_changes)) == 0:
+            self.skip(pr_change, "the manifests already match the ones on branch " + base_branch)
             return None
 
+        labels = self.__get_pr_labels()
         commit_message = self.__generate_commit_message(pr_change)
 
-        were_changes_committed = self.__do_commit(commit_message, self.branch_helper.as_branch_name(pr_branch_ref), changes)
+        were_changes_committed = self.__do_commit(commit_message, base_branch, self.branch_helper.as_branch_name(pr_branch_ref), changes)
         if were_changes_committed:
             new_pr = self.repo.create_pull_request(pr_text_content[self.PR_CONTENT_TITLE_KEY], pr_text_content[self.PR_CONTENT_BODY_KEY], self.branch_helper.as_branch_name(pr_branch_ref),
                                                     base_branch, labels)
             if new_pr:
                 self.__log.debug("Successful submission (%s)", new_pr.get_url())
+                self.__get_pulls_index(self.branch_helper.as_branch_name(pr_branch_ref)).add(self.branch_helper.as_branch_name(pr_branch_ref), PullRequestIndex.OPEN, new_pr.get_url())
                 pr_change.set_pr(new_pr)
             else:
                 self.__log.debug("Unexpected, unsuccessful submission")
+                self.skip(pr_change, "the pull request could not be opened")
         else:
             self.__log.error("Changes were not committed, unable to proceed with submission")
+            self.skip(pr_change, "the changes could not be committed")
 
         if pr_change.pr:
             return pr_change
         else:
             return None
 
+    def is_submitted(self, pr_change: PrChange, base_branch: str, pdf_report_path: str = None) -> bool:
+        """
+        Checks whether a pull request was already opened for the change, in which case the change is recorded as skipped.\n
+        No write is made, the pull requests of the repository are listed once and looked up in memory.
+        """
+        _, pr_branch_ref = self.__get_pr_branch_ref(pr_change, base_branch, pdf_report_path)
+        return pr_branch_ref is not None and self.__is_submitted(pr_change, self.branch_helper.as_branch_name(pr_branch_ref))
+
+    def skip(self, pr_change: PrChange, reason: str):
+        """Records that no pull request was opened for the change and why, a change is recorded once per reason"""
+        if any(skipped is pr_change and skipped_reason == reason for skipped, skipped_reason in self.skipped):
+            return
+
+        self.__log.debug("Skipping PR change %s: %s", pr_change, reason)
+        self.skipped.append((pr_change, reason))
+
+    def __is_submitted(self, pr_change: PrChange, pr_branch_name: str) -> bool:
+        existing_pr = self.__get_pulls_index(pr_branch_name).get(pr_branch_name)
+        if existing_pr is None:
+            return False
+
+        self.skip(pr_change, "a pull request was already opened (" + existing_pr[0] + "): " + existing_pr[1])
+        return True
+
+    def __get_pr_branch_ref(self, pr_change: PrChange, base_branch: str, pdf_report_path: str) -> tuple:
+        """
+        Gets tuple(changes to commit, PR branch ref) of the change, the ref is derived from the content of every changed file,
+        PDF report included, so both are computed once per change and base branch and reused by the submission
+        """
+        key = (pr_change, base_branch, pdf_report_path)
+        if key not in self.__pr_branch_refs:
+            changes = self.__get_changes(pr_change, pdf_report_path)
+            self.__pr_branch_refs[key] = (changes, self.__create_pr_branch_ref(base_branch, pr_change, changes))
+        return self.__pr_branch_refs[key]
+
+    def __get_changes(self, pr_change: PrChange, pdf_report_path: str) -> List[FilesystemChange]:
+        changes = list(pr_change.filesystem_changes)
+        if pdf_report_path:
+            self.__log.debug("Requested addition of PDF report in PR, reading contents...")
+            pdf_report_contents = FileContent(str(Path(self.workdir, pdf_report_path).absolute()))
+            self.__log.debug("Read contents of PDF report %s", pdf_report_path)
+            changes.append(FilesystemChange(pdf_report_path, pdf_report_contents))
+        return changes
+
     def __generate_commit_message(self, pr_change: PrChange):
         msg = "Autofix"
         deps = pr_change.dependencies if pr_change.dependencies is not None else []
@@ -96,19 +137,12 @@ class PullRequestSubmitter:
         else:
             return []
 
-    def __get_pulls(self, owner: str, head_branch: str, base_branch: str, pulls_supplier):
-        self.__log.debug("Getting pulls through pulls supplier %s", str(pulls_supplier))
-
-        if owner is None or owner == "":
-            pulls = pulls_supplier(head_branch, base_branch)
-            self.__log.debug("Retrieved PRs %s with head=%s and base=%s", pulls, head_branch, base_branch)
-            return pulls
-        else:
-            self.__log.debug("Attempting to fetch pulls with head branch filter key")
-            head_branch_filter = self.repo.get_head_branch_filter_key(self.branch_helper.as_branch_name(head_branch))
-            pulls = pulls_supplier(head_branch_filter, base_branch)
-            self.__log.debug("Retrieved PRs %s with head=%s and base=%s", pulls, head_branch_filter, base_branch)
-            return pulls
+    def __get_pulls_index(self, pr_branch_name: str) -> PullRequestIndex:
+        """Gets the index of the pull requests with the same head branch prefix of the given PR branch, it is built on first use"""
+        head_prefix = pr_branch_name[:pr_branch_name.rindex("/") + 1]
+        if head_prefix not in self.pulls_indexes:
+            self.pulls_indexes[head_prefix] = self.repo.get_pulls_index(head_prefix)
+        return self.pulls_indexes[head_prefix]
 
     def __edit_pr(self, pr: PullRequestInterface, title: str, body: str):
         """Helper method to only edit pr title and body where these actually change"""
@@ -125,60 +159,45 @@ class PullRequestSubmitter:
         if the_body or the_title:
             pr.edit(title=the_title, body=the_body)
 
-    def __do_commit(self, commit_message: str, branch_name: str, changes: List[FilesystemChange]) -> bool:
-        times_retried = 0
-        res = self.repo.commit_changes(self.author, commit_message, branch_name, changes)
-        while res == False and times_retried < self.__COMMIT_RETRY_LIMIT:
-            time.sleep(1)
-            res = self.repo.commit_changes(self.author, commit_message, branch_name, changes)
-            times_retried+=1
-
-        if res == False and times_retried == self.__COMMIT_RETRY_LIMIT:
+    def __do_commit(self, commit_message: str, base_branch: str, branch_name: str, changes: List[FilesystemChange]) -> bool:
+        # the PR branch is created already pointing at the commit, it is never visible without the changes
+        res = self.repo.commit_changes_to_new_branch(self.author, commit_message, base_branch, branch_name, changes)
+        if not res:
             fs_changes = []
             for change in changes:
                 fs_changes.append(change.rel_file_path)
 
-            self.__log.warning("Maximum retry limit exceeded, failed to commit changes to %s on branch %s", str(fs_changes), branch_name)
+            print("Unable to create PR branch %s" % branch_name)
+            self.__log.warning("Failed to commit changes to %s on new branch %s", str(fs_changes), branch_name)
 
         return res
 
-    def __read_file_bytes(self, path: str) -> bytes:
-        file = open(path, "rb")
-        bytes_contents = file.read()
-        file.close()
-        return bytes_contents
-
-    def __create_pr_branch_ref(self, base_branch: str, pr_change: PrChange) -> str:
+    def __create_pr_branch_ref(self, base_branch: str, pr_change: PrChange, changes: List[FilesystemChange] = None) -> str:
         pr_branch_name = self.PR_BRANCH_NAME_PREFIX
         if base_branch != self.repo.get_default_branch():
             pr_branch_name = base_branch + "_" + pr_branch_name
 
-        pr_branch_name += self.__generate_uuid(pr_change)
+        pr_branch_name += self.__generate_uuid(pr_change, changes)
         pr_branch_name = self.branch_helper.to_branch_ref(pr_branch_name)
 
         self.__log.debug("Generated PR branch ref %s", str(pr_branch_name))
         return pr_branch_name
 
-    def __generate_uuid(self, pr_change: PrChange) -> str:
+    def __generate_uuid(self, pr_change: PrChange, changes: List[FilesystemChange] = None) -> str:
+        """changes default to the ones of the PR change, the PDF report is among them when it is added to the PR"""
         if self.always_open_prs:
             return str(uuid.uuid4())
 
-        deps_seed = ""
-        deps = pr_change.dependencies
-        deps.sort()
-        for dep in deps:
-            deps_seed += dep.name+dep.version
+        # the seed is hashed piece by piece, in the same order it used to be concatenated so that the
+        # branches of PRs opened by previous runs are still recognised
+        m = hashlib.md5()
+        for dep in sorted(pr_change.dependencies):
+            m.update((dep.name+dep.version).encode("utf-8"))
 
-        manifests_seed = b''
-        manifests = pr_change.filesystem_changes
-        manifests.sort()
-        for manifest in manifests:
-            manifests_seed += manifest.content
+        for manifest in sorted(changes if changes is not None else pr_change.filesystem_changes):
+            manifest.feed(m)
 
-        seed = deps_seed.encode("utf-8")+manifests_seed
         if pr_change.manifest_info:
-            seed += Path(pr_change.manifest_info["solution"]["path"]).name.encode("utf-8")
+            m.update(Path(pr_change.manifest_info["solution"]["path"]).name.encode("utf-8"))
 
-        m = hashlib.md5()
-        m.update(seed)
         return str(uuid.UUID(m.hexdigest()))
@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+
+from pathlib import Path
+from .ScanCache import ScanCache
+
+class ReportStore:
+    """
+    Keeps the digests of the Meterian JSON reports seen during a run, the fields needed to generate PR changes.\n
+    Parsed reports are not kept, holding one at a time is left to the callers, so that memory does not grow with the number of reports.\n
+    Entries are keyed by path and invalidated when the size or modification time of the file changes.\n
+    Digests are derived from the decoded report and recorded in the scan cache when one is provided, so that a report
+    is decoded at most once per run and not at all on later runs until its full content is needed.
+    """
+
+    DIGEST_KEYS = [ "url", "autofix" ]
+
+    __log = logging.getLogger("ReportStore")
+
+    def __init__(self, scan_cache: ScanCache = None):
+        self.__entries = {}
+        self.scan_cache = scan_cache
+
+    def get(self, path: Path) -> dict:
+        """Gets the parsed report at the given path, None is returned if it can't be loaded. The report is decoded anew on each call"""
+        entry = self.__get_entry(path)
+        if entry is None:
+            return None
+
+        report = self.__load_report_json(path)
+        if report is None:
+            del self.__entries[str(path)]
+        elif entry["digest"] is None:
+            self.__put_digest(entry, path, self.__to_digest(report))
+        return report
+
+    def get_digest(self, path: Path) -> dict:
+        """Gets a lightweight view of the report at the given path only holding the fields needed to generate PR changes"""
+        return self.get_digest_and_report(path)[0]
+
+    def get_digest_and_report(self, path: Path) -> tuple:
+        """
+        Gets tuple(digest, report) of the report at the given path, the report is only decoded when its digest is not known yet
+        and is None otherwise, so that callers needing the full report later can keep it rather than decode it a second time
+        """
+        entry = self.__get_entry(path)
+        if entry is None:
+            return None, None
+
+        if entry["digest"] is None and self.scan_cache is not None:
+            entry["digest"] = self.scan_cache.get_report_digest(str(path), entry["stat"])
+
+        if entry["digest"] is None:
+            report = self.get(path)
+            return (entry["digest"], report) if report is not None else (None, None)
+        return entry["digest"], None
+
+    def put_digest(self, path: Path, digest: dict):
+        """Records the digest of the report at the given path derived elsewhere, i.e. by a worker process, so that it is not decoded again here"""
+        entry = self.__get_entry(path)
+        if entry is not None and digest is not None:
+            self.__put_digest(entry, path, digest)
+
+    def loader(self, path: Path):
+        """Gets a callable loading the report at the given path through this store"""
+        return lambda: self.get(path)
+
+    def __to_digest(self, report: dict) -> dict:
+        return { key: report[key] for key in self.DIGEST_KEYS if key in report }
+
+    def __put_digest(self, entry: dict, path: Path, digest: dict):
+        entry["digest"] = digest
+        if self.scan_cache is not None:
+            self.scan_cache.put_report_digest(str(path), entry["stat"], digest)
+
+    def __get_entry(self, path: Path) -> dict:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.__log.debug("Unable to stat report at %s", str(path), exc_info=1)
+            self.__entries.pop(str(path), None)
+            return None
+
+        key = str(path)
+        entry = self.__entries.get(key)
+        if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            entry = { "mtime": stat.st_mtime_ns, "size": stat.st_size, "stat": stat, "digest": None }
+            self.__entries[key] = entry
+        return entry
+
+    def __load_report_json(self, path: Path) -> dict:
+        try:
+            with open(path, encoding="utf-8") as stream:
+                report = json.load(stream)
+            self.__log.debug("Loaded report %s", str(path))
+            return report
+        except:
+            self.__log.debug("Unable to load report at %s", str(path), exc_info=1)
+            return None
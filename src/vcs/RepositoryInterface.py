@@ -5,6 +5,7 @@ from typing import List
 from .LabelData import LabelData
 from .IssueInterface import IssueInterface
 from .PullRequestInterface import PullRequestInterface
+from .PullRequestIndex import PullRequestIndex
 from .CommitAuthor import CommitAuthor
 from .PrChangesGenerator import FilesystemChange
 
@@ -35,6 +36,10 @@ class RepositoryInterface(metaclass=abc.ABCMeta):
                 callable(subclass.commit_change) and
                 hasattr(subclass, 'commit_changes') and
                 callable(subclass.commit_changes) and
+                hasattr(subclass, 'commit_changes_to_new_branch') and
+                callable(subclass.commit_changes_to_new_branch) and
+                hasattr(subclass, 'filter_changes') and
+                callable(subclass.filter_changes) and
                 hasattr(subclass, 'create_label') and
                 callable(subclass.create_label) and
                 hasattr(subclass, 'create_pull_request') and
@@ -43,6 +48,8 @@ class RepositoryInterface(metaclass=abc.ABCMeta):
                 callable(subclass.get_open_pulls) and
                 hasattr(subclass, 'get_closed_pulls') and
                 callable(subclass.get_closed_pulls) and
+                hasattr(subclass, 'get_pulls_index') and
+                callable(subclass.get_pulls_index) and
                 hasattr(subclass, 'create_issue') and
                 callable(subclass.create_issue) and
                 hasattr(subclass, 'get_pr_label') and
@@ -93,6 +100,19 @@ class RepositoryInterface(metaclass=abc.ABCMeta):
         """Commits multiple changes on a specific branch"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def commit_changes_to_new_branch(self, author: CommitAuthor, message: str, base_branch: str, new_branch: str, changes: List[FilesystemChange]) -> bool:
+        """
+        Commits multiple changes on top of the head of the base branch and creates the new branch pointing at the resulting commit.\n
+        Should the new branch already exist the changes are committed on it instead
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def filter_changes(self, branch: str, changes: List[FilesystemChange]) -> List[FilesystemChange]:
+        """Gets the changes whose content differs from the one of the same file on the branch, without downloading any file content"""
+        raise NotImplementedError
+
     @abc.abstractmethod
     def create_label(self, name: str, description: str, color: str, text_color: str) -> bool:
         """Creates new label"""
@@ -117,6 +137,11 @@ class RepositoryInterface(metaclass=abc.ABCMeta):
         """Gets a list of closed pull requests possibly filtered by head branch and base branch"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_pulls_index(self, head_prefix: str) -> PullRequestIndex:
+        """Gets an index of the pull requests in any state whose head branch starts with the given prefix, listing them in one pass"""
+        raise NotImplementedError
+
     @abc.abstractmethod
     def create_issue(self, title: str, body: str, labels: List[str] = []) -> IssueInterface:
         """
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import sqlite3
+
+from pathlib import Path
+
+class ScanCache:
+    """
+    On-disk cache of the work directory scan persisted between runs on the same checkout.\n
+    Report digests and manifest content hashes are keyed by path and reused as long as inode, modification time and size are unchanged.
+    Directory listings are not kept, looking one up costs about as much as listing the directory again.\n
+    Copies handed to worker processes only read, their writes are deferred and applied by the owning process
+    so that a single process ever writes to the database.
+    """
+
+    DEFAULT_DIR = ".meterian-pr"
+    DEFAULT_FILENAME = "scan.db"
+
+    __SCHEMA = [
+        "DROP TABLE IF EXISTS dirs",
+        "CREATE TABLE IF NOT EXISTS reports (path TEXT PRIMARY KEY, inode INTEGER, mtime INTEGER, size INTEGER, digest TEXT)",
+        "CREATE TABLE IF NOT EXISTS manifests (path TEXT PRIMARY KEY, inode INTEGER, mtime INTEGER, size INTEGER, hash TEXT)"
+    ]
+
+    __log = logging.getLogger("ScanCache")
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.__connection = None
+        self.__disabled = False
+        self.__deferred = None
+
+    def in_work_dir(work_dir: Path):
+        return ScanCache(Path(work_dir, ScanCache.DEFAULT_DIR, ScanCache.DEFAULT_FILENAME))
+
+    def get_report_digest(self, path: str, stat: os.stat_result) -> dict:
+        row = self.__fetch("SELECT digest FROM reports WHERE path = ? AND inode = ? AND mtime = ? AND size = ?", (path, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        return json.loads(row[0]) if row else None
+
+    def put_report_digest(self, path: str, stat: os.stat_result, digest: dict):
+        self.__store("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)", (path, stat.st_ino, stat.st_mtime_ns, stat.st_size, json.dumps(digest)))
+
+    def get_manifest_hash(self, path: str, stat: os.stat_result) -> str:
+        row = self.__fetch("SELECT hash FROM manifests WHERE path = ? AND inode = ? AND mtime = ? AND size = ?", (path, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        return row[0] if row else None
+
+    def put_manifest_hash(self, path: str, stat: os.stat_result, content_hash: str):
+        self.__store("INSERT OR REPLACE INTO manifests VALUES (?, ?, ?, ?, ?)", (path, stat.st_ino, stat.st_mtime_ns, stat.st_size, content_hash))
+
+    def take_deferred(self) -> list:
+        """Gets the writes deferred by a worker copy of the cache since they were last taken"""
+        deferred = self.__deferred if self.__deferred is not None else []
+        if self.__deferred is not None:
+            self.__deferred = []
+        return deferred
+
+    def apply(self, deferred: list):
+        """Applies the writes deferred by a worker copy of the cache"""
+        for query, params in deferred:
+            self.__store(query, params)
+
+    def flush(self):
+        """Persists pending changes"""
+        if self.__connection is not None:
+            try:
+                self.__connection.commit()
+            except sqlite3.Error:
+                self.__log.debug("Unable to persist scan cache %s", str(self.db_path), exc_info=1)
+
+    def close(self):
+        if self.__connection is not None:
+            self.flush()
+            self.__connection.close()
+            self.__connection = None
+
+    def __fetch(self, query: str, params: tuple) -> tuple:
+        try:
+            connection = self.__connect()
+            return connection.execute(query, params).fetchone() if connection else None
+        except sqlite3.Error:
+            self.__log.debug("Unable to query scan cache %s", str(self.db_path), exc_info=1)
+            return None
+
+    def __store(self, query: str, params: tuple):
+        if self.__deferred is not None:
+            self.__deferred.append((query, params))
+            return
+
+        try:
+            connection = self.__connect()
+            if connection:
+                connection.execute(query, params)
+        except sqlite3.Error:
+            self.__log.debug("Unable to update scan cache %s", str(self.db_path), exc_info=1)
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__connection is None and not self.__disabled:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(str(self.db_path), timeout=30)
+                for statement in self.__SCHEMA:
+                    connection.execute(statement)
+                connection.commit()
+                self.__connection = connection
+                self.__log.debug("Opened scan cache %s", str(self.db_path))
+            except (OSError, sqlite3.Error):
+                self.__disabled = True
+                self.__log.warning("Unable to open scan cache %s, the work directory will be fully scanned", str(self.db_path))
+                self.__log.debug("Unable to open scan cache %s", str(self.db_path), exc_info=1)
+        return self.__connection
+
+    def __getstate__(self):
+        # connections can't be shared across processes, each process opens its own
+        return { "db_path": self.db_path }
+
+    def __setstate__(self, state):
+        self.db_path = state["db_path"]
+        self.__connection = None
+        self.__disabled = False
+        self.__deferred = []
@@ -4,6 +4,7 @@ import logging
 
 from .VcsHubInterface import VcsHubInterface
 from .github.Github import Github
+from .github.GithubGraphQLClient import GithubGraphQLClient
 from github import Github as PyGithub
 
 from .gitlab.Gitlab import Gitlab
@@ -18,9 +19,10 @@ class VcsHubFactory:
 
     __log = logging.getLogger("VcsHubFactory")
 
-    def __init__(self, platform: str, api_base_url: str):
+    def __init__(self, platform: str, api_base_url: str, github_graphql: bool = False):
         self.platform = platform
         self.api_base_url = api_base_url
+        self.github_graphql = github_graphql
 
     def create(self) -> VcsHubInterface:
         if self.platform == "github":
@@ -35,7 +37,12 @@ class VcsHubFactory:
                     self.__check_good_gh_credentials(pyGithub)
 
                     self.__log.debug("Currently authenticated as %s", str(pyGithub.get_user()))
-                    vcshub = Github(pyGithub)
+                    graphql_client = None
+                    if self.github_graphql:
+                        graphql_client = GithubGraphQLClient(os.environ[envvar], GithubGraphQLClient.graphql_url(self.api_base_url))
+                        self.__log.debug("Branches, commits and pull requests will be created through the GraphQL API at %s", graphql_client.url)
+
+                    vcshub = Github(pyGithub, lambda: PyGithub(os.environ[envvar], base_url=self.api_base_url), graphql_client)
                     self.__log.debug("Created instace of GitHub %s", vcshub)
                     return vcshub
                 except Exception as ex:
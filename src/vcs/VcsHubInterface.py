@@ -21,4 +21,8 @@ class VcsHubInterface(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def get_issues(self, repository: RepositoryInterface, title: str) -> List[IssueInterface]:
         """Searches for a repository issue by its title"""
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the connections held by the platform, if any"""
+        pass
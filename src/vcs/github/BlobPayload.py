@@ -0,0 +1,77 @@
+import base64
+
+from github.GithubException import GithubException
+from github.Repository import Repository as PyGithubRepository
+
+class BlobPayload:
+    """
+    File-like JSON payload of the git blobs API whose base64 encoded content is produced chunk by chunk as the payload
+    is read, so that uploading a large file holds no more than a chunk of its encoding in memory.\n
+    The length of the payload is known upfront so that it is sent with a Content-Length rather than chunked.
+    """
+
+    # a multiple of 3 so that the encodings of consecutive chunks can be concatenated without padding in between
+    CHUNK_SIZE = 3 * 64 * 1024
+
+    __PREFIX = b'{"encoding":"base64","content":"'
+    __SUFFIX = b'"}'
+
+    def __init__(self, content):
+        """content is any bytes-like object, i.e. the memory mapped view of a file"""
+        self.content = memoryview(content)
+        self.__length = len(self.__PREFIX) + 4 * ((len(self.content) + 2) // 3) + len(self.__SUFFIX)
+        self.__offset = 0
+        self.__pending = memoryview(self.__PREFIX)
+        self.__pending_offset = 0
+        self.__done = False
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def read(self, size: int = -1) -> bytes:
+        data = bytearray()
+        while size < 0 or len(data) < size:
+            if self.__pending_offset >= len(self.__pending) and not self.__next_chunk():
+                break
+
+            end = len(self.__pending) if size < 0 else min(len(self.__pending), self.__pending_offset + size - len(data))
+            data += self.__pending[self.__pending_offset:end]
+            self.__pending_offset = end
+        return bytes(data)
+
+    def __next_chunk(self) -> bool:
+        if self.__offset < len(self.content):
+            self.__pending = memoryview(base64.b64encode(self.content[self.__offset:self.__offset + self.CHUNK_SIZE]))
+            self.__offset += self.CHUNK_SIZE
+        elif not self.__done:
+            self.__pending = memoryview(self.__SUFFIX)
+            self.__done = True
+        else:
+            return False
+
+        self.__pending_offset = 0
+        return True
+
+    def create_git_blob(repo: PyGithubRepository, content) -> str:
+        """
+        Creates a blob of the given content in the repository and gets its SHA, the payload is streamed as the request is sent.\n
+        PyGithub JSON encodes inputs in memory, the payload is handed to the requester of the repository as a raw body like
+        release assets are. This relies on the requester of PyGithub, it is kept here so that it can be checked in isolation.
+        """
+        payload = BlobPayload(content)
+        try:
+            _, data = repo._requester.requestMemoryBlobAndCheck("POST", repo.url + "/git/blobs", None, { "Content-Type": "application/json" }, payload)
+        finally:
+            payload.close()
+
+        if not isinstance(data, dict) or "sha" not in data:
+            raise GithubException(-1, "Unexpected response to blob creation: " + str(data), None)
+        return data["sha"]
+
+    def close(self):
+        """Releases the view of the content, a memory mapped file can't be closed while it is still viewed"""
+        self.__pending = memoryview(b"")
+        self.content.release()
+
+    def __str__(self) -> str:
+        return "BlobPayload [ length=" + str(len(self)) + " ]"
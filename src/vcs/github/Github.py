@@ -3,6 +3,8 @@ import logging
 from github import Github as PyGithub
 from .GithubIssue import GithubIssue
 from .GithubRepo import GithubRepo
+from .GithubGraphQLClient import GithubGraphQLClient
+from .GithubGraphQLRepo import GithubGraphQLRepo
 from ..VcsHubInterface import VcsHubInterface
 from ..RepositoryInterface import RepositoryInterface
 from ..IssueInterface import IssueInterface
@@ -14,20 +16,45 @@ class Github(VcsHubInterface):
 
     __log = logging.getLogger("Github")
 
-    def __init__(self, pyGithub: PyGithub):
+    def __init__(self, pyGithub: PyGithub, pyGithub_factory = None, graphql_client: GithubGraphQLClient = None):
+        """
+        pyGithub_factory is an optional callable creating new authenticated PyGithub instances, used to work on repositories concurrently.\n
+        When a graphql_client is given repositories create branches, commits and pull requests through the GraphQL API.
+        """
         self.pyGithub = pyGithub
+        self.pyGithub_factory = pyGithub_factory
+        self.graphql_client = graphql_client
 
     def get_repository(self, name):
         try:
             self.__log.debug("Currently authenticated as %s", str(self.pyGithub.get_user()))
             self.__log.debug("Getting repository %s", name)
-            repo = self.pyGithub.get_repo(name)
-            return GithubRepo(repo)
+            if self.graphql_client is not None:
+                repo = GithubGraphQLRepo(self.pyGithub.get_repo(name), self.graphql_client, self.__repo_factory(name))
+            else:
+                repo = GithubRepo(self.pyGithub.get_repo(name), self.__repo_factory(name))
+            self.__load_metadata(repo)
+            return repo
         except UnknownObjectException as ex:
             self.__log.error("Repo %s was not found: %s", name, str(ex))
             self.__log.debug("Repo %s was not found", name, exc_info=1)
             return None
     
+    def __load_metadata(self, repo: GithubRepo):
+        try:
+            repo.load_metadata()
+        except:
+            self.__log.debug("Unable to load metadata of repository %s upfront", repo.pyGithubRepo, exc_info=1)
+
+    def __repo_factory(self, full_name: str):
+        if self.pyGithub_factory is None:
+            return None
+        return lambda: self.pyGithub_factory().get_repo(full_name, lazy=True)
+
+    def close(self):
+        if self.graphql_client is not None:
+            self.graphql_client.close()
+
     def get_issues(self, repository: RepositoryInterface, title: str) -> List[IssueInterface]:
         query="repo:" + repository.get_full_name() + " type:issue " + title + " in:title"
         try:
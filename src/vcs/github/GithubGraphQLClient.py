@@ -0,0 +1,50 @@
+import logging
+import requests
+
+from github.GithubException import GithubException
+from requests.adapters import HTTPAdapter
+
+class GithubGraphQLClient:
+    """Posts queries and mutations to the GitHub GraphQL API over a single keep-alive session"""
+
+    DEFAULT_TIMEOUT = 60
+
+    __log = logging.getLogger("GithubGraphQLClient")
+
+    def __init__(self, token: str, url: str, timeout: float = DEFAULT_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.headers.update({
+            "Authorization": "bearer " + token,
+            "Accept": "application/vnd.github+json"
+        })
+
+    def graphql_url(api_base_url: str) -> str:
+        """Gets the GraphQL endpoint matching a REST API base URL, GitHub Enterprise serves it on /api/graphql rather than /api/v3"""
+        url = api_base_url.rstrip("/")
+        if url.endswith("/v3"):
+            url = url[:-len("/v3")]
+        return url + "/graphql"
+
+    def execute(self, query: str, variables: dict = None) -> dict:
+        """Gets the data of a query or mutation, a GithubException is raised when the call fails or the API reports errors"""
+        response = self.session.post(self.url, json={ "query": query, "variables": variables or {} }, timeout=self.timeout)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = { "message": response.text }
+
+        if response.status_code != 200:
+            raise GithubException(response.status_code, payload, response.headers)
+
+        if payload.get("errors"):
+            self.__log.debug("GraphQL call returned errors %s", str(payload["errors"]))
+            raise GithubException(response.status_code, payload["errors"], response.headers)
+
+        return payload["data"]
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,46 @@
+import logging
+
+from ..PullRequestInterface import PullRequestInterface
+from .GithubGraphQLClient import GithubGraphQLClient
+from github import GithubException
+
+class GithubGraphQLPullRequest(PullRequestInterface):
+
+    UPDATE_PULL_REQUEST = """
+        mutation($input: UpdatePullRequestInput!) {
+            updatePullRequest(input: $input) { pullRequest { id url title body } }
+        }
+    """
+
+    __log = logging.getLogger("GithubGraphQLPullRequest")
+
+    def __init__(self, client: GithubGraphQLClient, pull_request: dict):
+        """pull_request is the pull request node as returned by the GraphQL API, with fields id, url, title and body"""
+        self.client = client
+        self.pull_request = pull_request
+
+    def edit(self, title: str = None, body: str = None):
+        pr_input = { "pullRequestId": self.pull_request["id"] }
+        if title is not None:
+            pr_input["title"] = title
+        if body is not None:
+            pr_input["body"] = body
+
+        try:
+            data = self.client.execute(self.UPDATE_PULL_REQUEST, { "input": pr_input })
+            self.pull_request = data["updatePullRequest"]["pullRequest"]
+        except GithubException:
+            self.__log.warning("Unexpected exception caught while trying to edit PR %s", self.get_url())
+            self.__log.debug("GithubException caught attempting to edit PR", exc_info=1)
+
+    def get_url(self) -> str:
+        return self.pull_request["url"]
+
+    def get_title(self) -> str:
+        return self.pull_request["title"]
+
+    def get_body(self) -> str:
+        return self.pull_request["body"]
+
+    def __str__(self) -> str:
+        return "GithubGraphQLPullRequest [ title=" + self.get_title() + ", url=" + self.get_url() + " ]"
@@ -0,0 +1,304 @@
+import logging
+
+from github.GithubException import GithubException
+from github.Repository import Repository as PyGithubRepository
+from ..CommitAuthor import CommitAuthor
+from ..PrChangesGenerator import FilesystemChange
+from ..PullRequestInterface import PullRequestInterface
+from ..PullRequestIndex import PullRequestIndex
+from ..gitlab.CommitData import CommitData
+from .GithubRepo import GithubRepo
+from .GithubGraphQLClient import GithubGraphQLClient
+from .GithubGraphQLPullRequest import GithubGraphQLPullRequest
+from typing import List
+
+class GithubGraphQLRepo(GithubRepo):
+    """
+    GitHub repository creating branches, commits and pull requests through the GraphQL API.\n
+    Branches and labels are looked up in batches and remembered for the rest of the run, a commit of any number of
+    changes is a single createCommitOnBranch call. Everything else is inherited from the REST implementation.
+    """
+
+    CREATE_REF = """
+        mutation($input: CreateRefInput!) {
+            createRef(input: $input) { ref { target { oid } } }
+        }
+    """
+
+    CREATE_COMMIT_ON_BRANCH = """
+        mutation($input: CreateCommitOnBranchInput!) {
+            createCommitOnBranch(input: $input) { commit { oid } }
+        }
+    """
+
+    # mutations of a document are run in order, the branch is created and committed to in a single round trip.
+    # The branch is not rolled back when the commit fails, it is then deleted
+    CREATE_BRANCH_WITH_COMMIT = """
+        mutation($ref: CreateRefInput!, $commit: CreateCommitOnBranchInput!) {
+            createRef(input: $ref) { ref { target { oid } } }
+            createCommitOnBranch(input: $commit) { commit { oid } }
+        }
+    """
+
+    BRANCH_REF = """
+        query($owner: String!, $name: String!, $ref: String!) {
+            repository(owner: $owner, name: $name) { ref(qualifiedName: $ref) { id target { oid } } }
+        }
+    """
+
+    DELETE_REF = """
+        mutation($input: DeleteRefInput!) {
+            deleteRef(input: $input) { clientMutationId }
+        }
+    """
+
+    CREATE_PULL_REQUEST = """
+        mutation($input: CreatePullRequestInput!) {
+            createPullRequest(input: $input) { pullRequest { id url title body } }
+        }
+    """
+
+    ADD_LABELS = """
+        mutation($input: AddLabelsToLabelableInput!) {
+            addLabelsToLabelable(input: $input) { clientMutationId }
+        }
+    """
+
+    PULL_REQUESTS = """
+        query($owner: String!, $name: String!, $cursor: String) {
+            repository(owner: $owner, name: $name) {
+                pullRequests(first: 100, after: $cursor) {
+                    nodes { headRefName state url headRepositoryOwner { login } }
+                    pageInfo { hasNextPage endCursor }
+                }
+            }
+        }
+    """
+
+    __log = logging.getLogger("GithubGraphQLRepo")
+
+    def __init__(self, pyGithubRepo: PyGithubRepository, client: GithubGraphQLClient, repo_factory = None):
+        super().__init__(pyGithubRepo, repo_factory)
+        self.client = client
+        self.__repository_id = None
+        self.__branch_oids = {}
+        self.__label_ids = {}
+
+    def load_branches(self, names: List[str]):
+        """Looks up the head commit of the given branches not seen yet in a single query"""
+        missing = [ name for name in dict.fromkeys(names) if name not in self.__branch_oids ]
+        if len(missing) > 0 or self.__repository_id is None:
+            self.__query_repository(missing, [])
+
+    def is_remote_branch(self, name: str) -> bool:
+        try:
+            self.load_branches([name])
+            return self.__branch_oids[name] is not None
+        except GithubException:
+            self.__log.warning("Unexpected exception caught while fetching branch %s remotely", name)
+            self.__log.debug("Unexpected exception caught while fetching branch %s remotely", name, exc_info=1)
+
+        return False
+
+    def create_branch(self, parent_branch_name: str, new_branch_name: str) -> bool:
+        try:
+            self.load_branches([new_branch_name, parent_branch_name])
+            if self.__branch_oids[new_branch_name] is not None:
+                self.__log.debug("Branch %s already exists, it will not be created", new_branch_name)
+                return True
+
+            source_oid = self.__branch_oids[parent_branch_name]
+            if source_oid is None:
+                self.__log.warning("Branch %s was not found, branch %s will not be created", parent_branch_name, new_branch_name)
+                return False
+
+            self.client.execute(self.CREATE_REF, { "input": {
+                "repositoryId": self.__repository_id,
+                "name": self.branch_helper.as_branch_ref(new_branch_name),
+                "oid": source_oid
+            }})
+            self.__branch_oids[new_branch_name] = source_oid
+            self.__log.debug("Created new branch %s", new_branch_name)
+            return True
+        except GithubException:
+            self.__log.debug("Unexpected exception caught while dealing with branch creation", exc_info=1)
+            return False
+
+    def commit_change(self, author: CommitAuthor, message: str, branch: str, path: str, content: bytes) -> bool:
+        return self.commit_changes(author, message, branch, [ FilesystemChange(path, content) ])
+
+    def commit_changes(self, author: CommitAuthor, message: str, branch: str, changes: List[FilesystemChange]) -> bool:
+        if len(changes) < 1:
+            self.__log.debug("No changes provided to commit: changes=%s", str(changes))
+            return False
+
+        if self.__has_large_change(changes):
+            try:
+                return super().commit_changes(author, message, branch, changes)
+            finally:
+                # the branch was moved by the REST implementation, it will be looked up again
+                self.__branch_oids.pop(branch, None)
+
+        try:
+            self.load_branches([branch])
+            head_oid = self.__branch_oids[branch]
+            if head_oid is None:
+                self.__log.debug("Branch %s was not found, no commit will be made at this stage", branch)
+                return False
+
+            data = self.client.execute(self.CREATE_COMMIT_ON_BRANCH, { "input": self.__commit_input(message, branch, head_oid, changes) })
+            self.__branch_oids[branch] = data["createCommitOnBranch"]["commit"]["oid"]
+            return True
+        except:
+            # the branch may have moved on meanwhile, it will be looked up again
+            self.__branch_oids.pop(branch, None)
+            self.__log.warning("Unexpected exception caught while dealing with multiple changes commit", exc_info=1)
+            return False
+
+    def commit_changes_to_new_branch(self, author: CommitAuthor, message: str, base_branch: str, new_branch: str, changes: List[FilesystemChange]) -> bool:
+        if len(changes) < 1:
+            self.__log.debug("No changes provided to commit: changes=%s", str(changes))
+            return False
+
+        if self.__has_large_change(changes):
+            try:
+                return super().commit_changes_to_new_branch(author, message, base_branch, new_branch, changes)
+            finally:
+                self.__branch_oids.pop(new_branch, None)
+
+        try:
+            self.load_branches([new_branch, base_branch])
+            if self.__branch_oids[new_branch] is not None:
+                self.__log.debug("Branch %s already exists, changes will be committed on it", new_branch)
+                return self.commit_changes(author, message, new_branch, changes)
+
+            base_oid = self.__branch_oids[base_branch]
+            if base_oid is None:
+                self.__log.warning("Branch %s was not found, branch %s will not be created", base_branch, new_branch)
+                return False
+
+            try:
+                data = self.client.execute(self.CREATE_BRANCH_WITH_COMMIT, {
+                    "ref": { "repositoryId": self.__repository_id, "name": self.branch_helper.as_branch_ref(new_branch), "oid": base_oid },
+                    "commit": self.__commit_input(message, new_branch, base_oid, changes)
+                })
+            except GithubException:
+                self.__delete_empty_branch(new_branch, base_oid)
+                raise
+            self.__branch_oids[new_branch] = data["createCommitOnBranch"]["commit"]["oid"]
+            self.__log.debug("Created new branch %s pointing at commit %s", new_branch, self.__branch_oids[new_branch])
+            return True
+        except:
+            # the branch may have been created even though the commit failed, it will be looked up again
+            self.__branch_oids.pop(new_branch, None)
+            self.__log.warning("Unexpected exception caught while committing changes to new branch %s", new_branch, exc_info=1)
+            return False
+
+    def __delete_empty_branch(self, name: str, base_oid: str):
+        """Deletes a branch left without the commit it was created for, a branch that moved past the base commit is left untouched"""
+        try:
+            owner, _, repo_name = self.get_full_name().partition("/")
+            ref = self.client.execute(self.BRANCH_REF, { "owner": owner, "name": repo_name, "ref": self.branch_helper.as_branch_ref(name) })["repository"]["ref"]
+            if ref is not None and ref["target"]["oid"] == base_oid:
+                self.client.execute(self.DELETE_REF, { "input": { "refId": ref["id"] } })
+                self.__log.debug("Deleted branch %s left empty by a failed commit", name)
+        except GithubException:
+            self.__log.warning("Unable to delete branch %s left empty by a failed commit", name)
+            self.__log.debug("Unable to delete branch %s left empty by a failed commit", name, exc_info=1)
+
+    def __has_large_change(self, changes: List[FilesystemChange]) -> bool:
+        """createCommitOnBranch takes the base64 encoded contents inline, large files are committed through the git data API instead"""
+        large = [ change.rel_file_path for change in changes if change.size > self.LARGE_FILE_THRESHOLD ]
+        if len(large) > 0:
+            self.__log.debug("%s larger than %d bytes, changes will be committed through the git data API", str(large), self.LARGE_FILE_THRESHOLD)
+            return True
+        return False
+
+    def __commit_input(self, message: str, branch: str, head_oid: str, changes: List[FilesystemChange]) -> dict:
+        # the commit is attributed to the owner of the token, as with commits made through the REST git data API
+        headline, _, body = message.partition("\n")
+        return {
+            "branch": { "repositoryNameWithOwner": self.get_full_name(), "branchName": branch },
+            "message": { "headline": headline, "body": body.strip() },
+            "fileChanges": { "additions": [ { "path": change.rel_file_path, "contents": CommitData.to_base64(change.content).decode() } for change in changes ] },
+            "expectedHeadOid": head_oid
+        }
+
+    def create_pull_request(self, title: str, body: str, head: str, base: str, labels: List[str] = []) -> PullRequestInterface:
+        try:
+            missing_labels = [ label for label in dict.fromkeys(labels) if label not in self.__label_ids ]
+            if len(missing_labels) > 0 or self.__repository_id is None:
+                self.__query_repository([], missing_labels)
+
+            data = self.client.execute(self.CREATE_PULL_REQUEST, { "input": {
+                "repositoryId": self.__repository_id,
+                "title": title,
+                "body": body,
+                "headRefName": head,
+                "baseRefName": base
+            }})
+            pr = GithubGraphQLPullRequest(self.client, data["createPullRequest"]["pullRequest"])
+        except GithubException as ex:
+            self.__log.error("Unexpected exception caught while creating pull request: %s", str(ex))
+            self.__log.debug("Unexpected exception caught while creating pull request", exc_info=1)
+            return None
+
+        label_ids = [ self.__label_ids[label] for label in labels if self.__label_ids.get(label) is not None ]
+        if len(label_ids) > 0:
+            try:
+                self.client.execute(self.ADD_LABELS, { "input": { "labelableId": pr.pull_request["id"], "labelIds": label_ids } })
+            except GithubException:
+                self.__log.warning("Unable to label pull request %s", pr.get_url())
+                self.__log.debug("Unable to label pull request %s", pr.get_url(), exc_info=1)
+        else:
+            self.__log.debug("No labels provided or found, PR will be unlabelled")
+
+        self.__log.debug("Created pull request %s", str(pr))
+        return pr
+
+    def get_pulls_index(self, head_prefix: str) -> PullRequestIndex:
+        index = PullRequestIndex(head_prefix)
+        owner, _, name = self.get_full_name().partition("/")
+        variables = { "owner": owner, "name": name, "cursor": None }
+        while True:
+            pulls = self.client.execute(self.PULL_REQUESTS, variables)["repository"]["pullRequests"]
+            for pull in pulls["nodes"]:
+                # pull requests from forks with a branch of the same name are left out
+                head_owner = pull["headRepositoryOwner"]["login"] if pull["headRepositoryOwner"] else None
+                if pull["headRefName"].startswith(head_prefix) and head_owner == self.get_owner():
+                    index.add(pull["headRefName"], pull["state"].lower(), pull["url"])
+
+            if not pulls["pageInfo"]["hasNextPage"]:
+                break
+            variables["cursor"] = pulls["pageInfo"]["endCursor"]
+
+        self.__log.debug("Indexed pull requests %s", str(index))
+        return index
+
+    def __query_repository(self, branches: List[str], labels: List[str]):
+        """Gets the id of the repository along with the head commit of the given branches and the id of the given labels in one query"""
+        owner, _, name = self.get_full_name().partition("/")
+        declarations = [ "$owner: String!", "$name: String!" ]
+        fields = [ "id" ]
+        variables = { "owner": owner, "name": name }
+
+        for i, branch in enumerate(branches):
+            declarations.append("$b%d: String!" % i)
+            fields.append("b%d: ref(qualifiedName: $b%d) { target { oid } }" % (i, i))
+            variables["b%d" % i] = self.branch_helper.as_branch_ref(branch)
+
+        for i, label in enumerate(labels):
+            declarations.append("$l%d: String!" % i)
+            fields.append("l%d: label(name: $l%d) { id }" % (i, i))
+            variables["l%d" % i] = label
+
+        query = "query(" + ", ".join(declarations) + ") { repository(owner: $owner, name: $name) { " + " ".join(fields) + " } }"
+        repository = self.client.execute(query, variables)["repository"]
+
+        self.__repository_id = repository["id"]
+        for i, branch in enumerate(branches):
+            ref = repository["b%d" % i]
+            self.__branch_oids[branch] = ref["target"]["oid"] if ref else None
+        for i, label in enumerate(labels):
+            found = repository["l%d" % i]
+            self.__label_ids[label] = found["id"] if found else None
@@ -1,7 +1,10 @@
 import logging
+import queue
 from sys import exc_info
 import traceback
 
+from concurrent.futures import ThreadPoolExecutor
+
 from github.GithubException import GithubException
 from github.GithubException import UnknownObjectException
 from github.Label import Label
@@ -16,11 +19,13 @@ from ..PullRequestInterface import PullRequestInterface
 from ..RepositoryInterface import RepositoryInterface
 from ..IssueInterface import IssueInterface
 from .GithubPullRequest import GithubPullRequest
+from ..PullRequestIndex import PullRequestIndex
 from ..BranchHelper import BranchHelper
 from typing import List
 from github import GithubObject
 from ..LabelData import LabelData
 from ..gitlab.CommitData import CommitData
+from .BlobPayload import BlobPayload
 
 class GithubRepo(RepositoryInterface):
 
@@ -43,27 +48,61 @@ class GithubRepo(RepositoryInterface):
         RepositoryInterface.METERIAN_LABEL_TEXT_COLOR
     )
 
+    UPLOAD_WORKERS = 4
+    DEFAULT_INLINE_THRESHOLD = 64 * 1024
+    # the contents API handles files up to 1MB, larger ones are committed through git blobs and trees
+    LARGE_FILE_THRESHOLD = 1024 * 1024
+
+    __METADATA_LOADERS = {
+        "full_name": lambda repo: repo.full_name,
+        "owner": lambda repo: repo.organization.login if repo.organization else repo.owner.login,
+        "default_branch": lambda repo: repo.default_branch,
+        "has_issues": lambda repo: repo.has_issues
+    }
+
     __log = logging.getLogger("GithubRepo")
 
-    def __init__(self, pyGithubRepo: PyGithubRepository):
+    def __init__(self, pyGithubRepo: PyGithubRepository, repo_factory = None):
+        """
+        repo_factory is an optional callable creating new PyGithub repository instances backed by their own connection,
+        when given blobs are uploaded concurrently as PyGithub instances can't be shared across threads
+        """
         self.pyGithubRepo = pyGithubRepo
         self.branch_helper = BranchHelper()
+        self.repo_factory = repo_factory
+        self.__upload_repos = queue.SimpleQueue()
+        self.inline_threshold = self.DEFAULT_INLINE_THRESHOLD
+        self.saved_blob_calls = 0
+        self.created_blobs = 0
+        self.__branch_shas = {}
+        self.__tree_snapshots = {}
+        self.__truncated_trees = set()
+        self.__metadata = {}
+        self.__labels = {}
+
+    def load_metadata(self):
+        """
+        Snapshots the repository metadata used throughout a run so that attributes of lazily completed PyGithub
+        objects are only accessed once, values not loaded upfront are loaded and remembered on first use
+        """
+        for key in self.__METADATA_LOADERS:
+            self.__get_metadata(key)
+        self.__log.debug("Loaded metadata of repository %s", self.__metadata["full_name"])
+
+    def __get_metadata(self, key: str):
+        if key not in self.__metadata:
+            self.__metadata[key] = self.__METADATA_LOADERS[key](self.pyGithubRepo)
+        return self.__metadata[key]
 
     def get_full_name(self) -> str:
-        return self.pyGithubRepo.full_name
+        return self.__get_metadata("full_name")
 
     def get_owner(self) -> str:
-        if self.pyGithubRepo.organization:
-            return self.pyGithubRepo.organization.login
-        else:
-            return self.pyGithubRepo.owner.login
+        return self.__get_metadata("owner")
 
     def is_remote_branch(self, name: str) -> bool:
         try:
-            self.pyGithubRepo.get_branch(name)
-            return True
-        except UnknownObjectException:
-            self.__log.debug("Branch %s was not found remotely", name)
+            return self.__get_branch_sha(name) is not None
         except GithubException:
             self.__log.warning("Unexpected exception caught while fetching branch %s remotely", name)
             self.__log.debug(traceback.format_exc())
@@ -71,19 +110,24 @@ class GithubRepo(RepositoryInterface):
         return False
 
     def get_default_branch(self) -> str:
-        return self.pyGithubRepo.default_branch
+        return self.__get_metadata("default_branch")
 
     def has_issues_enabled(self) -> bool:
-        return self.pyGithubRepo.has_issues
+        return self.__get_metadata("has_issues")
 
     def create_branch(self, parent_branch_name: str, new_branch_name: str) -> bool:
         try:
-            if any(new_branch_name == repo_branch.name for repo_branch in self.pyGithubRepo.get_branches()):
+            if self.__get_branch_sha(new_branch_name) is not None:
                 self.__log.debug("Branch %s already exists, it will not be created", new_branch_name)
                 return True
 
-            source_branch = self.pyGithubRepo.get_branch(parent_branch_name)
-            self.pyGithubRepo.create_git_ref(ref=self.branch_helper.as_branch_ref(new_branch_name), sha=source_branch.commit.sha)
+            source_sha = self.__get_branch_sha(parent_branch_name)
+            if source_sha is None:
+                self.__log.warning("Branch %s was not found, branch %s will not be created", parent_branch_name, new_branch_name)
+                return False
+
+            self.pyGithubRepo.create_git_ref(ref=self.branch_helper.as_branch_ref(new_branch_name), sha=source_sha)
+            self.__branch_shas[new_branch_name] = source_sha
             self.__log.debug("Created new branch %s", new_branch_name)
             return True
         except GithubException:
@@ -91,30 +135,35 @@ class GithubRepo(RepositoryInterface):
             return False
 
     def commit_change(self, author: CommitAuthor, message: str, branch: str, path: str, content: bytes) -> bool:
+        if len(content) > self.LARGE_FILE_THRESHOLD:
+            self.__log.debug("%s is larger than %d bytes, it will be committed through the git data API", path, self.LARGE_FILE_THRESHOLD)
+            return self.commit_changes(author, message, branch, [ FilesystemChange(path, content) ])
+
         committer = InputGitAuthor(author.getUsername(), author.getEmail())
 
-        if any(branch == repo_branch.name for repo_branch in self.pyGithubRepo.get_branches()):
+        if self.is_remote_branch(branch):
             try:
-                self.__log.debug("Attempting to get contents for file %s on branch %s of repo %s", path, branch, self.get_full_name())
-                remote_content = self.pyGithubRepo.get_contents(path, ref=branch)
-            except UnknownObjectException as ex:
-                if "404" in str(ex) or "not found" in str(ex).lower():
-                    try:
-                        self.__log.debug("%s not found remotely, will be created", path)
-                        self.pyGithubRepo.create_file(path, message, content, branch=branch, committer=committer)
-                        self.__log.debug("Successfully created %s", path)
-                        return True
-                    except Exception:
-                        self.__log.warning("Unexpected exception caught while dealing with commit involving new remote file creation", exc_info=1)
-                        return False    
+                self.__log.debug("Looking up file %s in the tree of branch %s of repo %s", path, branch, self.get_full_name())
+                remote_sha = self.__get_blob_sha(self.__get_branch_sha(branch), path)
             except Exception:
-                    self.__log.warning("Unexpected exception caught while fetching for remote file %s", path, exc_info=1)
+                self.__log.warning("Unexpected exception caught while fetching the tree of branch %s", branch, exc_info=1)
+                return False
+
+            if remote_sha is None:
+                try:
+                    self.__log.debug("%s not found remotely, will be created", path)
+                    self.pyGithubRepo.create_file(path, message, content, branch=branch, committer=committer)
+                    self.__branch_shas.pop(branch, None)
+                    self.__log.debug("Successfully created %s", path)
+                    return True
+                except Exception:
+                    self.__log.warning("Unexpected exception caught while dealing with commit involving new remote file creation", exc_info=1)
                     return False
-            
-            raw_remote_content = remote_content.decoded_content
-            if content != raw_remote_content:
+
+            if FilesystemChange.compute_digest(content) != remote_sha:
                 try:
-                    self.pyGithubRepo.update_file(remote_content.path, message, content, remote_content.sha, branch=branch, committer=committer)
+                    self.pyGithubRepo.update_file(path, message, content, remote_sha, branch=branch, committer=committer)
+                    self.__branch_shas.pop(branch, None)
                     self.__log.debug("Successfully update %s on branch %s", path, branch)
                     return True
                 except GithubException:
@@ -132,46 +181,217 @@ class GithubRepo(RepositoryInterface):
             self.__log.debug("No changes provided to commit: changes=%s", str(changes))
             return False
 
-        if any(branch == repo_branch.name for repo_branch in self.pyGithubRepo.get_branches()):
+        if self.is_remote_branch(branch):
             try:
-                head_commit = self.__get_head_commit(branch)
-                base_git_tree = self.pyGithubRepo.get_git_tree(sha=head_commit.sha)
-
-                tree_elements = self.__to_tree_elements(changes)
-                new_git_tree = self.pyGithubRepo.create_git_tree(tree_elements, base_git_tree)
+                new_commit = self.__create_commit(message, self.__get_branch_sha(branch), changes)
+                if new_commit is None:
+                    self.__log.debug("There were no changes to commit to branch %s", branch)
+                    return False
 
-                new_commit = self.pyGithubRepo.create_git_commit(message, new_git_tree, [head_commit])
                 git_ref = self.pyGithubRepo.get_git_ref("heads/" + branch)
                 git_ref.edit(sha=new_commit.sha)
+                self.__branch_shas[branch] = new_commit.sha
                 return True
             except:
+                # the branch may have moved on meanwhile, it will be looked up again
+                self.__branch_shas.pop(branch, None)
                 self.__log.warning("Unexpected exception caught while dealing with multiple changes commit", exc_info=1)
                 return False
         else:
             self.__log.debug("Branch %s was not found, no commit will be made at this stage", branch)
             return False
 
-    def __get_head_commit(self, branch: str) -> GitCommit:
-        sha = self.pyGithubRepo.get_branch(branch).commit.sha
-        return self.pyGithubRepo.get_git_commit(sha=sha)
+    def commit_changes_to_new_branch(self, author: CommitAuthor, message: str, base_branch: str, new_branch: str, changes: List[FilesystemChange]) -> bool:
+        if len(changes) < 1:
+            self.__log.debug("No changes provided to commit: changes=%s", str(changes))
+            return False
+
+        try:
+            base_sha = self.__get_branch_sha(base_branch)
+            if base_sha is None:
+                self.__log.warning("Branch %s was not found, branch %s will not be created", base_branch, new_branch)
+                return False
+
+            # the branch is only created once the commit exists so that it is never visible without the changes
+            new_commit = self.__create_commit(message, base_sha, changes)
+            if new_commit is None:
+                self.__log.debug("Changes match the content of branch %s, branch %s will not be created", base_branch, new_branch)
+                return False
+
+            try:
+                self.pyGithubRepo.create_git_ref(ref=self.branch_helper.as_branch_ref(new_branch), sha=new_commit.sha)
+            except GithubException as ex:
+                if ex.status != 422:
+                    raise
+                self.__log.debug("Branch %s already exists, changes will be committed on it", new_branch)
+                return self.commit_changes(author, message, new_branch, changes)
+
+            self.__branch_shas[new_branch] = new_commit.sha
+            self.__log.debug("Created new branch %s pointing at commit %s", new_branch, new_commit.sha)
+            return True
+        except:
+            self.__log.warning("Unexpected exception caught while committing changes to new branch %s", new_branch, exc_info=1)
+            return False
+
+    def filter_changes(self, branch: str, changes: List[FilesystemChange]) -> List[FilesystemChange]:
+        try:
+            head_sha = self.__get_branch_sha(branch)
+            if head_sha is None:
+                return list(changes)
+            return self.__drop_unchanged(head_sha, changes)
+        except GithubException:
+            self.__log.warning("Unable to compare changes with the content of branch %s, all of them will be considered changed", branch)
+            self.__log.debug("Unable to compare changes with the content of branch %s", branch, exc_info=1)
+            return list(changes)
+
+    def __drop_unchanged(self, commit_sha: str, changes: List[FilesystemChange]) -> List[FilesystemChange]:
+        changed = []
+        for change in changes:
+            if self.__get_blob_sha(commit_sha, change.rel_file_path) == change.digest:
+                self.__log.debug("%s has not changed, it will not be added to the commit", change.rel_file_path)
+            else:
+                changed.append(change)
+        return changed
+
+    def __get_tree_snapshot(self, commit_sha: str) -> dict:
+        """
+        Gets the blob SHAs by path of the tree of a commit, listed recursively in a single call and remembered for the rest of the run.\n
+        Comparing them with the git blob SHAs of the changes tells unchanged files apart without downloading their content.
+        """
+        if commit_sha not in self.__tree_snapshots:
+            git_tree = self.pyGithubRepo.get_git_tree(sha=commit_sha, recursive=True)
+            self.__tree_snapshots[commit_sha] = { element.path: element.sha for element in git_tree.tree if element.type == "blob" }
+            if git_tree.raw_data.get("truncated") is True:
+                self.__log.debug("Tree of commit %s was truncated, files missing from it will be looked up individually", commit_sha)
+                self.__truncated_trees.add(commit_sha)
+            self.__log.debug("Loaded tree of commit %s with %d files", commit_sha, len(self.__tree_snapshots[commit_sha]))
+        return self.__tree_snapshots[commit_sha]
+
+    def __get_blob_sha(self, commit_sha: str, path: str) -> str:
+        """
+        Gets the blob SHA of a file in the tree of a commit, None is returned if the file does not exist.\n
+        Trees of large repositories are listed truncated, a file missing from one is looked up through the contents API.
+        """
+        blob_shas = self.__get_tree_snapshot(commit_sha)
+        if path not in blob_shas and commit_sha in self.__truncated_trees:
+            try:
+                content = self.pyGithubRepo.get_contents(path, ref=commit_sha)
+                blob_shas[path] = content.sha if not isinstance(content, list) else None
+            except UnknownObjectException:
+                blob_shas[path] = None
+        return blob_shas.get(path)
+
+    def __create_commit(self, message: str, parent_sha: str, changes: List[FilesystemChange]) -> GitCommit:
+        """
+        Creates a commit of the changes on top of the given parent commit, the tree of the parent is used as base tree.\n
+        Changes matching the content of the parent are left out, None is returned when none is left.
+        """
+        changes = self.__drop_unchanged(parent_sha, changes)
+        if len(changes) == 0:
+            return None
+
+        parent_commit = self.pyGithubRepo.get_git_commit(sha=parent_sha)
+        new_git_tree = self.pyGithubRepo.create_git_tree(self.__to_tree_elements(changes), parent_commit.tree)
+        return self.pyGithubRepo.create_git_commit(message, new_git_tree, [parent_commit])
+
+    def __get_branch_sha(self, name: str) -> str:
+        """
+        Gets the SHA of the head commit of a branch, None is returned if it does not exist.\n
+        Branches are looked up individually and remembered for the rest of the run, our own writes keep them up to date.
+        """
+        if name not in self.__branch_shas:
+            try:
+                self.__branch_shas[name] = self.pyGithubRepo.get_branch(name).commit.sha
+            except UnknownObjectException:
+                self.__log.debug("Branch %s was not found remotely", name)
+                self.__branch_shas[name] = None
+        return self.__branch_shas[name]
 
     def __to_tree_elements(self, changes: List[FilesystemChange]) -> List[InputGitTreeElement]:
+        """Small UTF-8 changes are inlined in the tree, blobs are only created for large or binary ones"""
+        inline_contents = [ self.__get_inline_content(change) for change in changes ]
+        blob_changes = [ change for change, content in zip(changes, inline_contents) if content is None ]
+        blob_shas = iter(self.__create_blobs(blob_changes))
+
+        self.saved_blob_calls += len(changes) - len(blob_changes)
+        self.created_blobs += len(blob_changes)
+        self.__log.debug("Inlined %d changes in the tree, created %d blobs", len(changes) - len(blob_changes), len(blob_changes))
+
         elements = []
-        for change in changes:
-            blob = self.pyGithubRepo.create_git_blob(CommitData.to_base64(change.content).decode(), "base64")
-            elements.append(InputGitTreeElement(path=change.rel_file_path, mode="100644", type="blob", sha=blob.sha))
+        for change, content in zip(changes, inline_contents):
+            if content is not None:
+                elements.append(InputGitTreeElement(path=change.rel_file_path, mode="100644", type="blob", content=content))
+            else:
+                elements.append(InputGitTreeElement(path=change.rel_file_path, mode="100644", type="blob", sha=next(blob_shas)))
         return elements
 
+    def __get_inline_content(self, change: FilesystemChange) -> str:
+        if change.size > self.inline_threshold:
+            return None
+
+        try:
+            return change.content.decode("utf-8")
+        except UnicodeDecodeError:
+            self.__log.debug("%s is not valid UTF-8, a blob will be created for it", change.rel_file_path)
+            return None
+
+    def __create_blobs(self, changes: List[FilesystemChange]) -> List[str]:
+        if self.repo_factory is None or len(changes) < 2:
+            shas = []
+            for change in changes:
+                shas.append(self.__upload_blob(self.pyGithubRepo, change))
+            return shas
+
+        with ThreadPoolExecutor(max_workers=min(self.UPLOAD_WORKERS, len(changes)), thread_name_prefix="blob-upload") as executor:
+            futures = [ executor.submit(self.__create_blob, change) for change in changes ]
+
+        shas = []
+        failures = []
+        for change, future in zip(changes, futures):
+            try:
+                shas.append(future.result())
+            except Exception as ex:
+                self.__log.warning("Unable to create blob for %s: %s", change.rel_file_path, str(ex))
+                self.__log.debug("Unable to create blob for %s", change.rel_file_path, exc_info=ex)
+                failures.append(change.rel_file_path)
+
+        if len(failures) > 0:
+            raise GithubException(-1, "Unable to create blobs for " + str(failures), None)
+        return shas
+
+    def __create_blob(self, change: FilesystemChange) -> str:
+        try:
+            repo = self.__upload_repos.get_nowait()
+        except queue.Empty:
+            repo = self.repo_factory()
+
+        try:
+            sha = self.__upload_blob(repo, change)
+            self.__log.debug("Created blob %s for %s", sha, change.rel_file_path)
+            return sha
+        finally:
+            self.__upload_repos.put(repo)
+
+    def __upload_blob(self, repo: PyGithubRepository, change: FilesystemChange) -> str:
+        """
+        Creates the blob of a change through the given PyGithub repository and gets its SHA.\n
+        Large changes are encoded as they are sent straight from the mapped file, their whole base64 encoding is never held in memory.
+        """
+        if change.size <= self.LARGE_FILE_THRESHOLD:
+            return repo.create_git_blob(CommitData.to_base64(change.content).decode(), "base64").sha
+
+        with change.view() as content:
+            return BlobPayload.create_git_blob(repo, content)
+
     def create_pull_request(self, title: str, body: str, head: str, base: str, labels: List[str] = []) -> PullRequestInterface:
         try:
             pr = self.pyGithubRepo.create_pull(title=title, body=body, head=head, base=base)
 
             if len(labels) != 0:
-                for alabel in labels:
-                    new_label = self.__get_label(alabel)
-                    current_labels = pr.get_labels()
-                    if not any(new_label.name == current_label.name for current_label in current_labels):
-                        pr.add_to_labels(new_label)
+                # the PR was just created so it has no labels yet, all of them are added at once
+                gh_labels = [ gh_label for gh_label in (self.__get_label(label) for label in labels) if gh_label is not None ]
+                if len(gh_labels) > 0:
+                    pr.add_to_labels(*gh_labels)
             else:
                 self.__log.debug("No labels provided, PR will be unlabelled")
 
@@ -188,6 +408,17 @@ class GithubRepo(RepositoryInterface):
     def get_closed_pulls(self, head: str = None, base: str = None) -> List[PullRequestInterface]:
         return self.__do_get_pulls("closed", head, base)
 
+    def get_pulls_index(self, head_prefix: str) -> PullRequestIndex:
+        index = PullRequestIndex(head_prefix)
+        # heads are labelled owner:branch, pull requests from forks with a branch of the same name are left out
+        head_label_prefix = self.get_head_branch_filter_key(head_prefix)
+        for pull in self.pyGithubRepo.get_pulls(state="all"):
+            if pull.head.label.startswith(head_label_prefix):
+                index.add(pull.head.ref, pull.state, pull.html_url)
+
+        self.__log.debug("Indexed pull requests %s", str(index))
+        return index
+
     def create_issue(self, title: str, body: str, labels: List[str] = []) -> IssueInterface:
         gh_labels = []
         for label in labels:
@@ -222,7 +453,12 @@ class GithubRepo(RepositoryInterface):
         return the_list
 
     def create_label(self, name: str, description: str, color: str, text_color: str) -> bool:
-        return True if self.__get_label_or_create_it(name, color, description) is not None else False
+        if name not in self.__labels:
+            label = self.__get_label_or_create_it(name, color, description)
+            if label is None:
+                return False
+            self.__labels[name] = label
+        return True
 
     def get_pr_label(self) -> LabelData:
         return self.PR_LABEL
@@ -231,10 +467,13 @@ class GithubRepo(RepositoryInterface):
         return self.ISSUE_LABEL
 
     def __get_label(self, name) -> Label :
-        try:
-            return self.pyGithubRepo.get_label(name)
-        except:
-            return None
+        """Gets a label given its name, labels found are remembered for the rest of the run"""
+        if name not in self.__labels:
+            try:
+                self.__labels[name] = self.pyGithubRepo.get_label(name)
+            except:
+                return None
+        return self.__labels[name]
 
     def __get_label_or_create_it(self, name: str, color: str, description: str) -> Label:
         """
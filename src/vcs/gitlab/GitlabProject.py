@@ -4,6 +4,7 @@ from ..RepositoryInterface import RepositoryInterface
 from ..PullRequestInterface import PullRequestInterface
 from ..IssueInterface import IssueInterface
 from .GitlabMergeRequest import GitlabMergeRequest
+from ..PullRequestIndex import PullRequestIndex
 from .GitlabIssue import GitlabIssue
 from .CommitData import CommitData
 from ..LabelData import LabelData
@@ -40,6 +41,8 @@ class GitlabProject(RepositoryInterface):
 
     def __init__(self, pyGitlabProject: Project):
         self.pyGitlabProject = pyGitlabProject
+        self.__labels = {}
+        self.__tree_snapshots = {}
         self.namespace = self.__getOrDefault(self.pyGitlabProject.namespace, 'path', None)
         self.name = self.pyGitlabProject.path
         self.default_branch = self.pyGitlabProject.default_branch
@@ -64,6 +67,16 @@ class GitlabProject(RepositoryInterface):
     def get_closed_pulls(self, head: str = None, base: str = None) -> List[PullRequestInterface]:
         return self.__do_get_mrs('closed', head, base)
 
+    def get_pulls_index(self, head_prefix: str) -> PullRequestIndex:
+        index = PullRequestIndex(head_prefix)
+        # MRs are listed page by page in a single pass over all states, only the ones of interest are kept
+        for mr in self.pyGitlabProject.mergerequests.list(state="all", iterator=True):
+            if mr.source_branch.startswith(head_prefix):
+                index.add(mr.source_branch, PullRequestIndex.OPEN if mr.state == "opened" else mr.state, mr.web_url)
+
+        self.__log.debug("Indexed merge requests %s", str(index))
+        return index
+
     def get_owner(self) -> str:
         return self.owner
     
@@ -95,22 +108,7 @@ class GitlabProject(RepositoryInterface):
         res = None
 
         if len(changes) > 0:
-            payload = CommitData(author, message, branch, None, None, b'').to_payload()
-
-            payload["actions"] = []
-            for change in changes:
-                remote_file = self.__get_remote_file(change.rel_file_path, branch)
-                if remote_file:
-                    if CommitData.to_base64(change.content) != remote_file.content.encode():
-                        commit_data = CommitData.update_commit_data(author, message, branch, change.rel_file_path, change.content)
-                    else:
-                        commit_data = None
-                        self.__log.debug("%s has not changed, it will not be added to the commit", change.rel_file_path)
-                else:
-                    commit_data = CommitData.create_commit_data(author, message, branch, change.rel_file_path, change.content)
-                if commit_data:
-                    payload["actions"].append(commit_data.to_payload()["actions"][0])
-
+            payload = self.__to_commit_payload(author, message, branch, branch, changes)
             if len(payload["actions"]) > 0:
                 try:
                     res = self.pyGitlabProject.commits.create(payload)
@@ -119,6 +117,49 @@ class GitlabProject(RepositoryInterface):
 
         return True if res is not None else False
 
+    def commit_changes_to_new_branch(self, author: CommitAuthor, message: str, base_branch: str, new_branch: str, changes: List[FilesystemChange]) -> bool:
+        if len(changes) < 1:
+            return False
+
+        # the branch is created by the commit itself, starting from the head of the base branch
+        payload = self.__to_commit_payload(author, message, new_branch, base_branch, changes)
+        payload["start_branch"] = base_branch
+        if len(payload["actions"]) == 0:
+            self.__log.debug("No changes with respect to branch %s, no commit will be made", base_branch)
+            return False
+
+        try:
+            res = self.pyGitlabProject.commits.create(payload)
+            self.__log.debug("Commit performed on new branch %s with results %s", new_branch, str(res))
+            return True
+        except:
+            self.__log.debug("Unable to commit to new branch %s", new_branch, exc_info=1)
+
+        if self.__get_remote_branch(new_branch) is not None:
+            self.__log.debug("Branch %s already exists, changes will be committed on it", new_branch)
+            return self.commit_changes(author, message, new_branch, changes)
+
+        self.__log.warning("Unexpected: failed to commit changes to new branch %s", new_branch)
+        return False
+
+    def filter_changes(self, branch: str, changes: List[FilesystemChange]) -> List[FilesystemChange]:
+        try:
+            blob_ids = self.__get_tree_snapshot(branch)
+        except:
+            self.__log.warning("Unable to compare changes with the content of branch %s, all of them will be considered changed", branch)
+            self.__log.debug("Unable to compare changes with the content of branch %s", branch, exc_info=1)
+            return list(changes)
+
+        return [ change for change in changes if blob_ids.get(change.rel_file_path) != change.digest ]
+
+    def __get_tree_snapshot(self, branch: str) -> dict:
+        """Gets the blob ids by path of the tree of a branch, listed recursively once per run"""
+        if branch not in self.__tree_snapshots:
+            tree = self.pyGitlabProject.repository_tree(ref=branch, recursive=True, iterator=True)
+            self.__tree_snapshots[branch] = { item["path"]: item["id"] for item in tree if item["type"] == "blob" }
+            self.__log.debug("Loaded tree of branch %s with %d files", branch, len(self.__tree_snapshots[branch]))
+        return self.__tree_snapshots[branch]
+
     def create_branch(self, parent_branch_name: str, new_branch_name: str) -> bool:
         res = None
 
@@ -158,7 +199,13 @@ class GitlabProject(RepositoryInterface):
             return None
 
     def create_label(self, name: str, description: str, color: str, text_color: str) -> bool:
-        return True if self.__get_or_create_label(LabelData(name, description, color, text_color)) else False
+        if name not in self.__labels:
+            label = self.__get_or_create_label(LabelData(name, description, color, text_color))
+            if not label:
+                return False
+            # labels are resolved once per run, MRs and issues then reference them by name in their creation payload
+            self.__labels[name] = label
+        return True
 
     def create_pull_request(self, title: str, body: str, head: str, base: str, labels: List[str] = []) -> PullRequestInterface:
         payload = {
@@ -227,6 +274,27 @@ class GitlabProject(RepositoryInterface):
         except:
             return None
 
+    def __to_commit_payload(self, author: CommitAuthor, message: str, branch: str, ref: str, changes: List[FilesystemChange]) -> dict:
+        """Gets the payload of a commit on branch, changes are compared against the files on ref and left out when unchanged"""
+        payload = CommitData(author, message, branch, None, None, b'').to_payload()
+
+        payload["actions"] = []
+        for change in changes:
+            content = change.content
+            remote_file = self.__get_remote_file(change.rel_file_path, ref)
+            if remote_file:
+                if CommitData.to_base64(content) != remote_file.content.encode():
+                    commit_data = CommitData.update_commit_data(author, message, branch, change.rel_file_path, content)
+                else:
+                    commit_data = None
+                    self.__log.debug("%s has not changed, it will not be added to the commit", change.rel_file_path)
+            else:
+                commit_data = CommitData.create_commit_data(author, message, branch, change.rel_file_path, content)
+            if commit_data:
+                payload["actions"].append(commit_data.to_payload()["actions"][0])
+
+        return payload
+
     def __get_or_create_label(self, label_data: LabelData) -> ProjectLabel:
         try:
             return self.pyGitlabProject.labels.get(label_data.name)
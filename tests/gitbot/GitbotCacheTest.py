@@ -0,0 +1,79 @@
+import json
+import shutil
+import tempfile
+import time
+import unittest
+import requests
+
+from pathlib import Path
+from unittest.mock import Mock
+from unittest.mock import patch
+from src.gitbot.GitbotCache import GitbotCache
+from src.gitbot.GitbotMessageGenerator import GitbotMessageGenerator
+
+class GitbotCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_folder = Path(tempfile.mkdtemp(prefix="meterian_pr_"))
+        self.cache = GitbotCache(Path(self.test_folder, GitbotCache.DEFAULT_FILENAME))
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        shutil.rmtree(self.test_folder)
+
+    def test_should_expire_entries_after_ttl(self):
+        self.cache.put("key", "content")
+        self.assertEqual("content", self.cache.get("key"))
+
+        with patch("src.gitbot.GitbotCache.time.time", return_value=time.time() + GitbotCache.DEFAULT_TTL + 1):
+            self.assertIsNone(self.cache.get("key"))
+
+    def test_should_evict_least_recently_used_entries(self):
+        cache = GitbotCache(Path(self.test_folder, "small.db"), max_bytes=10)
+        now = time.time()
+        with patch("src.gitbot.GitbotCache.time.time", side_effect=[ now - 10 + tick for tick in range(7) ]):
+            cache.put("one", "aaaa")
+            cache.put("two", "bbbb")
+            cache.get("one")
+            cache.put("three", "cccc")
+
+        self.assertEqual("aaaa", cache.get("one"))
+        self.assertIsNone(cache.get("two"))
+        self.assertEqual("cccc", cache.get("three"))
+        cache.close()
+
+    def test_should_clear_entries(self):
+        self.cache.put("key", "content")
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_should_reuse_cached_content_for_identical_requests(self):
+        generator = GitbotMessageGenerator(cache=self.cache)
+        generator.session = Mock(spec=requests.Session)
+        response = Mock(spec=requests.Response)
+        response.status_code = 200
+        response.text = json.dumps({ "title": "a title", "message": "a message" })
+        generator.session.post.return_value = response
+
+        first = generator.genMessage({ "url": "u", "autofix": { "applied": True } }, { "autofix": True }, "licenses")
+        second = generator.genMessage({ "autofix": { "applied": True }, "url": "u" }, { "autofix": True }, "licenses")
+        generator.genMessage({ "url": "u", "autofix": { "applied": True } }, { "autofix": True }, "issues,licenses")
+
+        self.assertEqual(first, second)
+        self.assertEqual(2, generator.session.post.call_count)
+
+    def test_should_not_cache_unsuccessful_responses(self):
+        generator = GitbotMessageGenerator(cache=self.cache)
+        generator.session = Mock(spec=requests.Session)
+        response = Mock(spec=requests.Response)
+        response.status_code = 400
+        response.text = "error"
+        generator.session.post.return_value = response
+
+        self.assertIsNone(generator.genMessage({}, { "autofix": True }))
+        self.assertIsNone(generator.genMessage({}, { "autofix": True }))
+        self.assertEqual(2, generator.session.post.call_count)
+
+if __name__ == "__main__":
+    unittest.main()
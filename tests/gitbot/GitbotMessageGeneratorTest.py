@@ -1,7 +1,14 @@
 import unittest
 import os
 import json
+import gzip
+import requests
+import threading
+import time
+from unittest.mock import Mock
+from unittest.mock import patch
 from src.gitbot.GitbotMessageGenerator import GitbotMessageGenerator
+from src.gitbot.MessageGeneratorInterface import MessageGeneratorInterface
 from pathlib import Path
 
 
@@ -26,6 +33,193 @@ class GitbotMessageGeneratorTest(unittest.TestCase):
         self.assertTrue(message["message"] != "", "Message is empty")
         print("\n### test_should_generate_message_when_given_a_report\n\n%s" % message)
 
+    def test_should_reuse_session_with_timeouts_across_calls(self):
+        generator = GitbotMessageGenerator(connect_timeout=3, read_timeout=30)
+        generator.session = Mock(spec=requests.Session)
+        response = Mock(spec=requests.Response)
+        response.status_code = 200
+        response.text = '{"title": "a title", "message": "a message"}'
+        generator.session.post.return_value = response
+
+        generator.genMessage({}, {"autofix": True})
+        message = generator.genMessage({}, {"issue": True}, "licenses")
+
+        self.assertEqual("a title", message["title"])
+        self.assertEqual(2, generator.session.post.call_count)
+        for call in generator.session.post.call_args_list:
+            self.assertEqual((3, 30), call.kwargs["timeout"])
+        self.assertTrue(generator.session.post.call_args_list[1].args[0].endswith("?exclude=licenses"))
+
+    def test_should_not_generate_message_when_gitbot_times_out(self):
+        generator = GitbotMessageGenerator(retries=0)
+        generator.session = Mock(spec=requests.Session)
+        generator.session.post.side_effect = requests.exceptions.ReadTimeout()
+
+        self.assertIsNone(generator.genMessage({}, {"autofix": True}))
+
+    def test_should_send_slim_compressed_payloads(self):
+        with open(self.RESOURCES_PATH + 'report.json') as report_json:
+            report = json.load(report_json)
+        generator = GitbotMessageGenerator(compress=True)
+        generator.session = Mock(spec=requests.Session)
+        response = Mock(spec=requests.Response)
+        response.status_code = 200
+        response.text = '{"title": "a title", "message": "a message"}'
+        generator.session.post.return_value = response
+
+        generator.genMessage(report, {"autofix": True}, "issues,licenses")
+
+        call = generator.session.post.call_args
+        self.assertEqual("gzip", call.kwargs["headers"]["Content-Encoding"])
+        body = json.loads(gzip.decompress(call.kwargs["data"]))
+        self.assertEqual(["security", "stability"], sorted(body["report"]["reports"].keys()))
+        self.assertEqual(report["autofix"], body["report"]["autofix"])
+        self.assertTrue("licensing" in report["reports"])
+
+    def test_should_send_uncompressed_payloads_by_default(self):
+        generator = GitbotMessageGenerator()
+        generator.session = Mock(spec=requests.Session)
+        response = Mock(spec=requests.Response)
+        response.status_code = 200
+        response.text = '{"title": "a title", "message": "a message"}'
+        generator.session.post.return_value = response
+
+        generator.genMessage({}, {"autofix": True})
+
+        generator.session.post.assert_called_once()
+        self.assertFalse("Content-Encoding" in generator.session.post.call_args.kwargs["headers"])
+        self.assertEqual(b'{"options":{"autofix":true},"report":{}}', generator.session.post.call_args.kwargs["data"])
+
+    def test_should_fall_back_to_uncompressed_payloads_when_unsupported(self):
+        self.__assert_falls_back_to_uncompressed_payloads(415, "")
+        self.__assert_falls_back_to_uncompressed_payloads(400, "Unsupported Content-Encoding: gzip")
+
+    def test_should_keep_compressing_payloads_on_unrelated_bad_requests(self):
+        generator = GitbotMessageGenerator(compress=True)
+        generator.session = Mock(spec=requests.Session)
+        response = Mock(spec=requests.Response)
+        response.status_code = 400
+        response.text = "missing report"
+        generator.session.post.return_value = response
+
+        self.assertIsNone(generator.genMessage({}, {"autofix": True}))
+
+        generator.session.post.assert_called_once()
+        self.assertEqual("gzip", generator.session.post.call_args.kwargs["headers"]["Content-Encoding"])
+        self.assertTrue(generator.compress)
+
+    def __assert_falls_back_to_uncompressed_payloads(self, status_code: int, text: str):
+        generator = GitbotMessageGenerator(compress=True)
+        generator.session = Mock(spec=requests.Session)
+        unsupported = Mock(spec=requests.Response)
+        unsupported.status_code = status_code
+        unsupported.text = text
+        response = Mock(spec=requests.Response)
+        response.status_code = 200
+        response.text = '{"title": "a title", "message": "a message"}'
+        generator.session.post.side_effect = [unsupported, response, response]
+
+        self.assertEqual("a title", generator.genMessage({}, {"autofix": True})["title"])
+        generator.genMessage({}, {"issue": True})
+
+        self.assertEqual(3, generator.session.post.call_count)
+        self.assertFalse("Content-Encoding" in generator.session.post.call_args_list[2].kwargs["headers"])
+        self.assertEqual(b'{"options":{"issue":true},"report":{}}', generator.session.post.call_args_list[2].kwargs["data"])
+
+    @patch("src.gitbot.GitbotMessageGenerator.time.sleep")
+    def test_should_retry_retryable_failures_with_backoff(self, sleep):
+        generator = GitbotMessageGenerator(retries=3)
+        generator.session = Mock(spec=requests.Session)
+        unavailable = Mock(spec=requests.Response)
+        unavailable.status_code = 503
+        unavailable.headers = { "Retry-After": "2" }
+        response = Mock(spec=requests.Response)
+        response.status_code = 200
+        response.text = '{"title": "a title", "message": "a message"}'
+        generator.session.post.side_effect = [unavailable, requests.exceptions.ConnectionError(), response]
+
+        self.assertEqual("a title", generator.genMessage({}, {"autofix": True})["title"])
+        self.assertEqual(3, generator.session.post.call_count)
+        self.assertEqual(2, sleep.call_count)
+        self.assertTrue(sleep.call_args_list[0].args[0] >= 2)
+        self.assertTrue(sleep.call_args_list[1].args[0] <= GitbotMessageGenerator.BACKOFF_BASE * 2)
+
+    def test_should_not_retry_client_errors(self):
+        generator = GitbotMessageGenerator(retries=3)
+        generator.session = Mock(spec=requests.Session)
+        response = Mock(spec=requests.Response)
+        response.status_code = 400
+        response.text = "bad request"
+        generator.session.post.return_value = response
+
+        self.assertIsNone(generator.genMessage({}, {"autofix": True}))
+        self.assertEqual(1, generator.session.post.call_count)
+
+    def test_should_fall_back_on_client_errors_and_count_them_as_failures(self):
+        fallback = Mock(spec=MessageGeneratorInterface)
+        fallback.genMessage.return_value = { "title": "local title", "message": "local message" }
+        generator = GitbotMessageGenerator(retries=3, max_failures=2, fallback=fallback)
+        generator.session = Mock(spec=requests.Session)
+        for status_code in [ 401, 404 ]:
+            response = Mock(spec=requests.Response)
+            response.status_code = status_code
+            response.text = "error"
+            generator.session.post.return_value = response
+
+            self.assertEqual("local title", generator.genMessage({}, {"autofix": True})["title"])
+
+        self.assertEqual(2, generator.session.post.call_count)
+        self.assertTrue(generator.breaker.is_open())
+        self.assertEqual(2, fallback.genMessage.call_count)
+
+    def test_should_stop_calling_gitbot_and_fall_back_after_consecutive_failures(self):
+        fallback = Mock(spec=MessageGeneratorInterface)
+        fallback.genMessage.return_value = { "title": "local title", "message": "local message" }
+        generator = GitbotMessageGenerator(retries=0, max_failures=2, fallback=fallback)
+        generator.session = Mock(spec=requests.Session)
+        generator.session.post.side_effect = requests.exceptions.ConnectTimeout()
+
+        for _ in range(4):
+            self.assertEqual("local title", generator.genMessage({}, {"autofix": True})["title"])
+
+        self.assertEqual(2, generator.session.post.call_count)
+        self.assertTrue(generator.breaker.is_open())
+        self.assertEqual(4, fallback.genMessage.call_count)
+
+    def test_should_not_call_gitbot_once_deadline_has_passed(self):
+        generator = GitbotMessageGenerator(deadline=0.01)
+        generator.session = Mock(spec=requests.Session)
+        time.sleep(0.02)
+
+        self.assertIsNone(generator.genMessage({}, {"autofix": True}))
+        self.assertEqual(0, generator.session.post.call_count)
+
+    def test_should_generate_messages_concurrently_in_order(self):
+        generator = GitbotMessageGenerator()
+        in_flight = []
+        max_in_flight = []
+        lock = threading.Lock()
+        def gen_message(report, options, exclusions):
+            with lock:
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.05 if report["id"] % 2 == 0 else 0.01)
+            with lock:
+                in_flight.pop()
+            if report["id"] == 3:
+                raise requests.exceptions.ConnectionError()
+            return { "title": "title " + str(report["id"]) }
+        generator.genMessage = gen_message
+
+        jobs = ((i, { "id": i }, {}, None) for i in range(8))
+        results = list(generator.genMessages(jobs, 3))
+
+        self.assertEqual(list(range(8)), [ key for key, _ in results ])
+        self.assertEqual("title 2", results[2][1]["title"])
+        self.assertIsNone(results[3][1])
+        self.assertTrue(max(max_in_flight) <= 3)
+        self.assertTrue(max(max_in_flight) > 1)
+
     def disabled_test_should_perfect_report_generate_message_empty_title(self):
         with open(self.RESOURCES_PATH + 'report.perfect.json') as report_json:
             report = json.load(report_json)
@@ -0,0 +1,67 @@
+import unittest
+import os
+import json
+from src.gitbot.LocalMessageGenerator import LocalMessageGenerator
+from src.gitbot.MessageGeneratorInterface import MessageGeneratorInterface
+from pathlib import Path
+
+
+class LocalMessageGeneratorTest(unittest.TestCase):
+
+    RESOURCES_PATH = str(Path(os.path.dirname(os.path.realpath(__file__))).parent) + "/resources/"
+
+    def setUp(self) -> None:
+        self.msg_generator = LocalMessageGenerator()
+        with open(self.RESOURCES_PATH + 'report.json') as report_json:
+            self.report = json.load(report_json)
+
+    def test_should_implement_message_generator_interface(self):
+        self.assertTrue(isinstance(self.msg_generator, MessageGeneratorInterface))
+
+    def test_should_generate_pr_message_when_given_a_report(self):
+        options = {"autofix": True, "issue": False, "report": True}
+
+        message = self.msg_generator.genMessage(self.report, options, "issues,licenses")
+
+        self.assertEqual("[meterian] Upgrade charset-normalizer from 2.0.7 to 2.0.9", message["title"])
+        self.assertIn("| charset-normalizer | 2.0.7 | 2.0.9 | stability |", message["message"])
+        self.assertIn("- **charset-normalizer@2.0.7**: latest patch 2.0.9", message["message"])
+        self.assertNotIn("requests@2.26.0", message["message"])
+        self.assertIn("PDF report", message["message"])
+        self.assertIn(self.report["url"], message["message"])
+
+    def test_should_render_security_advices_and_exclude_sections(self):
+        self.report["reports"]["security"]["reports"][0]["reports"] = [{
+            "dependency": { "name": "charset-normalizer", "version": "2.0.7" },
+            "advices": [ { "id": "adv-1", "cve": "CVE-2021-0001", "severity": "HIGH", "title": "Denial of service" } ]
+        }]
+        options = {"autofix": True, "issue": False, "report": False}
+
+        message = self.msg_generator.genMessage(self.report, options, "stability")
+
+        self.assertIn("- **charset-normalizer@2.0.7**: CVE-2021-0001 (high) Denial of service", message["message"])
+        self.assertNotIn("### Stability", message["message"])
+        self.assertNotIn("PDF report", message["message"])
+
+    def test_should_generate_issue_message_when_given_a_report(self):
+        options = {"autofix": False, "issue": True, "report": False, "issueFromAutofix": True}
+
+        message = self.msg_generator.genMessage(self.report, options, "licenses")
+
+        self.assertEqual("[meterian] 1 dependency needs to be upgraded", message["title"])
+        self.assertIn("| charset-normalizer | 2.0.7 | 2.0.9 | stability |", message["message"])
+        self.assertEqual(message, self.msg_generator.genMessage(self.report, options, "licenses"))
+
+    def test_should_generate_empty_issue_title_when_nothing_to_report(self):
+        with open(self.RESOURCES_PATH + 'report.perfect.json') as report_json:
+            report = json.load(report_json)
+
+        message = self.msg_generator.genMessage(report, {"autofix": False, "issue": True, "report": False})
+
+        self.assertEqual("", message["title"])
+
+    def test_should_not_generate_message_when_report_is_malformed(self):
+        self.assertIsNone(self.msg_generator.genMessage({}, {"autofix": True, "issue": False, "report": False}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import shutil
+import tempfile
+
+from pathlib import Path
+from src.vcs.FileContent import FileContent
+from src.vcs.PrChangesGenerator import FilesystemChange
+
+class FileContentTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_folder = Path(tempfile.mkdtemp(prefix="meterian_pr_"))
+        self.file = Path(self.test_folder, "package-lock.json")
+        self.file.write_bytes(b"hello world\n")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_folder)
+
+    def test_should_compute_size_and_git_blob_digest_upfront(self):
+        content = FileContent(str(self.file))
+
+        self.assertEqual(12, content.size)
+        # as computed by `git hash-object`
+        self.assertEqual("3b18e512dba79e4c8300dd08aeb37f8e728b8dad", content.digest)
+
+    def test_should_read_content_on_demand(self):
+        content = FileContent(str(self.file))
+        self.file.write_bytes(b"hello again\n")
+
+        self.assertEqual(b"hello again\n", content.read())
+
+    def test_should_read_empty_content(self):
+        self.file.write_bytes(b"")
+
+        self.assertEqual(b"", FileContent(str(self.file)).read())
+
+    def test_should_compare_file_backed_changes_with_in_memory_changes(self):
+        change = FilesystemChange("package-lock.json", FileContent(str(self.file)))
+
+        self.assertEqual(FilesystemChange("package-lock.json", b"hello world\n"), change)
+        self.assertNotEqual(FilesystemChange("package-lock.json", b"hello world"), change)
+        self.assertEqual(b"hello world\n", change.content)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,6 +27,35 @@ class PrChangeTest(unittest.TestCase):
         self.assertTrue(FilesystemChange("src/mylib/beta.csproj", b"content") in changeOne.filesystem_changes)
         self.__assert_change_present_in_autofix("System.Text.RegularExpressions", "4.3.0", changeOne.pr_report["autofix"]["changes"])
 
+    def test_should_load_pr_report_lazily(self):
+        loads = []
+        def load_report():
+            loads.append(1)
+            return self.__create_report(Dependency("dotnet", "System.Net.Http", "4.3.0", "4.3.4"))
+
+        change = PrChange("uuid", [], [], None, None, pr_report_loader=load_report)
+        self.assertEqual(0, len(loads))
+        str(change)
+
+        self.assertEqual("System.Net.Http", change.pr_report["autofix"]["changes"][0]["name"])
+        self.assertEqual("System.Net.Http", change.pr_report["autofix"]["changes"][0]["name"])
+        self.assertEqual(1, len(loads))
+
+    def test_should_load_pr_report_again_once_released(self):
+        loads = []
+        def load_report():
+            loads.append(1)
+            return self.__create_report(Dependency("dotnet", "System.Net.Http", "4.3.0", "4.3.4"))
+
+        change = PrChange("uuid", [], [], None, None, pr_report_loader=load_report)
+        change.pr_report
+        self.assertEqual("<loaded>", str(change).split("pr_report=")[1].split(",")[0])
+        change.release_report()
+
+        self.assertEqual("<not loaded>", str(change).split("pr_report=")[1].split(",")[0])
+        self.assertEqual("System.Net.Http", change.pr_report["autofix"]["changes"][0]["name"])
+        self.assertEqual(2, len(loads))
+
     def __assert_change_present_in_autofix(self, dep_name, dep_version, changes):
         for change in changes:
             if dep_name == change["name"] and dep_version == change["version"]:
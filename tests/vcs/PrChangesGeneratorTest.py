@@ -1,7 +1,13 @@
 import unittest
+import json
 import os, tempfile
+import functools
 from pathlib import Path
+from unittest.mock import patch
+from concurrent.futures import ProcessPoolExecutor
 from src.vcs.PrChangesGenerator import Dependency, PrChangesGenerator
+from src.vcs.ReportStore import ReportStore
+from src.gitbot.GitbotMessageGenerator import GitbotMessageGenerator
 import shutil
 
 # class PrChangesGeneratorTest(unittest.TestCase):
@@ -95,5 +101,142 @@ class PrChangesGeneratorTest:
         pr_report.rename(Path(pr_report.parent, ".pr_report_dotnet.json"))
         return ".pr_report_dotnet.json"
 
+class PrChangesGeneratorFetchTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_folder = Path(tempfile.mkdtemp(prefix="meterian_pr_"))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_folder)
+
+    def test_should_fetch_changed_manifests_by_pr_report(self):
+        self.__touch("report.json.pr1")
+        self.__touch("report.json.pr2")
+        self.__touch("pom.xml.pr1")
+        self.__touch("module/pom.xml.pr1")
+        self.__touch("module/pom.xml.pr2")
+        self.__touch("module/README.md.pr2")
+
+        res = PrChangesGenerator.fetch_changed_manifests(self.test_folder)
+
+        self.assertEqual(2, len(res))
+        self.assertEqual(["pom.xml.pr1", "module/pom.xml.pr1"], res[Path(self.test_folder, "report.json.pr1")])
+        self.assertEqual(["module/pom.xml.pr2"], res[Path(self.test_folder, "report.json.pr2")])
+
+    def test_should_skip_ignored_directories_when_fetching_changed_manifests(self):
+        self.__touch("report.json.pr1")
+        self.__touch("package.json.pr1")
+        self.__touch("node_modules/foo/package.json.pr1")
+        self.__touch(".git/package.json.pr1")
+        self.__touch("build/package.json.pr1")
+
+        res = PrChangesGenerator.fetch_changed_manifests(self.test_folder, ["build"])
+
+        self.assertEqual(["package.json.pr1"], res[Path(self.test_folder, "report.json.pr1")])
+
+    def test_should_fetch_changed_manifests_from_pr_summary(self):
+        self.__touch("report.json.pr1")
+        self.__touch("module/pom.xml.pr1")
+        pr_summary = { "prs": [ { "report": "report.json.pr1", "manifests": [ "module/pom.xml.pr1" ] } ] }
+
+        res = PrChangesGenerator.fetch_changed_manifests_from_summary(self.test_folder, pr_summary)
+
+        self.assertEqual({ Path(self.test_folder, "report.json.pr1"): [ "module/pom.xml.pr1" ] }, res)
+
+    def test_should_not_fetch_changed_manifests_from_stale_pr_summary(self):
+        self.__touch("report.json.pr1")
+        self.__touch("report.json.pr2")
+        self.__touch("module/pom.xml.pr1")
+        pr_summary = { "prs": [ { "report": "report.json.pr1", "manifests": [ "module/pom.xml.pr1" ] } ] }
+
+        self.assertIsNone(PrChangesGenerator.fetch_changed_manifests_from_summary(self.test_folder, pr_summary))
+
+        pr_summary["prs"].append({ "report": "report.json.pr2", "manifests": [ "pom.xml.pr2" ] })
+
+        self.assertIsNone(PrChangesGenerator.fetch_changed_manifests_from_summary(self.test_folder, pr_summary))
+
+    def test_should_reject_pr_summary_of_unexpected_shape_with_info_log(self):
+        self.__touch("report.json.pr1")
+        self.__touch("module/pom.xml.pr1")
+
+        for pr_summary in [ [ "report.json.pr1" ], { "reports": {} }, { "prs": [ { "path": "report.json.pr1" } ] } ]:
+            with self.assertLogs("PrChangesGenerator", level="INFO") as logs:
+                self.assertIsNone(PrChangesGenerator.fetch_changed_manifests_from_summary(self.test_folder, pr_summary))
+            self.assertTrue(any("expected shape" in line for line in logs.output))
+
+    def test_should_decode_each_report_once_with_json_load(self):
+        self.__write_report("report.json.pr1", "dep1")
+        self.__touch("module/pom.xml.pr1")
+        reports_and_changes = PrChangesGenerator.fetch_changed_manifests(self.test_folder)
+        report_store = ReportStore()
+
+        with patch("src.vcs.ReportStore.json.load", wraps=json.load) as json_load:
+            for report, pr_change in PrChangesGenerator.generate_all(self.test_folder, reports_and_changes, report_store):
+                self.assertEqual("dep1", pr_change.pr_report["autofix"]["changes"][0]["name"])
+                pr_change.release_report()
+            self.assertEqual("uuid", PrChangesGenerator.parse_pid(report, report_store))
+
+            json_load.assert_called_once()
+
+    def test_should_generate_pr_changes_in_order_with_worker_processes(self):
+        for pr_no in range(1, 4):
+            self.__write_report("report.json.pr" + str(pr_no), "dep" + str(pr_no))
+            self.__touch("module" + str(pr_no) + "/pom.xml.pr" + str(pr_no))
+        reports_and_changes = PrChangesGenerator.fetch_changed_manifests(self.test_folder)
+
+        results = list(PrChangesGenerator.generate_all(self.test_folder, reports_and_changes, workers=2))
+
+        self.assertEqual(list(reports_and_changes.keys()), [ report for report, _ in results ])
+        for report, pr_change in results:
+            pr_no = report.name[-1]
+            self.assertEqual("uuid", pr_change.meterian_project_id)
+            self.assertEqual(Dependency("java", "dep" + pr_no, "1.0.0", "1.0.1"), pr_change.dependencies[0])
+            self.assertEqual("module" + pr_no + "/pom.xml", pr_change.filesystem_changes[0].rel_file_path)
+            self.assertEqual("dep" + pr_no, pr_change.pr_report["autofix"]["changes"][0]["name"])
+
+    def test_should_hand_back_filtered_reports_decoded_by_worker_processes(self):
+        for pr_no in range(1, 3):
+            self.__write_report("report.json.pr" + str(pr_no), "dep" + str(pr_no))
+            self.__touch("module" + str(pr_no) + "/pom.xml.pr" + str(pr_no))
+        reports_and_changes = PrChangesGenerator.fetch_changed_manifests(self.test_folder)
+        report_store = ReportStore()
+        report_filter = functools.partial(GitbotMessageGenerator.slim_report, exclusions="licenses")
+
+        with patch("src.vcs.ReportStore.json.load", wraps=json.load) as json_load:
+            for report, pr_change in PrChangesGenerator.generate_all(self.test_folder, reports_and_changes, report_store, 2, report_filter=report_filter):
+                self.assertEqual({ "security": {} }, pr_change.pr_report["reports"])
+                self.assertEqual("uuid", PrChangesGenerator.parse_pid(report, report_store))
+
+            json_load.assert_not_called()
+
+    def test_should_not_generate_pr_changes_past_the_window_once_closed(self):
+        for pr_no in range(1, 9):
+            self.__write_report("report.json.pr" + str(pr_no), "dep" + str(pr_no))
+            self.__touch("module" + str(pr_no) + "/pom.xml.pr" + str(pr_no))
+        reports_and_changes = PrChangesGenerator.fetch_changed_manifests(self.test_folder)
+        submit = ProcessPoolExecutor.submit
+
+        with patch.object(ProcessPoolExecutor, "submit", autospec=True, side_effect=submit) as submit_mock:
+            pr_changes = PrChangesGenerator.generate_all(self.test_folder, reports_and_changes, workers=2)
+            report, pr_change = next(pr_changes)
+            pr_changes.close()
+
+        self.assertEqual(list(reports_and_changes.keys())[0], report)
+        self.assertEqual("dep" + report.name[-1], pr_change.dependencies[0].name)
+        self.assertEqual(4, submit_mock.call_count)
+
+    def __write_report(self, rel_path: str, dep_name: str):
+        report = {
+            "url": "https://www.meterian.io/projects/?pid=uuid&branch=main",
+            "autofix": { "changes": [ { "name": dep_name, "version": "1.0.0", "language": "java", "upgradedTo": "1.0.1" } ] },
+            "reports": { "security": {}, "licensing": {} }
+        }
+        Path(self.test_folder, rel_path).write_text(json.dumps(report))
+
+    def __touch(self, rel_path: str):
+        path = Path(self.test_folder, rel_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"content")
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
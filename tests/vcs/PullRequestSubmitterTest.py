@@ -0,0 +1,165 @@
+import hashlib
+import shutil
+import tempfile
+import unittest
+import uuid
+
+from pathlib import Path
+from unittest.mock import ANY, Mock, patch
+from src.vcs.FileContent import FileContent
+from src.vcs.PrChangesGenerator import Dependency, FilesystemChange, PrChange
+from src.vcs.PullRequestSubmitter import PullRequestSubmitter
+from src.vcs.RepositoryInterface import RepositoryInterface
+from src.vcs.CommitAuthor import CommitAuthor
+from src.vcs.LabelData import LabelData
+from src.vcs.PullRequestIndex import PullRequestIndex
+from src.vcs.PullRequestInterface import PullRequestInterface
+
+class PullRequestSubmitterTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_folder = Path(tempfile.mkdtemp(prefix="meterian_pr_"))
+        self.repo = Mock(spec=RepositoryInterface)
+        self.repo.get_default_branch.return_value = "main"
+        self.repo.filter_changes.side_effect = lambda branch, changes: list(changes)
+        self.submitter = PullRequestSubmitter(str(self.test_folder), self.repo, CommitAuthor("foo", "foo@baz.com"))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_folder)
+
+    def test_should_generate_same_branch_uuid_as_concatenated_seed(self):
+        lock_file = Path(self.test_folder, "package-lock.json")
+        lock_file.write_bytes(b'{ "lockfileVersion": 2 }')
+        deps = [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21"), Dependency("nodejs", "axios", "0.21.0", "0.21.2") ]
+        changes = [ FilesystemChange("package.json", b'{ "name": "foo" }'), FilesystemChange("package-lock.json", FileContent(str(lock_file))) ]
+        pr_change = PrChange("pid", deps, changes, None, { "solution": { "path": "/work/package.json" } })
+
+        branch_ref = self.submitter._PullRequestSubmitter__create_pr_branch_ref("main", pr_change)
+
+        self.assertEqual("refs/heads/" + PullRequestSubmitter.PR_BRANCH_NAME_PREFIX + self.__legacy_uuid(pr_change), branch_ref)
+
+    def test_should_not_reorder_pr_change_lists(self):
+        deps = [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21"), Dependency("nodejs", "axios", "0.21.0", "0.21.2") ]
+        changes = [ FilesystemChange("package.json", b"b"), FilesystemChange("package-lock.json", b"a") ]
+        pr_change = PrChange("pid", list(deps), list(changes), None, None)
+
+        self.submitter._PullRequestSubmitter__create_pr_branch_ref("main", pr_change)
+
+        self.assertEqual(deps, pr_change.dependencies)
+        self.assertEqual(changes, pr_change.filesystem_changes)
+
+    def test_should_create_pr_branch_with_the_commit_in_one_write(self):
+        self.repo.get_pr_label.return_value = LabelData("meterian-bot-pr", "description", "color", "text_color")
+        self.repo.create_label.return_value = True
+        self.repo.get_pulls_index.side_effect = PullRequestIndex
+        self.repo.commit_changes_to_new_branch.return_value = True
+        changes = [ FilesystemChange("package.json", b'{ "name": "foo" }') ]
+        pr_change = PrChange("pid", [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21") ], changes, None, None)
+
+        self.assertIs(pr_change, self.submitter.submit({ "title": "title", "message": "message" }, pr_change, "main"))
+
+        branch_name = PullRequestSubmitter.PR_BRANCH_NAME_PREFIX + self.submitter._PullRequestSubmitter__generate_uuid(pr_change)
+        self.repo.create_branch.assert_not_called()
+        self.repo.commit_changes.assert_not_called()
+        self.repo.commit_changes_to_new_branch.assert_called_once_with(ANY, ANY, "main", branch_name, changes)
+        self.repo.create_pull_request.assert_called_once_with("title", "message", branch_name, "main", [ "meterian-bot-pr" ])
+
+    def test_should_not_open_pr_when_changes_could_not_be_committed(self):
+        self.repo.get_pr_label.return_value = LabelData("meterian-bot-pr", "description", "color", "text_color")
+        self.repo.get_pulls_index.side_effect = PullRequestIndex
+        self.repo.commit_changes_to_new_branch.return_value = False
+        pr_change = PrChange("pid", [], [ FilesystemChange("package.json", b"{}") ], None, None)
+
+        self.assertIsNone(self.submitter.submit({ "title": "title", "message": "message" }, pr_change, "main"))
+
+        self.repo.commit_changes_to_new_branch.assert_called_once()
+        self.repo.create_pull_request.assert_not_called()
+
+    def test_should_list_pulls_once_and_skip_changes_already_submitted(self):
+        self.repo.get_pr_label.return_value = LabelData("meterian-bot-pr", "description", "color", "text_color")
+        self.repo.create_label.return_value = True
+        self.repo.commit_changes_to_new_branch.return_value = True
+        self.repo.create_pull_request.return_value = Mock(spec=PullRequestInterface, get_url=Mock(return_value="https://pr/2"))
+        submitted = PrChange("pid", [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21") ], [ FilesystemChange("package.json", b"a") ], None, None)
+        index = PullRequestIndex(PullRequestSubmitter.PR_BRANCH_NAME_PREFIX)
+        index.add(PullRequestSubmitter.PR_BRANCH_NAME_PREFIX + self.submitter._PullRequestSubmitter__generate_uuid(submitted), "closed", "https://pr/1")
+        self.repo.get_pulls_index.return_value = index
+        new = PrChange("pid", [ Dependency("nodejs", "axios", "0.21.0", "0.21.2") ], [ FilesystemChange("package.json", b"b") ], None, None)
+
+        self.assertIsNone(self.submitter.submit({ "title": "title", "message": "message" }, submitted, "main"))
+        self.assertIs(new, self.submitter.submit({ "title": "title", "message": "message" }, new, "main"))
+        self.assertIsNone(self.submitter.submit({ "title": "title", "message": "message" }, new, "main"))
+
+        self.repo.get_pulls_index.assert_called_once_with(PullRequestSubmitter.PR_BRANCH_NAME_PREFIX)
+        self.repo.get_open_pulls.assert_not_called()
+        self.repo.get_closed_pulls.assert_not_called()
+        self.repo.commit_changes_to_new_branch.assert_called_once()
+        self.assertEqual(("open", "https://pr/2"), index.get(PullRequestSubmitter.PR_BRANCH_NAME_PREFIX + self.submitter._PullRequestSubmitter__generate_uuid(new)))
+
+    def test_should_make_no_write_when_change_was_already_submitted(self):
+        pr_change = PrChange("pid", [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21") ], [ FilesystemChange("package.json", b"a") ], None, None)
+        index = PullRequestIndex(PullRequestSubmitter.PR_BRANCH_NAME_PREFIX)
+        index.add(PullRequestSubmitter.PR_BRANCH_NAME_PREFIX + self.submitter._PullRequestSubmitter__generate_uuid(pr_change), "closed", "https://pr/1")
+        self.repo.get_pulls_index.return_value = index
+
+        self.assertTrue(self.submitter.is_submitted(pr_change, "main"))
+        self.assertIsNone(self.submitter.submit({ "title": "title", "message": "message" }, pr_change, "main"))
+
+        self.repo.create_label.assert_not_called()
+        self.repo.create_branch.assert_not_called()
+        self.repo.commit_changes_to_new_branch.assert_not_called()
+        self.repo.create_pull_request.assert_not_called()
+        self.assertEqual([ (pr_change, "a pull request was already opened (closed): https://pr/1") ], self.submitter.skipped)
+
+    def test_should_compute_branch_of_change_once(self):
+        Path(self.test_folder, "report.pdf").write_bytes(b"%PDF-1.4")
+        pr_change = PrChange("pid", [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21") ], [ FilesystemChange("package.json", b"a") ], None, None)
+        self.repo.get_pulls_index.side_effect = PullRequestIndex
+        self.repo.create_label.return_value = False
+        self.repo.commit_changes_to_new_branch.return_value = True
+
+        with patch.object(FilesystemChange, "feed", autospec=True, side_effect=FilesystemChange.feed) as feed:
+            self.assertFalse(self.submitter.is_submitted(pr_change, "main", "report.pdf"))
+            self.submitter.submit({ "title": "title", "message": "message" }, pr_change, "main", "report.pdf")
+
+        self.assertEqual([ "package.json", "report.pdf" ], [ call.args[0].rel_file_path for call in feed.call_args_list ])
+        self.repo.commit_changes_to_new_branch.assert_called_once()
+
+    def test_should_include_pdf_report_in_branch_uuid_without_altering_pr_change(self):
+        Path(self.test_folder, "report.pdf").write_bytes(b"%PDF-1.4")
+        changes = [ FilesystemChange("package.json", b"a") ]
+        pr_change = PrChange("pid", [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21") ], list(changes), None, None)
+        with_pdf = PrChange("pid", list(pr_change.dependencies), changes + [ FilesystemChange("report.pdf", b"%PDF-1.4") ], None, None)
+        self.repo.get_pulls_index.side_effect = PullRequestIndex
+        self.repo.create_label.return_value = False
+        self.repo.commit_changes_to_new_branch.return_value = True
+
+        self.submitter.submit({ "title": "title", "message": "message" }, pr_change, "main", "report.pdf")
+
+        self.assertEqual(changes, pr_change.filesystem_changes)
+        branch_name = self.repo.commit_changes_to_new_branch.call_args.args[3]
+        self.assertEqual(PullRequestSubmitter.PR_BRANCH_NAME_PREFIX + self.__legacy_uuid(with_pdf), branch_name)
+        self.assertEqual([ "package.json", "report.pdf" ], [ change.rel_file_path for change in self.repo.commit_changes_to_new_branch.call_args.args[4] ])
+
+    def test_should_skip_change_when_manifests_already_match_base_branch(self):
+        self.repo.get_pulls_index.side_effect = PullRequestIndex
+        self.repo.filter_changes.side_effect = lambda branch, changes: []
+        pr_change = PrChange("pid", [ Dependency("nodejs", "lodash", "4.17.15", "4.17.21") ], [ FilesystemChange("package.json", b"a") ], None, None)
+
+        self.assertIsNone(self.submitter.submit({ "title": "title", "message": "message" }, pr_change, "main"))
+
+        self.repo.filter_changes.assert_called_once_with("main", pr_change.filesystem_changes)
+        self.repo.create_label.assert_not_called()
+        self.repo.commit_changes_to_new_branch.assert_not_called()
+        self.assertEqual([ (pr_change, "the manifests already match the ones on branch main") ], self.submitter.skipped)
+
+    def __legacy_uuid(self, pr_change: PrChange) -> str:
+        seed = "".join(dep.name+dep.version for dep in sorted(pr_change.dependencies)).encode("utf-8")
+        for manifest in sorted(pr_change.filesystem_changes):
+            seed += manifest.content
+        if pr_change.manifest_info:
+            seed += Path(pr_change.manifest_info["solution"]["path"]).name.encode("utf-8")
+        return str(uuid.UUID(hashlib.md5(seed).hexdigest()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+from pathlib import Path
+from unittest.mock import patch
+from src.vcs.ReportStore import ReportStore
+
+class ReportStoreTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_folder = Path(tempfile.mkdtemp(prefix="meterian_pr_"))
+        self.report_path = Path(self.test_folder, "report.json.pr1")
+        self.__write_report({ "url": "https://www.meterian.io/projects/?pid=uuid", "autofix": { "changes": [] }, "reports": { "licensing": {} } })
+        self.store = ReportStore()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_folder)
+
+    def test_should_derive_digest_from_loaded_report(self):
+        with patch("src.vcs.ReportStore.json.load", wraps=json.load) as json_load:
+            report = self.store.get(self.report_path)
+            digest = self.store.get_digest(self.report_path)
+
+            json_load.assert_called_once()
+
+        self.assertTrue("reports" in report)
+        self.assertEqual({ "url": "https://www.meterian.io/projects/?pid=uuid", "autofix": { "changes": [] } }, digest)
+
+    def test_should_only_hand_report_out_when_decoded_for_its_digest(self):
+        with patch("src.vcs.ReportStore.json.load", wraps=json.load) as json_load:
+            digest, report = self.store.get_digest_and_report(self.report_path)
+            self.assertEqual((digest, None), self.store.get_digest_and_report(self.report_path))
+
+            json_load.assert_called_once()
+        self.assertTrue("reports" in report)
+        self.assertEqual({ "url": "https://www.meterian.io/projects/?pid=uuid", "autofix": { "changes": [] } }, digest)
+
+    def test_should_not_decode_report_whose_digest_was_put(self):
+        digest = { "url": "https://www.meterian.io/projects/?pid=uuid", "autofix": { "changes": [] } }
+
+        with patch("src.vcs.ReportStore.json.load", wraps=json.load) as json_load:
+            self.store.put_digest(self.report_path, digest)
+
+            self.assertEqual(digest, self.store.get_digest(self.report_path))
+            json_load.assert_not_called()
+
+    def test_should_not_keep_parsed_reports(self):
+        report = self.store.get(self.report_path)
+
+        self.assertIsNot(report, self.store.get(self.report_path))
+        self.assertEqual(report, self.store.get(self.report_path))
+
+    def test_should_reload_report_when_it_changes(self):
+        self.store.get(self.report_path)
+        self.__write_report({ "url": "https://www.meterian.io/projects/?pid=other-uuid", "autofix": { "changes": [ {} ] } })
+        stat = os.stat(self.report_path)
+        os.utime(self.report_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        self.assertEqual("https://www.meterian.io/projects/?pid=other-uuid", self.store.get(self.report_path)["url"])
+
+    def test_should_get_none_when_report_cannot_be_loaded(self):
+        self.report_path.write_text("{ not json")
+
+        self.assertIsNone(self.store.get(self.report_path))
+        self.assertIsNone(self.store.get_digest(Path(self.test_folder, "report.json.pr2")))
+
+    def __write_report(self, report: dict):
+        with open(self.report_path, "w", encoding="utf-8") as stream:
+            json.dump(report, stream)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import json
+import pickle
+import shutil
+import tempfile
+
+from pathlib import Path
+from unittest.mock import patch
+from src.vcs.ScanCache import ScanCache
+from src.vcs.ReportStore import ReportStore
+from src.vcs.PrChangesGenerator import PrChangesGenerator
+
+class ScanCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_folder = Path(tempfile.mkdtemp(prefix="meterian_pr_"))
+        self.scan_cache = ScanCache.in_work_dir(self.test_folder)
+
+    def tearDown(self) -> None:
+        self.scan_cache.close()
+        shutil.rmtree(self.test_folder)
+
+    def test_should_persist_entries_between_runs(self):
+        report = Path(self.test_folder, "report.json.pr1")
+        report.write_text(json.dumps({ "url": "https://www.meterian.io/projects/?pid=uuid", "autofix": { "changes": [] } }))
+        ReportStore(self.scan_cache).get_digest(report)
+        self.scan_cache.close()
+
+        with patch("src.vcs.ReportStore.json.load") as json_load:
+            digest = ReportStore(ScanCache.in_work_dir(self.test_folder)).get_digest(report)
+
+            json_load.assert_not_called()
+        self.assertEqual("https://www.meterian.io/projects/?pid=uuid", digest["url"])
+
+    def test_should_defer_writes_of_worker_copies(self):
+        manifest = Path(self.test_folder, "pom.xml.pr1")
+        manifest.write_bytes(b"content")
+        worker_copy = pickle.loads(pickle.dumps(self.scan_cache))
+
+        worker_copy.put_manifest_hash(str(manifest), os.stat(manifest), "hash")
+
+        self.assertIsNone(self.scan_cache.get_manifest_hash(str(manifest), os.stat(manifest)))
+        self.scan_cache.apply(worker_copy.take_deferred())
+        self.assertEqual("hash", self.scan_cache.get_manifest_hash(str(manifest), os.stat(manifest)))
+        self.assertEqual([], worker_copy.take_deferred())
+
+    def test_should_record_entries_of_worker_processes_while_holding_pending_writes(self):
+        for pr_no in range(1, 4):
+            Path(self.test_folder, "report.json.pr" + str(pr_no)).write_text(json.dumps({
+                "url": "https://www.meterian.io/projects/?pid=uuid",
+                "autofix": { "changes": [ { "name": "dep", "version": "1.0.0", "language": "java", "upgradedTo": "1.0.1" } ] }
+            }))
+            Path(self.test_folder, "module" + str(pr_no)).mkdir()
+            Path(self.test_folder, "module" + str(pr_no), "pom.xml.pr" + str(pr_no)).write_bytes(b"content")
+        reports_and_changes = PrChangesGenerator.fetch_changed_manifests(self.test_folder)
+        report_store = ReportStore(self.scan_cache)
+        PrChangesGenerator.parse_pid(list(reports_and_changes.keys())[0], report_store)
+
+        results = list(PrChangesGenerator.generate_all(self.test_folder, reports_and_changes, report_store, 2, self.scan_cache))
+
+        self.assertEqual(3, len([ pr_change for _, pr_change in results if pr_change ]))
+        manifest = Path(self.test_folder, "module3", "pom.xml.pr3").absolute()
+        self.assertIsNotNone(self.scan_cache.get_manifest_hash(str(manifest), os.stat(manifest)))
+
+if __name__ == "__main__":
+    unittest.main()
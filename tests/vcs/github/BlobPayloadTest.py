@@ -0,0 +1,92 @@
+import base64
+import json
+import threading
+import unittest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from github import Github as PyGithub
+from github.GithubException import GithubException
+from src.vcs.github.BlobPayload import BlobPayload
+
+class BlobStubHandler(BaseHTTPRequestHandler):
+    """Records the blob creation requests received and replies with the canned response of the server"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.path, dict(self.headers), body))
+        status, payload = self.server.response
+
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+class BlobPayloadTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = HTTPServer(("127.0.0.1", 0), BlobStubHandler)
+        self.server.requests = []
+        self.server.response = (201, { "sha": "blob-sha", "url": "" })
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.pyGithub = PyGithub("token", base_url="http://127.0.0.1:%d/api/v3" % self.server.server_port)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_should_create_blob_through_pygithub_requester(self):
+        content = b"{ \"lockfileVersion\": 2 }\n" * 10000
+        repo = self.pyGithub.get_repo("MyOrg/MyRepo", lazy=True)
+
+        self.assertEqual("blob-sha", BlobPayload.create_git_blob(repo, content))
+
+        path, headers, body = self.server.requests[0]
+        self.assertEqual("/api/v3/repos/MyOrg/MyRepo/git/blobs", path)
+        self.assertEqual("token token", headers["Authorization"])
+        self.assertEqual("application/json", headers["Content-Type"])
+        self.assertEqual(str(len(body)), headers["Content-Length"])
+        self.assertEqual({ "encoding": "base64", "content": base64.b64encode(content).decode() }, json.loads(body))
+
+    def test_should_raise_when_blob_creation_fails(self):
+        self.server.response = (422, { "message": "Validation Failed" })
+        repo = self.pyGithub.get_repo("MyOrg/MyRepo", lazy=True)
+
+        with self.assertRaises(GithubException) as ctx:
+            BlobPayload.create_git_blob(repo, b"content")
+        self.assertEqual(422, ctx.exception.status)
+
+    def test_should_encode_content_across_chunks_in_reads_of_any_size(self):
+        content = bytes(range(256)) * (BlobPayload.CHUNK_SIZE // 128 + 1)
+        payload = BlobPayload(content)
+
+        body = b""
+        data = payload.read(1000)
+        while data:
+            body += data
+            data = payload.read(1000)
+
+        self.assertEqual(len(payload), len(body))
+        self.assertEqual({ "encoding": "base64", "content": base64.b64encode(content).decode() }, json.loads(body))
+
+    def test_should_encode_empty_content(self):
+        payload = BlobPayload(b"")
+
+        self.assertEqual(b'{"encoding":"base64","content":""}', payload.read())
+        self.assertEqual(b"", payload.read())
+
+    def test_should_release_content_on_close(self):
+        content = bytearray(b"content")
+        payload = BlobPayload(content)
+        payload.close()
+
+        # resizing fails while a view of the content is still exported
+        content.extend(b" resized")
+        self.assertEqual(len('{"encoding":"base64","content":""}') + 12, len(payload))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import Mock
+
+from src.vcs.github.GithubGraphQLClient import GithubGraphQLClient
+from src.vcs.github.GithubGraphQLRepo import GithubGraphQLRepo
+from src.vcs.CommitAuthor import CommitAuthor
+from src.vcs.PrChangesGenerator import FilesystemChange
+from github import Repository as PyGithubRepository
+
+class GraphQLStubHandler(BaseHTTPRequestHandler):
+    """Replies to each call with the next canned response of the server and records the calls received"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.calls.append(body)
+        status, payload = self.server.responses.pop(0)
+
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+class GithubGraphQLRepoTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = HTTPServer(("127.0.0.1", 0), GraphQLStubHandler)
+        self.server.calls = []
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.client = GithubGraphQLClient("token", "http://127.0.0.1:%d/graphql" % self.server.server_port)
+        self.pyGithubRepo = Mock(spec=PyGithubRepository)
+        self.pyGithubRepo.full_name = "MyOrg/MyRepo"
+        self.repo = GithubGraphQLRepo(self.pyGithubRepo, self.client)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_should_derive_graphql_url_from_rest_base_url(self):
+        self.assertEqual("https://api.github.com/graphql", GithubGraphQLClient.graphql_url("https://api.github.com"))
+        self.assertEqual("https://ghe.company.com/api/graphql", GithubGraphQLClient.graphql_url("https://ghe.company.com/api/v3/"))
+
+    def test_should_look_branches_up_in_one_query_and_create_branch(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": None, "b1": { "target": { "oid": "main-sha" } } } } }),
+            (200, { "data": { "createRef": { "ref": { "target": { "oid": "main-sha" } } } } })
+        ]
+
+        self.assertTrue(self.repo.create_branch("main", "meterian-bot/pr/1"))
+        self.assertTrue(self.repo.is_remote_branch("meterian-bot/pr/1"))
+
+        self.assertEqual(2, len(self.server.calls))
+        self.assertEqual({ "owner": "MyOrg", "name": "MyRepo", "b0": "refs/heads/meterian-bot/pr/1", "b1": "refs/heads/main" }, self.server.calls[0]["variables"])
+        self.assertEqual({ "repositoryId": "R_1", "name": "refs/heads/meterian-bot/pr/1", "oid": "main-sha" }, self.server.calls[1]["variables"]["input"])
+
+    def test_should_not_create_branch_when_it_already_exists(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": { "target": { "oid": "pr-sha" } }, "b1": { "target": { "oid": "main-sha" } } } } })
+        ]
+
+        self.assertTrue(self.repo.create_branch("main", "meterian-bot/pr/1"))
+        self.assertEqual(1, len(self.server.calls))
+
+    def test_should_commit_all_changes_in_one_call_against_the_known_head(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": { "target": { "oid": "pr-sha" } } } } }),
+            (200, { "data": { "createCommitOnBranch": { "commit": { "oid": "new-sha" } } } }),
+            (200, { "data": { "createCommitOnBranch": { "commit": { "oid": "newer-sha" } } } })
+        ]
+        changes = [ FilesystemChange("pom.xml", b"<project/>"), FilesystemChange("report.pdf", b"\x00\x01") ]
+
+        self.assertTrue(self.repo.commit_changes(CommitAuthor("bot", "bot@meterian.io"), "Autofix\n\n- updated a from 1 to 2\n", "pr", changes))
+        self.assertTrue(self.repo.commit_changes(CommitAuthor("bot", "bot@meterian.io"), "Autofix", "pr", changes[:1]))
+
+        self.assertEqual(3, len(self.server.calls))
+        commit_input = self.server.calls[1]["variables"]["input"]
+        self.assertEqual({ "repositoryNameWithOwner": "MyOrg/MyRepo", "branchName": "pr" }, commit_input["branch"])
+        self.assertEqual({ "headline": "Autofix", "body": "- updated a from 1 to 2" }, commit_input["message"])
+        self.assertEqual([ { "path": "pom.xml", "contents": "PHByb2plY3QvPg==" }, { "path": "report.pdf", "contents": "AAE=" } ], commit_input["fileChanges"]["additions"])
+        self.assertEqual("pr-sha", commit_input["expectedHeadOid"])
+        self.assertEqual("new-sha", self.server.calls[2]["variables"]["input"]["expectedHeadOid"])
+
+    def test_should_look_branch_up_again_after_a_failed_commit(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": { "target": { "oid": "pr-sha" } } } } }),
+            (200, { "data": None, "errors": [ { "message": "Expected branch to point to pr-sha" } ] }),
+            (200, { "data": { "repository": { "id": "R_1", "b0": { "target": { "oid": "moved-sha" } } } } }),
+            (200, { "data": { "createCommitOnBranch": { "commit": { "oid": "new-sha" } } } })
+        ]
+        changes = [ FilesystemChange("pom.xml", b"<project/>") ]
+
+        self.assertFalse(self.repo.commit_changes(CommitAuthor("bot", "bot@meterian.io"), "Autofix", "pr", changes))
+        self.assertTrue(self.repo.commit_changes(CommitAuthor("bot", "bot@meterian.io"), "Autofix", "pr", changes))
+
+        self.assertEqual("moved-sha", self.server.calls[3]["variables"]["input"]["expectedHeadOid"])
+
+    def test_should_create_new_branch_and_commit_in_one_call(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": None, "b1": { "target": { "oid": "main-sha" } } } } }),
+            (200, { "data": { "createRef": { "ref": { "target": { "oid": "main-sha" } } }, "createCommitOnBranch": { "commit": { "oid": "new-sha" } } } })
+        ]
+
+        self.assertTrue(self.repo.commit_changes_to_new_branch(CommitAuthor("bot", "bot@meterian.io"), "Autofix", "main", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"<project/>") ]))
+
+        self.assertEqual(2, len(self.server.calls))
+        variables = self.server.calls[1]["variables"]
+        self.assertEqual({ "repositoryId": "R_1", "name": "refs/heads/meterian-bot/pr/1", "oid": "main-sha" }, variables["ref"])
+        self.assertEqual("meterian-bot/pr/1", variables["commit"]["branch"]["branchName"])
+        self.assertEqual("main-sha", variables["commit"]["expectedHeadOid"])
+        self.assertTrue(self.repo.is_remote_branch("meterian-bot/pr/1"))
+        self.assertEqual(2, len(self.server.calls))
+
+    def test_should_delete_new_branch_when_commit_fails(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": None, "b1": { "target": { "oid": "main-sha" } } } } }),
+            (200, { "data": { "createRef": { "ref": { "target": { "oid": "main-sha" } } }, "createCommitOnBranch": None }, "errors": [ { "message": "Commit is too large" } ] }),
+            (200, { "data": { "repository": { "ref": { "id": "REF_1", "target": { "oid": "main-sha" } } } } }),
+            (200, { "data": { "deleteRef": { "clientMutationId": None } } }),
+            (200, { "data": { "repository": { "id": "R_1", "b0": None } } })
+        ]
+
+        self.assertFalse(self.repo.commit_changes_to_new_branch(CommitAuthor("bot", "bot@meterian.io"), "Autofix", "main", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"<project/>") ]))
+
+        self.assertEqual({ "owner": "MyOrg", "name": "MyRepo", "ref": "refs/heads/meterian-bot/pr/1" }, self.server.calls[2]["variables"])
+        self.assertEqual({ "refId": "REF_1" }, self.server.calls[3]["variables"]["input"])
+        self.assertFalse(self.repo.is_remote_branch("meterian-bot/pr/1"))
+
+    def test_should_not_delete_new_branch_that_moved_on_when_commit_fails(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": None, "b1": { "target": { "oid": "main-sha" } } } } }),
+            (502, { "message": "Bad Gateway" }),
+            (200, { "data": { "repository": { "ref": { "id": "REF_1", "target": { "oid": "new-sha" } } } } })
+        ]
+
+        self.assertFalse(self.repo.commit_changes_to_new_branch(CommitAuthor("bot", "bot@meterian.io"), "Autofix", "main", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"<project/>") ]))
+
+        self.assertEqual(3, len(self.server.calls))
+
+    def test_should_commit_large_changes_through_git_data_api(self):
+        self.repo.LARGE_FILE_THRESHOLD = 4
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "b0": { "target": { "oid": "pr-sha" } } } } }),
+            (200, { "data": { "repository": { "id": "R_1", "b0": { "target": { "oid": "new-sha" } } } } })
+        ]
+        self.pyGithubRepo.get_branch = Mock(return_value=Mock(commit=Mock(sha="pr-sha")))
+        self.pyGithubRepo.get_git_tree = Mock(return_value=Mock(tree=[]))
+        self.pyGithubRepo.get_git_commit = Mock()
+        self.pyGithubRepo.create_git_tree = Mock()
+        self.pyGithubRepo.create_git_commit = Mock(return_value=Mock(sha="new-sha"))
+        self.pyGithubRepo.get_git_ref = Mock()
+
+        self.assertTrue(self.repo.commit_changes(CommitAuthor("bot", "bot@meterian.io"), "Autofix", "pr", [ FilesystemChange("pom.xml", b"<project/>") ]))
+
+        self.pyGithubRepo.get_git_ref.return_value.edit.assert_called_once_with(sha="new-sha")
+        self.pyGithubRepo.get_git_tree.assert_called_once_with(sha="pr-sha", recursive=True)
+        # the branch moved by the REST commit is looked up again
+        self.assertTrue(self.repo.is_remote_branch("pr"))
+        self.assertEqual(2, len(self.server.calls))
+
+    def test_should_index_own_pulls_page_by_page(self):
+        self.pyGithubRepo.organization = Mock(login="MyOrg")
+        self.server.responses = [
+            (200, { "data": { "repository": { "pullRequests": {
+                "nodes": [
+                    { "headRefName": "meterian-bot/pr/1", "state": "MERGED", "url": "https://pr/1", "headRepositoryOwner": { "login": "MyOrg" } },
+                    { "headRefName": "meterian-bot/pr/2", "state": "OPEN", "url": "https://pr/2", "headRepositoryOwner": { "login": "Fork" } }
+                ],
+                "pageInfo": { "hasNextPage": True, "endCursor": "c1" }
+            } } } }),
+            (200, { "data": { "repository": { "pullRequests": {
+                "nodes": [
+                    { "headRefName": "meterian-bot/pr/3", "state": "OPEN", "url": "https://pr/3", "headRepositoryOwner": { "login": "MyOrg" } },
+                    { "headRefName": "feature", "state": "OPEN", "url": "https://pr/4", "headRepositoryOwner": None }
+                ],
+                "pageInfo": { "hasNextPage": False, "endCursor": "c2" }
+            } } } })
+        ]
+
+        index = self.repo.get_pulls_index("meterian-bot/pr/")
+
+        self.assertEqual(2, len(index))
+        self.assertEqual(("merged", "https://pr/1"), index.get("meterian-bot/pr/1"))
+        self.assertEqual(("open", "https://pr/3"), index.get("meterian-bot/pr/3"))
+        self.assertEqual([ None, "c1" ], [ call["variables"]["cursor"] for call in self.server.calls ])
+
+    def test_should_create_labelled_pull_request(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1", "l0": { "id": "LA_1" } } } }),
+            (200, { "data": { "createPullRequest": { "pullRequest": { "id": "PR_1", "url": "https://github.com/MyOrg/MyRepo/pull/1", "title": "title", "body": "body" } } } }),
+            (200, { "data": { "addLabelsToLabelable": { "clientMutationId": None } } })
+        ]
+
+        pr = self.repo.create_pull_request("title", "body", "meterian-bot/pr/1", "main", [ "meterian-bot-pr" ])
+
+        self.assertEqual("https://github.com/MyOrg/MyRepo/pull/1", pr.get_url())
+        self.assertEqual({ "repositoryId": "R_1", "title": "title", "body": "body", "headRefName": "meterian-bot/pr/1", "baseRefName": "main" }, self.server.calls[1]["variables"]["input"])
+        self.assertEqual({ "labelableId": "PR_1", "labelIds": [ "LA_1" ] }, self.server.calls[2]["variables"]["input"])
+
+    def test_should_get_none_when_pull_request_creation_fails(self):
+        self.server.responses = [
+            (200, { "data": { "repository": { "id": "R_1" } } }),
+            (502, { "message": "Bad Gateway" })
+        ]
+
+        self.assertIsNone(self.repo.create_pull_request("title", "body", "meterian-bot/pr/1", "main"))
+
+if __name__ == "__main__":
+    unittest.main()
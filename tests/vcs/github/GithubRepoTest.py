@@ -1,10 +1,18 @@
+import json
+import shutil
+import tempfile
 import unittest
 
+from pathlib import Path
 from unittest.mock import MagicMock
 from unittest.mock import ANY
 from unittest.mock import Mock
+from unittest.mock import PropertyMock
 from github.Label import Label
 from github.Commit import Commit
+from github.GitCommit import GitCommit
+from github.GitTree import GitTree
+from github.GitTreeElement import GitTreeElement
 from github import GithubObject
 from github.ContentFile import ContentFile
 from github.InputGitAuthor import InputGitAuthor
@@ -18,12 +26,16 @@ from src.vcs.RepositoryInterface import RepositoryInterface
 from src.vcs.github.GithubRepo import GithubRepo
 from src.vcs.PullRequestInterface import PullRequestInterface
 from src.vcs.CommitAuthor import CommitAuthor
+from src.vcs.gitlab.CommitData import CommitData
 from src.vcs.LabelData import LabelData
+from src.vcs.PrChangesGenerator import FilesystemChange
+from src.vcs.FileContent import FileContent
 
 class GithubRepoTest(unittest.TestCase):
 
     def setUp(self) -> None:
         self.pyGithubRepo = Mock(spec=PyGithubRepository)
+        self.pyGithubRepo.get_git_tree.return_value = Mock(spec=GitTree, tree=[], raw_data={ "truncated": False })
         self.githubRepo = GithubRepo(self.pyGithubRepo)
         self.author = CommitAuthor(
             "foo",
@@ -42,40 +54,52 @@ class GithubRepoTest(unittest.TestCase):
 
 # Branch creation tests
 
+    def test_should_serve_repo_metadata_from_snapshot(self):
+        default_branch = PropertyMock(return_value="main")
+        type(self.pyGithubRepo).default_branch = default_branch
+        self.pyGithubRepo.organization = None
+        self.pyGithubRepo.owner.login = "foo"
+        self.githubRepo.load_metadata()
+        self.pyGithubRepo.owner.login = "bar"
+
+        for _ in range(3):
+            self.assertEqual("main", self.githubRepo.get_default_branch())
+            self.assertEqual("foo", self.githubRepo.get_owner())
+        default_branch.assert_called_once()
+
     def test_should_fail_to_create_branch_when_unexpected_exception_is_caught(self):
         self.pyGithubRepo.create_git_ref = MagicMock(side_effect=GithubException(500, {"message":  "Error"}, None))
         base_branch = Mock(spec=Branch)
         base_branch.name = "master"
         base_branch.commit.sha = "commit-sha"
-        self.pyGithubRepo.get_branch = MagicMock(return_value=base_branch)
-        self.pyGithubRepo.get_branches = MagicMock(return_value=[base_branch])
+        self.__mock_get_branch([base_branch])
 
         result = self.githubRepo.create_branch("master", "new-branch-name")
 
-        self.pyGithubRepo.get_branch.assert_called_once_with("master")
+        self.pyGithubRepo.get_branch.assert_called_with("master")
         self.pyGithubRepo.create_git_ref.assert_called_once_with(ref="refs/heads/new-branch-name", sha="commit-sha")
         self.assertFalse(result)
 
     def test_should_not_create_branch_when_it_exists(self):
         base_branch = Mock(spec=Branch)
         base_branch.name = "new-branch-name"
-        self.pyGithubRepo.get_branches = MagicMock(return_value=[base_branch])
+        self.__mock_get_branch([base_branch])
 
         result = self.githubRepo.create_branch("base-branch-name", "new-branch-name")
 
-        self.pyGithubRepo.get_branches.assert_called_once()
+        self.pyGithubRepo.get_branch.assert_called_once_with("new-branch-name")
+        self.pyGithubRepo.create_git_ref.assert_not_called()
         self.assertTrue(result)
 
     def test_should_create_branch(self):
         base_branch = Mock(spec=Branch)
         base_branch.name = "master"
         base_branch.commit.sha = "commit-sha"
-        self.pyGithubRepo.get_branch = MagicMock(return_value=base_branch)
-        self.pyGithubRepo.get_branches = MagicMock(return_value=[base_branch])
+        self.__mock_get_branch([base_branch])
 
         result = self.githubRepo.create_branch("master", "new-branch-name")
 
-        self.pyGithubRepo.get_branch.assert_called_once_with("master")
+        self.pyGithubRepo.get_branch.assert_called_with("master")
         self.pyGithubRepo.create_git_ref.assert_called_once_with(ref="refs/heads/new-branch-name", sha="commit-sha")
         self.assertTrue(result)
 
@@ -84,47 +108,42 @@ class GithubRepoTest(unittest.TestCase):
     def test_should_not_commit_change_on_nonexistent_branch(self):
         branch = Mock(spec=Branch)
         branch.name = "master"
-        self.pyGithubRepo.get_branches = MagicMock(return_value=[branch])
+        self.__mock_get_branch([branch])
 
         result = self.githubRepo.commit_change(self.author, "commit message", "branch", "path/to/file", b'content')
 
-        self.pyGithubRepo.get_branches.assert_called_once()
+        self.pyGithubRepo.get_branch.assert_called_once_with("branch")
         self.assertFalse(result)
 
-    def test_should_fail_to_commit_new_remote_file_when_unexpected_exception_is_caught_on_content_fetch(self):
-        branches = self.__mock_branches(["master", "my_branch"])
-        self.pyGithubRepo.get_branches = MagicMock(return_value=branches)
-        self.pyGithubRepo.get_contents = MagicMock(side_effect=GithubException(500, {"message": "Error"}, None))
+    def test_should_fail_to_commit_new_remote_file_when_unexpected_exception_is_caught_on_tree_fetch(self):
+        self.__mock_get_branch(self.__mock_branches(["master", "my_branch"]))
+        self.pyGithubRepo.get_git_tree = MagicMock(side_effect=GithubException(500, {"message": "Error"}, None))
 
         result = self.githubRepo.commit_change(self.author, "commit message", "my_branch", "path/to/file", b'content')
 
-        self.pyGithubRepo.get_branches.assert_called_once()
-        self.pyGithubRepo.get_contents.assert_called_once_with("path/to/file", ref="my_branch")
+        self.pyGithubRepo.get_branch.assert_called_once_with("my_branch")
+        self.pyGithubRepo.get_git_tree.assert_called_once_with(sha="my_branch-sha", recursive=True)
         self.assertFalse(result)
 
     def test_should_fail_to_commit_new_remote_file_when_unexpected_exception_is_caught(self):
-        branches = self.__mock_branches(["master", "my_branch"])
-        self.pyGithubRepo.get_branches = MagicMock(return_value=branches)
-        self.pyGithubRepo.get_contents = MagicMock(side_effect=UnknownObjectException(404, {"message": "Not Found"}, None))
+        self.__mock_get_branch(self.__mock_branches(["master", "my_branch"]))
         self.pyGithubRepo.create_file = MagicMock(side_effect=GithubException(500, {"message": "Error"}, None))
 
         result = self.githubRepo.commit_change(self.author, "commit message", "my_branch", "path/to/file", b'content')
 
-        self.pyGithubRepo.get_branches.assert_called_once()
-        self.pyGithubRepo.get_contents.assert_called_once_with("path/to/file", ref="my_branch")
+        self.pyGithubRepo.get_branch.assert_called_once_with("my_branch")
         self.pyGithubRepo.create_file.assert_called_once_with("path/to/file", "commit message", b'content', branch="my_branch", committer=ANY)
         self.assertFalse(result)
 
     def test_should_create_file_when_committing_new_remote_file(self):
-        branches = self.__mock_branches(["master", "my_branch"])
-        self.pyGithubRepo.get_branches = MagicMock(return_value=branches)
-        self.pyGithubRepo.get_contents = MagicMock(side_effect=UnknownObjectException(404, {"message": "Not Found"}, None))
+        self.__mock_get_branch(self.__mock_branches(["master", "my_branch"]))
+        self.__mock_tree({ "path/to/other": b"other content" })
         self.pyGithubRepo.create_file = MagicMock(return_value={"content": Mock(spec=ContentFile), "commit": Mock(spec=Commit)})
 
         result = self.githubRepo.commit_change(self.author, "commit message", "my_branch", "path/to/file", b'content')
 
-        self.pyGithubRepo.get_branches.assert_called_once()
-        self.pyGithubRepo.get_contents.assert_called_once_with("path/to/file", ref="my_branch")
+        self.pyGithubRepo.get_branch.assert_called_once_with("my_branch")
+        self.pyGithubRepo.get_contents.assert_not_called()
         self.pyGithubRepo.create_file.assert_called_once_with("path/to/file", "commit message", b'content', branch="my_branch", committer=ANY)
         kwargs = self.pyGithubRepo.create_file.call_args[1]
         self.assertEqual(self.__as_committer(self.author)._InputGitAuthor__name, kwargs["committer"]._InputGitAuthor__name)
@@ -132,43 +151,37 @@ class GithubRepoTest(unittest.TestCase):
         self.assertTrue(result)
 
     def test_should_fail_to_commit_change_to_existent_remote_file_when_unexpected_exception_is_caught(self):
-        branches = self.__mock_branches(["master", "my_branch"])
-        self.pyGithubRepo.get_branches = MagicMock(return_value=branches)
-        content = self.__create_content("path/to/file", b'old content', "commit-sha")
-        self.pyGithubRepo.get_contents = MagicMock(return_value=content)
+        self.__mock_get_branch(self.__mock_branches(["master", "my_branch"]))
+        self.__mock_tree({ "path/to/file": b"old content" })
         self.pyGithubRepo.update_file = MagicMock(side_effect=GithubException(500, {"message": "Error"}, None))
 
         result = self.githubRepo.commit_change(self.author, "commit message", "my_branch", "path/to/file", b'new content')
 
-        self.pyGithubRepo.get_branches.assert_called_once()
-        self.pyGithubRepo.get_contents.assert_called_once_with("path/to/file", ref="my_branch")
-        self.pyGithubRepo.update_file.assert_called_once_with("path/to/file", "commit message", b'new content', "commit-sha", branch="my_branch", committer=ANY)
+        self.pyGithubRepo.get_branch.assert_called_once_with("my_branch")
+        self.pyGithubRepo.update_file.assert_called_once_with("path/to/file", "commit message", b'new content', FilesystemChange.compute_digest(b"old content"), branch="my_branch", committer=ANY)
         self.assertFalse(result)
 
     def test_should_not_update_file_when_committing_no_change_to_existent_remote_file(self):
-        branches = self.__mock_branches(["master", "my_branch"])
-        self.pyGithubRepo.get_branches = MagicMock(return_value=branches)
-        content = self.__create_content("path/to/file", b'old content', "commit-sha")
-        self.pyGithubRepo.get_contents = MagicMock(return_value=content)
+        self.__mock_get_branch(self.__mock_branches(["master", "my_branch"]))
+        self.__mock_tree({ "path/to/file": b"old content" })
 
         result = self.githubRepo.commit_change(self.author, "commit message", "my_branch", "path/to/file", b'old content')
 
-        self.pyGithubRepo.get_branches.assert_called_once()
-        self.pyGithubRepo.get_contents.assert_called_once_with("path/to/file", ref="my_branch")
+        self.pyGithubRepo.get_branch.assert_called_once_with("my_branch")
+        self.pyGithubRepo.get_contents.assert_not_called()
+        self.pyGithubRepo.update_file.assert_not_called()
         self.assertFalse(result)
 
     def test_should_update_file_when_committing_change_to_existent_remote_file(self):
-        branches = self.__mock_branches(["master", "my_branch"])
-        self.pyGithubRepo.get_branches = MagicMock(return_value=branches)
-        content = self.__create_content("path/to/file", b'old content', "commit-sha")
-        self.pyGithubRepo.get_contents = MagicMock(return_value=content)
+        self.__mock_get_branch(self.__mock_branches(["master", "my_branch"]))
+        self.__mock_tree({ "path/to/file": b"old content" })
         self.pyGithubRepo.update_file = MagicMock(return_value={"content": Mock(spec=ContentFile), "commit": Mock(spec=Commit)})
 
         result = self.githubRepo.commit_change(self.author, "commit message", "my_branch", "path/to/file", b'new content')
 
-        self.pyGithubRepo.get_branches.assert_called_once()
-        self.pyGithubRepo.get_contents.assert_called_once_with("path/to/file", ref="my_branch")
-        self.pyGithubRepo.update_file.assert_called_once_with("path/to/file", "commit message", b'new content', "commit-sha", branch="my_branch", committer=ANY)
+        self.pyGithubRepo.get_branch.assert_called_once_with("my_branch")
+        self.pyGithubRepo.get_contents.assert_not_called()
+        self.pyGithubRepo.update_file.assert_called_once_with("path/to/file", "commit message", b'new content', FilesystemChange.compute_digest(b"old content"), branch="my_branch", committer=ANY)
         kwargs = self.pyGithubRepo.update_file.call_args[1]
         self.assertEqual(self.__as_committer(self.author)._InputGitAuthor__name, kwargs["committer"]._InputGitAuthor__name)
         self.assertEqual(self.__as_committer(self.author)._InputGitAuthor__email, kwargs["committer"]._InputGitAuthor__email)
@@ -230,21 +243,21 @@ class GithubRepoTest(unittest.TestCase):
         pull.add_to_labels.assert_not_called()
         self.assertTrue(isinstance(pr, PullRequestInterface))
 
-    def test_should_create_pull_request_without_adding_meterian_label_when_pr_is_already_labelled(self):
-        label = self.__create_label(LabelData("my-label-name", "description", "color", None))
+    def test_should_label_pull_request_in_one_call_reusing_resolved_labels(self):
+        labels = [ self.__create_label(LabelData(name, "description", "color", None)) for name in ["my-label-name", "other-label-name"] ]
         pull = Mock(spec=PullRequest)
-        pull.get_labels = MagicMock(return_value=[label])
         self.pyGithubRepo.create_pull = MagicMock(return_value=pull)
-        self.pyGithubRepo.get_label = MagicMock(return_value=label)
-
-        print("The labels" + str(pull.get_labels()))
+        self.pyGithubRepo.get_label = MagicMock(side_effect=labels)
 
-        pr = self.githubRepo.create_pull_request("title", "body text", "head", "base", ["my-label-name"])
+        self.assertTrue(self.githubRepo.create_label("my-label-name", "description", "color", None))
+        self.assertTrue(self.githubRepo.create_label("my-label-name", "description", "color", None))
+        self.githubRepo.create_pull_request("title", "body text", "head", "base", ["my-label-name", "other-label-name"])
+        self.githubRepo.create_pull_request("title", "body text", "head", "base", ["my-label-name", "other-label-name"])
 
-        self.pyGithubRepo.create_pull.assert_called_once_with(title="title", body="body text", head="head", base="base")
-        pull.get_labels.assert_called()
-        pull.add_to_labels.assert_not_called()
-        self.assertTrue(isinstance(pr, PullRequestInterface))
+        self.assertEqual(2, self.pyGithubRepo.get_label.call_count)
+        pull.get_labels.assert_not_called()
+        self.assertEqual(2, pull.add_to_labels.call_count)
+        self.assertEqual(["my-label-name", "other-label-name"], [ label.name for label in pull.add_to_labels.call_args[0] ])
 
     def test_should_not_create_pull_request_when_exception_is_caught(self):
         self.pyGithubRepo.create_pull = MagicMock(side_effect=GithubException(500, {"message": "Error"}, None))
@@ -280,7 +293,229 @@ class GithubRepoTest(unittest.TestCase):
         self.githubRepo.create_issue("title", "body")
         self.pyGithubRepo.create_issue.assert_called_once_with(title="title", body="body", labels=GithubObject.NotSet)
 
-    
+    def test_should_upload_blobs_concurrently_keeping_changes_order(self):
+        upload_repos = []
+        def repo_factory():
+            repo = Mock(spec=PyGithubRepository)
+            repo.create_git_blob.side_effect = lambda content, encoding: Mock(sha="sha-" + content)
+            upload_repos.append(repo)
+            return repo
+        githubRepo = GithubRepo(self.pyGithubRepo, repo_factory)
+        githubRepo.inline_threshold = 0
+        self.__mock_commit_target(["main"])
+        changes = [ FilesystemChange("module" + str(i) + "/pom.xml", str(i).encode()) for i in range(6) ]
+
+        self.assertTrue(githubRepo.commit_changes(self.author, "message", "main", changes))
+
+        elements = self.pyGithubRepo.create_git_tree.call_args.args[0]
+        self.assertEqual([ change.rel_file_path for change in changes ], [ element._InputGitTreeElement__path for element in elements ])
+        self.assertEqual("sha-" + CommitData.to_base64(b"3").decode(), elements[3]._InputGitTreeElement__sha)
+        self.pyGithubRepo.create_git_blob.assert_not_called()
+        self.assertTrue(1 <= len(upload_repos) <= GithubRepo.UPLOAD_WORKERS)
+        self.assertEqual(6, sum(repo.create_git_blob.call_count for repo in upload_repos))
+
+    def test_should_not_commit_changes_when_any_blob_upload_fails(self):
+        def repo_factory():
+            repo = Mock(spec=PyGithubRepository)
+            repo.create_git_blob.side_effect = lambda content, encoding: Mock(sha="sha") if content != CommitData.to_base64(b"bad").decode() else self.__raise(GithubException(500, "error", None))
+            return repo
+        githubRepo = GithubRepo(self.pyGithubRepo, repo_factory)
+        githubRepo.inline_threshold = 0
+        self.__mock_commit_target(["main"])
+        changes = [ FilesystemChange("a/pom.xml", b"good"), FilesystemChange("b/pom.xml", b"bad"), FilesystemChange("c/pom.xml", b"good") ]
+
+        with self.assertLogs("GithubRepo", level="WARNING") as logs:
+            self.assertFalse(githubRepo.commit_changes(self.author, "message", "main", changes))
+
+        self.assertTrue(any("b/pom.xml" in line for line in logs.output))
+        self.pyGithubRepo.create_git_tree.assert_not_called()
+
+    def test_should_inline_small_text_changes_and_create_blobs_for_others(self):
+        self.pyGithubRepo.create_git_blob.return_value = Mock(sha="blob-sha")
+        self.githubRepo.inline_threshold = 24
+        self.__mock_commit_target(["main"])
+        changes = [
+            FilesystemChange("pom.xml", "<project>é</project>".encode()),
+            FilesystemChange("report.pdf", b"%PDF-\xff\xfe"),
+            FilesystemChange("package.json", b'{ "name": "a-long-package-name" }')
+        ]
+
+        self.assertTrue(self.githubRepo.commit_changes(self.author, "message", "main", changes))
+
+        elements = self.pyGithubRepo.create_git_tree.call_args.args[0]
+        self.assertEqual("<project>é</project>", elements[0]._InputGitTreeElement__content)
+        self.assertEqual("blob-sha", elements[1]._InputGitTreeElement__sha)
+        self.assertEqual("blob-sha", elements[2]._InputGitTreeElement__sha)
+        self.assertEqual(2, self.pyGithubRepo.create_git_blob.call_count)
+        self.assertEqual(1, self.githubRepo.saved_blob_calls)
+        self.assertEqual(2, self.githubRepo.created_blobs)
+
+    def test_should_look_branches_up_once_and_track_own_writes(self):
+        self.__mock_get_branch(self.__mock_branches(["master"]))
+        new_commit = Mock(spec=Commit, sha="new-commit-sha")
+        self.pyGithubRepo.create_git_commit.return_value = new_commit
+
+        self.assertTrue(self.githubRepo.create_branch("master", "meterian-bot/pr/1"))
+        self.assertTrue(self.githubRepo.create_branch("master", "meterian-bot/pr/1"))
+        self.assertTrue(self.githubRepo.commit_changes(self.author, "message", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"content") ]))
+        self.assertTrue(self.githubRepo.commit_changes(self.author, "message", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"other content") ]))
+
+        self.pyGithubRepo.get_branches.assert_not_called()
+        self.assertEqual(2, self.pyGithubRepo.get_branch.call_count)
+        self.pyGithubRepo.create_git_ref.assert_called_once_with(ref="refs/heads/meterian-bot/pr/1", sha="master-sha")
+        self.assertEqual([ "master-sha", "new-commit-sha" ], [ call.kwargs["sha"] for call in self.pyGithubRepo.get_git_commit.call_args_list ])
+
+    def test_should_create_new_branch_pointing_at_commit_built_on_base_head(self):
+        self.__mock_commit_target(["master"])
+        self.pyGithubRepo.create_git_commit.return_value = Mock(spec=GitCommit, sha="new-commit-sha")
+
+        self.assertTrue(self.githubRepo.commit_changes_to_new_branch(self.author, "message", "master", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"content") ]))
+
+        self.pyGithubRepo.get_git_commit.assert_called_once_with(sha="master-sha")
+        self.pyGithubRepo.get_git_tree.assert_called_once_with(sha="master-sha", recursive=True)
+        self.pyGithubRepo.create_git_tree.assert_called_once_with(ANY, self.pyGithubRepo.get_git_commit.return_value.tree)
+        self.pyGithubRepo.create_git_ref.assert_called_once_with(ref="refs/heads/meterian-bot/pr/1", sha="new-commit-sha")
+        self.pyGithubRepo.get_git_ref.assert_not_called()
+        self.assertTrue(self.githubRepo.is_remote_branch("meterian-bot/pr/1"))
+        self.pyGithubRepo.get_branch.assert_called_once_with("master")
+
+    def test_should_commit_on_existing_branch_when_new_branch_already_exists(self):
+        self.__mock_commit_target(["master", "meterian-bot/pr/1"])
+        self.pyGithubRepo.create_git_ref.side_effect = GithubException(422, {"message": "Reference already exists"}, None)
+
+        self.assertTrue(self.githubRepo.commit_changes_to_new_branch(self.author, "message", "master", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"content") ]))
+
+        self.assertEqual([ "master-sha", "meterian-bot/pr/1-sha" ], [ call.kwargs["sha"] for call in self.pyGithubRepo.get_git_commit.call_args_list ])
+        self.pyGithubRepo.get_git_ref.assert_called_once_with("heads/meterian-bot/pr/1")
+
+    def test_should_not_create_new_branch_when_base_branch_does_not_exist(self):
+        self.__mock_commit_target([])
+
+        self.assertFalse(self.githubRepo.commit_changes_to_new_branch(self.author, "message", "master", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"content") ]))
+
+        self.pyGithubRepo.create_git_commit.assert_not_called()
+        self.pyGithubRepo.create_git_ref.assert_not_called()
+
+    def test_should_index_own_pulls_by_head_branch_in_one_listing(self):
+        self.pyGithubRepo.organization = None
+        self.pyGithubRepo.owner.login = "MyOrg"
+        self.pyGithubRepo.get_pulls.return_value = [
+            self.__create_pull("MyOrg", "meterian-bot/pr/1", "closed", "https://pr/1"),
+            self.__create_pull("MyOrg", "meterian-bot/pr/2", "open", "https://pr/2"),
+            self.__create_pull("Fork", "meterian-bot/pr/3", "open", "https://pr/3"),
+            self.__create_pull("MyOrg", "feature", "open", "https://pr/4")
+        ]
+
+        index = self.githubRepo.get_pulls_index("meterian-bot/pr/")
+
+        self.pyGithubRepo.get_pulls.assert_called_once_with(state="all")
+        self.assertEqual(2, len(index))
+        self.assertEqual(("closed", "https://pr/1"), index.get("meterian-bot/pr/1"))
+        self.assertEqual(("open", "https://pr/2"), index.get("meterian-bot/pr/2"))
+        self.assertIsNone(index.get("meterian-bot/pr/3"))
+
+    def __create_pull(self, owner: str, head: str, state: str, url: str) -> PullRequest:
+        pull = Mock(spec=PullRequest)
+        pull.head.label = owner + ":" + head
+        pull.head.ref = head
+        pull.state = state
+        pull.html_url = url
+        return pull
+
+    def test_should_filter_unchanged_files_against_one_tree_snapshot(self):
+        self.__mock_get_branch(self.__mock_branches(["master"]))
+        self.__mock_tree({ "pom.xml": b"<project/>", "module/pom.xml": b"<project>old</project>" })
+        changes = [ FilesystemChange("pom.xml", b"<project/>"), FilesystemChange("module/pom.xml", b"<project>new</project>"), FilesystemChange("new/pom.xml", b"<project/>") ]
+
+        self.assertEqual(changes[1:], self.githubRepo.filter_changes("master", changes))
+        self.assertEqual([], self.githubRepo.filter_changes("master", changes[:1]))
+
+        self.pyGithubRepo.get_git_tree.assert_called_once_with(sha="master-sha", recursive=True)
+        self.pyGithubRepo.get_contents.assert_not_called()
+
+    def test_should_leave_unchanged_files_out_of_the_commit(self):
+        self.__mock_commit_target(["master"])
+        self.__mock_tree({ "pom.xml": b"<project/>" })
+        self.pyGithubRepo.create_git_commit.return_value = Mock(spec=GitCommit, sha="new-commit-sha")
+
+        self.assertFalse(self.githubRepo.commit_changes_to_new_branch(self.author, "message", "master", "meterian-bot/pr/1", [ FilesystemChange("pom.xml", b"<project/>") ]))
+        self.assertTrue(self.githubRepo.commit_changes_to_new_branch(self.author, "message", "master", "meterian-bot/pr/2", [ FilesystemChange("pom.xml", b"<project/>"), FilesystemChange("report.pdf", b"%PDF") ]))
+
+        elements = self.pyGithubRepo.create_git_tree.call_args.args[0]
+        self.assertEqual([ "report.pdf" ], [ element._InputGitTreeElement__path for element in elements ])
+        self.pyGithubRepo.create_git_ref.assert_called_once_with(ref="refs/heads/meterian-bot/pr/2", sha="new-commit-sha")
+        self.pyGithubRepo.get_git_tree.assert_called_once_with(sha="master-sha", recursive=True)
+
+    def test_should_stream_large_blobs_from_mapped_file(self):
+        uploads = []
+        def upload(verb, url, parameters, headers, payload):
+            body = payload.read()
+            uploads.append((url, len(payload), json.loads(body)))
+            return {}, { "sha": "blob-sha" }
+        self.pyGithubRepo.url = "https://api.github.com/repos/MyOrg/MyRepo"
+        self.pyGithubRepo._requester = Mock()
+        self.pyGithubRepo._requester.requestMemoryBlobAndCheck.side_effect = upload
+        self.githubRepo.inline_threshold = 0
+        self.githubRepo.LARGE_FILE_THRESHOLD = 16
+        self.__mock_commit_target(["main"])
+        folder = Path(tempfile.mkdtemp(prefix="meterian_pr_"))
+        self.addCleanup(shutil.rmtree, folder)
+        lockfile = Path(folder, "package-lock.json")
+        lockfile.write_bytes(b"{ \"lockfileVersion\": 2 }\n" * 1000)
+        changes = [ FilesystemChange("package-lock.json", FileContent(str(lockfile))), FilesystemChange("pom.xml", b"<project/>") ]
+        self.pyGithubRepo.create_git_blob.return_value = Mock(sha="small-blob-sha")
+
+        self.assertTrue(self.githubRepo.commit_changes(self.author, "message", "main", changes))
+
+        url, length, body = uploads[0]
+        self.assertEqual("https://api.github.com/repos/MyOrg/MyRepo/git/blobs", url)
+        self.assertEqual({ "encoding": "base64", "content": CommitData.to_base64(lockfile.read_bytes()).decode() }, body)
+        self.assertEqual(len(json.dumps(body, separators=(",", ":"))), length)
+        self.pyGithubRepo.create_git_blob.assert_called_once_with(CommitData.to_base64(b"<project/>").decode(), "base64")
+        elements = self.pyGithubRepo.create_git_tree.call_args.args[0]
+        self.assertEqual([ "blob-sha", "small-blob-sha" ], [ element._InputGitTreeElement__sha for element in elements ])
+
+    def test_should_commit_large_change_through_git_data_api(self):
+        self.githubRepo.LARGE_FILE_THRESHOLD = 4
+        self.__mock_commit_target(["main"])
+        self.pyGithubRepo.create_git_commit.return_value = Mock(spec=GitCommit, sha="new-commit-sha")
+
+        self.assertTrue(self.githubRepo.commit_change(self.author, "message", "main", "pom.xml", b"<project/>"))
+
+        self.pyGithubRepo.create_file.assert_not_called()
+        self.pyGithubRepo.update_file.assert_not_called()
+        self.pyGithubRepo.get_git_ref.assert_called_once_with("heads/main")
+        self.pyGithubRepo.get_git_ref.return_value.edit.assert_called_once_with(sha="new-commit-sha")
+
+    def test_should_look_files_missing_from_truncated_tree_up_individually(self):
+        self.__mock_get_branch(self.__mock_branches(["master"]))
+        self.__mock_tree({ "pom.xml": b"<project/>" }, truncated=True)
+        def get_contents(path, ref):
+            if path != "module/pom.xml":
+                raise UnknownObjectException(404, {"message": "Not Found"}, None)
+            return self.__create_content(path, b"<project>old</project>", FilesystemChange.compute_digest(b"<project>old</project>"))
+        self.pyGithubRepo.get_contents.side_effect = get_contents
+
+        self.assertTrue(self.githubRepo.commit_change(self.author, "message", "master", "module/pom.xml", b"<project>new</project>"))
+        self.assertEqual([], self.githubRepo.filter_changes("master", [ FilesystemChange("module/pom.xml", b"<project>old</project>") ]))
+        self.assertTrue(self.githubRepo.commit_change(self.author, "message", "master", "new/pom.xml", b"<project/>"))
+
+        self.pyGithubRepo.update_file.assert_called_once_with("module/pom.xml", "message", b"<project>new</project>", FilesystemChange.compute_digest(b"<project>old</project>"), branch="master", committer=ANY)
+        self.pyGithubRepo.create_file.assert_called_once_with("new/pom.xml", "message", b"<project/>", branch="master", committer=ANY)
+        self.assertEqual([ "module/pom.xml", "new/pom.xml" ], [ call.args[0] for call in self.pyGithubRepo.get_contents.call_args_list ])
+
+    def __mock_tree(self, files: dict, truncated: bool = False):
+        elements = [ Mock(spec=GitTreeElement, path=path, sha=FilesystemChange.compute_digest(content), type="blob") for path, content in files.items() ]
+        elements.append(Mock(spec=GitTreeElement, path="module", sha="tree-sha", type="tree"))
+        self.pyGithubRepo.get_git_tree.return_value = Mock(spec=GitTree, tree=elements, raw_data={ "truncated": truncated })
+
+    def __raise(self, ex: Exception):
+        raise ex
+
+    def __mock_commit_target(self, branch_names: list):
+        self.__mock_get_branch(self.__mock_branches(branch_names))
+        self.pyGithubRepo.get_git_commit.return_value = Mock(spec=GitCommit, sha="head")
+
     def __create_content(self, path: str, content: bytes, commit_sha: str, ) -> ContentFile:
         the_content = Mock(spec=ContentFile)
         the_content.decoded_content = content
@@ -294,10 +529,19 @@ class GithubRepoTest(unittest.TestCase):
         for branch_name in branch_names:
             branch = Mock(spec=Branch)
             branch.name = branch_name
+            branch.commit.sha = branch_name + "-sha"
             mock_branches.append(branch)
 
         return mock_branches
 
+    def __mock_get_branch(self, branches: list):
+        branches_by_name = { branch.name: branch for branch in branches }
+        def get_branch(name):
+            if name not in branches_by_name:
+                raise UnknownObjectException(404, {"message": "Branch not found"}, None)
+            return branches_by_name[name]
+        self.pyGithubRepo.get_branch = MagicMock(side_effect=get_branch)
+
     def __as_committer(self, author_data: CommitAuthor) -> InputGitAuthor:
         return InputGitAuthor(
             author_data.username,
@@ -3,6 +3,7 @@ from unittest.mock import MagicMock, Mock
 
 from src.vcs.github.Github import Github
 from src.vcs.github.GithubRepo import GithubRepo
+from src.vcs.github.GithubGraphQLClient import GithubGraphQLClient
 from github import Github as PyGithub
 from github import UnknownObjectException
 from github import Repository as PyGithubRepository
@@ -49,6 +50,14 @@ class GitHubTest(unittest.TestCase):
 
         self.assertIsNone(self.github.get_issues(repo, "issue-title"))
 
+    def test_should_close_graphql_client(self):
+        graphql_client = Mock(spec=GithubGraphQLClient)
+        github = Github(self.pyGithub, graphql_client=graphql_client)
+
+        github.close()
+
+        graphql_client.close.assert_called_once()
+
 
 
 if __name__ == "__main__":
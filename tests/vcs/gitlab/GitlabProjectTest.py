@@ -188,6 +188,14 @@ class GitlabProjectTest(unittest.TestCase):
         self.assertTrue(self.project.create_label("name", "description", "color", "text_color"))
         self.pyGitlabProject.labels.create.assert_not_called
 
+    def test_should_resolve_label_once_per_run(self):
+        self.labels.get = MagicMock(return_value=self.__create_label(LabelData("name", "description", "color", "text_color")))
+        self.pyGitlabProject.labels = self.labels
+
+        self.assertTrue(self.project.create_label("name", "description", "color", "text_color"))
+        self.assertTrue(self.project.create_label("name", "description", "color", "text_color"))
+        self.pyGitlabProject.labels.get.assert_called_once_with("name")
+
     def test_should_fail_to_create_label_when_exception_thrown(self):
         self.labels.get = MagicMock(side_effect=GitlabHttpError("404", "404 Label Not Found"))
         self.labels.create = MagicMock(side_effect=GitlabHttpError("500", "Error"))
@@ -269,6 +277,71 @@ class GitlabProjectTest(unittest.TestCase):
         self.assertFalse(res)
         self.pyGitlabProject.commits.create.assert_not_called
 
+    def test_should_create_new_branch_with_the_commit_of_multiple_changes(self):
+        def mock_get(file_path: str = None, ref: str = None):
+            if "path/to/fileA" == file_path and "main" == ref:
+                return self.__create_remote_file(b"content of file A")
+            else:
+                raise GitlabHttpError("404 File Not Found", 404, None)
+
+        self.files.get = Mock(side_effect=mock_get)
+        self.pyGitlabProject.commits = self.commits
+        self.pyGitlabProject.files = self.files
+        self.pyGitlabProject.branches = self.branches
+        changes = [ FilesystemChange("path/to/fileA", b"new content of file A"), FilesystemChange("path/to/fileB", b'content of file B') ]
+
+        res = self.project.commit_changes_to_new_branch(self.author, "the commit message", "main", "feature/branch", changes)
+
+        self.assertTrue(res)
+        self.pyGitlabProject.branches.create.assert_not_called()
+        self.pyGitlabProject.commits.create.assert_called_once_with(ANY)
+        commit_data = self.pyGitlabProject.commits.create.call_args.args[0]
+        self.assertEqual("feature/branch", commit_data["branch"])
+        self.assertEqual("main", commit_data["start_branch"])
+        self.__assertExistingFileUpdated("path/to/fileA", self.__to_base64_str(b"new content of file A"), commit_data["actions"])
+        self.__assertNewFileUpdated("path/to/fileB", self.__to_base64_str(b"content of file B"), commit_data["actions"])
+
+    def test_should_commit_on_existing_branch_when_new_branch_already_exists(self):
+        self.files.get = MagicMock(side_effect=GitlabHttpError("404 File Not Found", 404, None))
+        self.pyGitlabProject.files = self.files
+        self.commits.create = MagicMock(side_effect=[ GitlabHttpError("A branch called 'feature/branch' already exists", 400, None), Mock() ])
+        self.pyGitlabProject.commits = self.commits
+        self.branches.get = MagicMock(return_value=self.__create_remote_branch("feature/branch"))
+        self.pyGitlabProject.branches = self.branches
+
+        res = self.project.commit_changes_to_new_branch(self.author, "the commit message", "main", "feature/branch", [ FilesystemChange("path/to/fileA", b"content") ])
+
+        self.assertTrue(res)
+        self.assertEqual(2, self.pyGitlabProject.commits.create.call_count)
+        self.assertNotIn("start_branch", self.pyGitlabProject.commits.create.call_args.args[0])
+
+    def test_should_index_merge_requests_by_source_branch_in_one_listing(self):
+        self.mergerequests.list = MagicMock(return_value=[
+            Mock(spec=ProjectMergeRequest, source_branch="meterian-bot/pr/1", state="merged", web_url="https://mr/1"),
+            Mock(spec=ProjectMergeRequest, source_branch="meterian-bot/pr/2", state="opened", web_url="https://mr/2"),
+            Mock(spec=ProjectMergeRequest, source_branch="feature", state="opened", web_url="https://mr/3")
+        ])
+        self.pyGitlabProject.mergerequests = self.mergerequests
+
+        index = self.project.get_pulls_index("meterian-bot/pr/")
+
+        self.pyGitlabProject.mergerequests.list.assert_called_once_with(state="all", iterator=True)
+        self.assertEqual(2, len(index))
+        self.assertEqual(("merged", "https://mr/1"), index.get("meterian-bot/pr/1"))
+        self.assertEqual(("open", "https://mr/2"), index.get("meterian-bot/pr/2"))
+
+    def test_should_filter_unchanged_files_against_one_tree_listing(self):
+        self.pyGitlabProject.repository_tree = MagicMock(return_value=[
+            { "id": FilesystemChange.compute_digest(b"content of file A"), "path": "path/to/fileA", "type": "blob" },
+            { "id": "tree-id", "path": "path/to", "type": "tree" }
+        ])
+        changes = [ FilesystemChange("path/to/fileA", b"content of file A"), FilesystemChange("path/to/fileB", b"content of file B") ]
+
+        self.assertEqual(changes[1:], self.project.filter_changes("main", changes))
+        self.assertEqual([], self.project.filter_changes("main", changes[:1]))
+
+        self.pyGitlabProject.repository_tree.assert_called_once_with(ref="main", recursive=True, iterator=True)
+
     def __to_base64_str(self, content: bytes):
         return self.__to_base64(content).decode()
 